@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Call overhead of Func with and without memoization, and fan-out of MapOperands over many operands, per operand
+and batched.
+
+Run with `python benchmarks/bench_func_calls.py` from the repository root.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from pandas import Series
+from harness import run
+from zpmeta.funcs.func import Func
+from zpmeta.funcs.funcmaps import MapOperands
+
+REPEAT = 5
+OPERANDS = int(os.environ.get('ZPMETA_BENCH_OPERANDS', 1000))
+
+
+class Scale(Func):
+    @classmethod
+    def _std_params(cls, name: str = None) -> dict:
+        return dict(factor=2.)
+
+    @classmethod
+    def _execute(cls, operand=None, params: dict = None) -> object:
+        return operand * params['factor']
+
+
+class BatchScale(Scale):
+    @classmethod
+    def _execute_batch(cls, operands=None, params: dict = None) -> object:
+        return operands * params['factor']
+
+
+def _operands() -> dict:
+    return {'T%d' % i: Series(np.random.rand(250)) for i in range(OPERANDS)}
+
+
+def bench_call_scalar():
+    func = Scale()
+    return lambda: func(1.)
+
+
+def bench_call_scalar_override():
+    func = Scale()
+    return lambda: func(1., dict(factor=3.))
+
+
+def bench_memo_hit_scalar():
+    func = Scale(memo=True)
+    func(1.)
+    return lambda: func(1.)
+
+
+def bench_memo_hit_series():
+    func = Scale(memo=True)
+    operand = Series(np.random.rand(2500))
+    func(operand)
+    return lambda: func(operand)
+
+
+def bench_map_operands_serial():
+    mapper, operands = MapOperands(Scale()), _operands()
+    return lambda: mapper(operands)
+
+
+def bench_map_operands_thread():
+    mapper, operands = MapOperands(Scale(), executor='thread', chunksize=50), _operands()
+    return lambda: mapper(operands)
+
+
+def bench_map_operands_batched():
+    mapper, operands = MapOperands(BatchScale()), _operands()
+    return lambda: mapper(operands)
+
+
+if __name__ == '__main__':
+    run(globals(), repeat=REPEAT)
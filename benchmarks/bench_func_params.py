@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Per-call overhead of Func.__call__ with small and large params, layered versus deep-copied.
+
+Run with `python benchmarks/bench_func_params.py` from the repository root.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from pandas import DataFrame
+from harness import run
+from zpmeta.funcs.func import Func
+
+REPEAT = 3
+
+
+class Lookup(Func):
+    @classmethod
+    def _std_params(cls, name: str = None) -> dict:
+        return dict(lookback=5, options=dict(method='lin', min_periods=1))
+
+    @classmethod
+    def _execute(cls, operand=None, params: dict = None) -> object:
+        return params['options']['method']
+
+
+class CopiedLookup(Lookup):
+    _copy_params = True
+
+
+def _large_params() -> dict:
+    return dict(table=DataFrame(np.random.randn(100000, 10)), mapping={i: str(i) for i in range(100000)})
+
+
+def bench_small_params_no_override():
+    func = Lookup()
+    return lambda: func(None)
+
+
+def bench_small_params_override():
+    func = Lookup()
+    return lambda: func(None, dict(options=dict(method='exp')))
+
+
+def bench_large_params_no_override():
+    func = Lookup(_large_params())
+    return lambda: func(None)
+
+
+def bench_large_params_override():
+    func = Lookup(_large_params())
+    return lambda: func(None, dict(lookback=10))
+
+
+def bench_large_params_no_override_deepcopy():
+    func = CopiedLookup(_large_params())
+    return lambda: func(None)
+
+
+if __name__ == '__main__':
+    run(globals(), repeat=REPEAT)
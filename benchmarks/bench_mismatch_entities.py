@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Scaling of PanelSource.mismatch_entities with 10^7 entity combinations.
+
+Run with `python benchmarks/bench_mismatch_entities.py` from the repository root.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import run
+from zpmeta.sources.panelsource import PanelSource
+
+REPEAT = 3
+
+
+class NullSource(PanelSource):
+    def _execute(self, entities=None, period=None):
+        return None
+
+
+def _product_source(tickers: int, fields: int) -> NullSource:
+    source = NullSource()
+    source.entities = dict(ticker=['T%d' % i for i in range(tickers)], field=['F%d' % i for i in range(fields)])
+    return source
+
+
+def bench_product_1e7_one_new_ticker():
+    """10,000 tickers x 1,000 fields cached, request adds one ticker."""
+    source = _product_source(10000, 1000)
+    request = dict(ticker=source.entities['ticker'] + ['NEW'], field=source.entities['field'])
+    return lambda: source.mismatch_entities(request)
+
+
+def bench_product_1e7_subset():
+    """10,000 tickers x 1,000 fields cached, request is a small subset."""
+    source = _product_source(10000, 1000)
+    request = dict(ticker=source.entities['ticker'][:10], field=source.entities['field'][:5])
+    return lambda: source.mismatch_entities(request)
+
+
+def bench_zipped_1e7_new_pairs():
+    """100,000 zipped (ticker, exchange) pairs x 100 fields cached, request adds 1,000 pairs."""
+    source = NullSource(caching=dict(entity_levels=['ticker', 'exchange']))
+    source.entities = dict(ticker=['T%d' % i for i in range(100000)], exchange=['X%d' % (i % 7) for i in range(100000)],
+                           field=['F%d' % i for i in range(100)])
+    request = dict(ticker=['T%d' % i for i in range(99000, 101000)],
+                   exchange=['X%d' % (i % 7) for i in range(99000, 101000)], field=source.entities['field'])
+    return lambda: source.mismatch_entities(request)
+
+
+if __name__ == '__main__':
+    run(globals(), repeat=REPEAT)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Registry hit and miss latency of MultitonMeta for hashable and unhashable arguments.
+
+Run with `python benchmarks/bench_multiton.py` from the repository root.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import json
+from harness import run
+from zpmeta.singletons.singletons import MultitonMeta
+from zpmeta.utils.common_utils import custom_serializer
+
+REPEAT = 5
+
+
+class Config(metaclass=MultitonMeta):
+    def __init__(self, params=None, caching=None):
+        self.params = params
+        self.caching = caching
+
+
+def bench_hit_hashable_args():
+    Config('daily', 'B')
+    return lambda: Config('daily', 'B')
+
+
+def bench_hit_dict_args():
+    params = dict(freq='B', fields=['close', 'volume'], options=dict(adjust=True))
+    Config(params)
+    return lambda: Config(params)
+
+
+def bench_hit_dict_args_and_kwds():
+    params = dict(freq='B', fields=['close', 'volume'], options=dict(adjust=True))
+    Config(params, caching=dict(ts_anchor='cache'))
+    return lambda: Config(params, caching=dict(ts_anchor='cache'))
+
+
+class BoundedConfig(metaclass=MultitonMeta):
+    _multiton_policy = dict(maxsize=1000)
+
+    def __init__(self, params=None):
+        self.params = params
+
+
+def bench_miss_with_eviction():
+    keys = iter(range(10**9))
+    return lambda: BoundedConfig(next(keys))
+
+
+def bench_json_fingerprint_reference():
+    """The JSON encoding previously used as registry key, for comparison."""
+    params = dict(freq='B', fields=['close', 'volume'], options=dict(adjust=True))
+    return lambda: (Config, json.dumps((params,), default=custom_serializer, sort_keys=True))
+
+
+if __name__ == '__main__':
+    run(globals(), repeat=REPEAT)
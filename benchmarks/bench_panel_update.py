@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Cost of merging a daily increment into a 20 year panel cache with PanelSource.update.
+
+Run with `python benchmarks/bench_panel_update.py` from the repository root.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from pandas import DataFrame, MultiIndex, Timedelta, bdate_range
+from harness import run
+from zpmeta.sources.panelsource import PanelSource
+
+REPEAT = 3
+COLUMNS = MultiIndex.from_product([['T%d' % i for i in range(250)], ['close', 'volume']], names=['ticker', 'field'])
+
+
+class NullSource(PanelSource):
+    def _execute(self, entities=None, period=None):
+        return None
+
+
+def _cached_source() -> NullSource:
+    index = bdate_range('2000-01-03', periods=5200)
+    source = NullSource()
+    source.update(ts=DataFrame(np.random.rand(len(index), len(COLUMNS)), index=index, columns=COLUMNS))
+    return source
+
+
+def bench_append_day():
+    source = _cached_source()
+    row = np.random.rand(1, len(COLUMNS))
+
+    def append():
+        day = source.value.index[-1] + Timedelta(days=1)
+        source.update(ts=DataFrame(row, index=[day], columns=COLUMNS))
+    return append
+
+
+def bench_refresh_tail():
+    source = _cached_source()
+    tail = DataFrame(np.random.rand(5, len(COLUMNS)), index=source.value.index[-5:], columns=COLUMNS)
+    return lambda: source.update(ts=tail)
+
+
+def bench_combine_first_reference():
+    """The previous merge of a daily increment, for comparison."""
+    source = _cached_source()
+    day = DataFrame(np.random.rand(1, len(COLUMNS)), index=[source.value.index[-1] + Timedelta(days=1)],
+                    columns=COLUMNS)
+    return lambda: source.value.combine_first(day)
+
+
+if __name__ == '__main__':
+    run(globals(), repeat=REPEAT)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Latency of PanelSource calls: initial fill, incremental extension by one day or one ticker, repeated hits, and the
+daily update of a chain of derived sources.
+
+The size of the panel is set with the environment variables described in `sources.py`. Run with
+`python benchmarks/bench_panelsource.py` from the repository root.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pandas import Timedelta
+from harness import run
+from sources import SyntheticSource, make_entities, make_period, warm_source
+from zpmeta.sources.derived import DerivedPanelSource
+
+REPEAT = 3
+
+
+def bench_initial_fill():
+    entities, period = make_entities(), make_period()
+    return lambda: SyntheticSource()(entities, period)
+
+
+def bench_repeat_hit():
+    entities, period = make_entities(), make_period()
+    source = warm_source(entities, period)
+    return lambda: source(entities, period)
+
+
+def bench_repeat_hit_subset():
+    entities, period = make_entities(), make_period()
+    source = warm_source(entities, period)
+    subset = dict(ticker=entities['ticker'][:10], field=entities['field'][:1])
+    return lambda: source(subset, (period[1] - Timedelta(days=30), period[1]))
+
+
+def bench_incremental_day():
+    entities, period = make_entities(), make_period()
+    source = warm_source(entities, period)
+    days = iter(range(1, 10**6))
+    return lambda: source(entities, (period[0], period[1] + Timedelta(days=next(days))))
+
+
+def bench_incremental_ticker():
+    entities, period = make_entities(), make_period()
+    source = warm_source(entities, period)
+    tickers = iter(range(10**6))
+
+    def extend():
+        entities['ticker'] = entities['ticker'] + ['N%d' % next(tickers)]
+        source(entities, period)
+    return extend
+
+
+def bench_derived_chain_day():
+    """Twenty sources derived from each other by a 20 row difference, extended by one day."""
+    entities, period = make_entities(), make_period()
+    source = SyntheticSource()
+    for _ in range(20):
+        source = DerivedPanelSource(source, lambda frame: frame - frame.shift(20), lookback=20)
+    source(entities, period)
+    days = iter(range(1, 10**6))
+    return lambda: source(entities, (period[0], period[1] + Timedelta(days=next(days))))
+
+
+if __name__ == '__main__':
+    run(globals(), repeat=REPEAT)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Fills and hits of a ShardedPanelSource with four shards, gathering by pickling or through shared memory, against
+a single PanelSource. Fills only scale with the number of cores of the machine.
+
+The size of the panel is set with the environment variables described in `sources.py`. Run with
+`python benchmarks/bench_sharded.py` from the repository root.
+"""
+
+import os
+import sys
+import atexit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import run
+from sources import SyntheticSource, make_entities, make_period, warm_source
+from zpmeta.sources.sharded import ShardedPanelSource
+
+REPEAT = 3
+SHARDS = 4
+
+
+def _sharded(gather: str) -> ShardedPanelSource:
+    source = ShardedPanelSource(SyntheticSource, 'ticker', shards=SHARDS, gather=gather)
+    atexit.register(source.shutdown)
+    return source
+
+
+def _refill(source, entities: dict, period: tuple):
+    def refill():
+        source.reset()
+        source(entities, period)
+    return refill
+
+
+def bench_single_fill():
+    return _refill(SyntheticSource(), make_entities(), make_period())
+
+
+def bench_sharded_fill():
+    return _refill(_sharded('pickle'), make_entities(), make_period())
+
+
+def bench_single_hit():
+    entities, period = make_entities(), make_period()
+    source = warm_source(entities, period)
+    return lambda: source(entities, period)
+
+
+def bench_sharded_hit_pickle():
+    entities, period = make_entities(), make_period()
+    source = _sharded('pickle')
+    source(entities, period)
+    return lambda: source(entities, period)
+
+
+def bench_sharded_hit_shared():
+    entities, period = make_entities(), make_period()
+    source = _sharded('shared')
+    source(entities, period)
+    return lambda: source(entities, period)
+
+
+if __name__ == '__main__':
+    run(globals(), repeat=REPEAT, memory='--no-memory' not in sys.argv)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Minimal timing harness shared by the benchmark scripts.
+
+A benchmark is a module level function named `bench_*` that performs its setup and returns a zero-argument
+callable. The harness times the callable and reports the best time per call, and the peak memory allocated by one
+call after a warm-up call as traced by `tracemalloc`.
+"""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import timeit
+import tracemalloc
+
+
+def measure(bench, repeat: int = 5, number: int = None) -> float:
+    """Returns the best seconds per call of the callable returned by `bench`."""
+    func = bench()
+    timer = timeit.Timer(func)
+    if number is None:
+        number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def peak_memory(bench) -> int:
+    """Returns the peak bytes allocated during the second call of the callable returned by `bench`."""
+    func = bench()
+    func()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmarks(namespace: dict) -> dict:
+    return {name: bench for name, bench in sorted(namespace.items()) if name.startswith('bench_') and callable(bench)}
+
+
+def run(namespace: dict, repeat: int = 5, memory: bool = True) -> dict:
+    """Runs all `bench_*` functions of a module namespace and prints the results."""
+    results = dict()
+    for name, bench in benchmarks(namespace).items():
+        results[name] = dict(seconds=measure(bench, repeat=repeat))
+        if memory:
+            results[name]['peak_bytes'] = peak_memory(bench)
+        line = "%-50s %12.3f us" % (name, results[name]['seconds'] * 1e6)
+        if memory:
+            line += " %12.1f KiB" % (results[name]['peak_bytes'] / 1024)
+        print(line)
+    return results
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Runs the benchmark scripts and compares the results with the stored baseline.
+
+Usage from the repository root:
+
+    python benchmarks/run.py                 # run all benchmarks and compare with benchmarks/baseline.json
+    python benchmarks/run.py -k panel        # only the scripts or benchmarks whose name contains 'panel'
+    python benchmarks/run.py --save          # store the results as the new baseline
+
+The exit status is 1 if a benchmark is slower than its baseline by more than the tolerance. Timings depend on the
+machine, so baselines are only comparable on the machine that produced them.
+"""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import os
+import sys
+import glob
+import json
+import argparse
+import platform
+import importlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, os.pardir))
+sys.path.insert(0, HERE)
+
+import numpy
+import pandas
+from harness import benchmarks, run
+
+BASELINE = os.path.join(HERE, 'baseline.json')
+
+
+def environment() -> dict:
+    return dict(python=platform.python_version(), numpy=numpy.__version__, pandas=pandas.__version__,
+                machine=platform.machine(), system=platform.system(), processor=platform.processor(),
+                cpus=os.cpu_count())
+
+
+def run_all(select: str = None, memory: bool = True) -> dict:
+    """Runs the `bench_*` functions of all `bench_*.py` scripts whose module or function name contains select."""
+    results = dict()
+    for path in sorted(glob.glob(os.path.join(HERE, 'bench_*.py'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        module = importlib.import_module(name)
+        namespace = benchmarks(vars(module))
+        if select is not None and select not in name:
+            namespace = {key: bench for key, bench in namespace.items() if select in key}
+        if len(namespace) == 0:
+            continue
+        print("%s" % name)
+        for key, result in run(namespace, repeat=getattr(module, 'REPEAT', 5), memory=memory).items():
+            results["%s.%s" % (name, key)] = result
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Returns the names of the benchmarks slower than their baseline by more than tolerance, printing the ratios."""
+    regressions = []
+    print("\n%-70s %10s" % ('benchmark', 'vs base'))
+    for name, result in results.items():
+        if name not in baseline:
+            print("%-70s %10s" % (name, 'new'))
+            continue
+        ratio = result['seconds'] / baseline[name]['seconds']
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = ' REGRESSION'
+        print("%-70s %9.2fx%s" % (name, ratio, flag))
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-k', dest='select', default=None, help="run only benchmarks whose name contains this")
+    parser.add_argument('--save', action='store_true', help="store the results as the baseline")
+    parser.add_argument('--baseline', default=BASELINE, help="baseline file (default: %(default)s)")
+    parser.add_argument('--output', default=None, help="also write the results to this JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown ratio (default: 0.25)")
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help="skip the peak memory runs")
+    args = parser.parse_args(argv)
+
+    report = dict(environment=environment(), results=run_all(args.select, args.memory))
+    if args.output is not None:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2, sort_keys=True)
+
+    if args.save:
+        if args.select is not None and os.path.exists(args.baseline):
+            # Only the selected benchmarks are replaced.
+            with open(args.baseline) as handle:
+                stored = json.load(handle)
+            report['results'] = dict(stored['results'], **report['results'])
+        with open(args.baseline, 'w') as handle:
+            json.dump(report, handle, indent=2, sort_keys=True)
+        print("Baseline written to %s" % args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline at %s, run with --save to create one." % args.baseline)
+        return 0
+    with open(args.baseline) as handle:
+        stored = json.load(handle)
+    if stored.get('environment') != report['environment']:
+        print("Warning: the baseline was recorded in a different environment: %s" % stored.get('environment'))
+    return 1 if compare(report['results'], stored['results'], args.tolerance) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
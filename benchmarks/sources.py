@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Synthetic panel sources for the benchmarks.
+
+The default size of the panels can be changed with the environment variables ZPMETA_BENCH_TICKERS,
+ZPMETA_BENCH_FIELDS and ZPMETA_BENCH_YEARS.
+"""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import os
+import numpy as np
+from pandas import DataFrame, MultiIndex, Timestamp, Timedelta, bdate_range
+from zpmeta.sources.panelsource import PanelSource
+
+TICKERS = int(os.environ.get('ZPMETA_BENCH_TICKERS', 500))
+FIELDS = int(os.environ.get('ZPMETA_BENCH_FIELDS', 2))
+YEARS = int(os.environ.get('ZPMETA_BENCH_YEARS', 10))
+START = Timestamp('2000-01-03')
+
+
+def make_entities(tickers: int = TICKERS, fields: int = FIELDS) -> dict:
+    return dict(ticker=['T%d' % i for i in range(tickers)], field=['F%d' % i for i in range(fields)])
+
+
+def make_period(years: int = YEARS) -> tuple:
+    return START, START + Timedelta(days=years * 365 - 1)
+
+
+class SyntheticSource(PanelSource):
+    """Business-daily random panel of the requested entities, generated without any I/O."""
+    _appendable = dict(xs=True, ts=True)
+
+    def _execute(self, entities=None, period=None):
+        index = bdate_range(period[0], period[1])
+        columns = MultiIndex.from_product(list(entities.values()), names=list(entities.keys()))
+        values = np.random.default_rng(len(index)).standard_normal((len(index), len(columns)))
+        return DataFrame(values, index=index, columns=columns)
+
+
+def warm_source(entities: dict = None, period: tuple = None, caching: dict = None) -> SyntheticSource:
+    """Returns a SyntheticSource with entities and period already cached."""
+    entities = entities if entities is not None else make_entities()
+    period = period if period is not None else make_period()
+    source = SyntheticSource(caching=caching)
+    source(entities, period)
+    return source
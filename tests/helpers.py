@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+from zpmeta.sources.panelsource import PanelSource
+
+DATES = pd.date_range('2020-01-01', periods=60)
+
+
+class FrameSource(PanelSource):
+    """PanelSource serving the rows of a frame in the requested period."""
+    def __init__(self, data: pd.DataFrame, caching: dict = None):
+        super().__init__(None, caching)
+        self.data = data
+
+    def _execute(self, entities=None, period=None):
+        return self.data.loc[period[0]:period[1]].copy()
+
+
+class GridSource(PanelSource):
+    """PanelSource of tickers over DATES, whose value for ticker Tn on day d is d + 100 n. Records its calls."""
+    _appendable = dict(xs=True, ts=True)
+
+    def __init__(self, params=None, caching=None):
+        super().__init__(params, caching)
+        self.calls = []
+
+    def _execute(self, entities=None, period=None):
+        self.calls.append((entities, period))
+        return grid(entities['ticker'], period)
+
+
+def grid(tickers, period) -> pd.DataFrame:
+    index = DATES[(DATES >= period[0]) & (DATES <= period[1])]
+    values = np.add.outer(np.arange(len(index)) + DATES.get_loc(index[0]), [int(t[1:]) * 100 for t in tickers])
+    return pd.DataFrame(values.astype(float), index=index, columns=pd.Index(tickers, name='ticker'))
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+from zpmeta.funcs.batch import stack_operands, unstack_results
+
+INDEX = pd.date_range('2020-01-01', periods=3)
+
+
+def test_unstack_results_selects_columns_by_label():
+    operands = dict(a=pd.Series([1., 2., 3.], index=INDEX), b=pd.Series([4., 5., 6.], index=INDEX))
+    stacked = stack_operands(operands)
+    unstacked = unstack_results(stacked[['b', 'a']] * 2, operands)
+    assert unstacked['a'].tolist() == [2., 4., 6.]
+    assert unstacked['b'].tolist() == [8., 10., 12.]
+
+
+def test_unstack_results_selects_series_by_label():
+    operands = {('x', 1): np.arange(3.), ('y', 2): np.full(3, 5.)}
+    summed = stack_operands(operands).sum()
+    unstacked = unstack_results(summed.iloc[::-1], operands)
+    assert unstacked == {('x', 1): 3., ('y', 2): 15.}
+
+
+def test_unstack_results_raises_on_missing_key():
+    operands = dict(a=np.arange(3.), b=np.arange(3.))
+    stacked = stack_operands(operands)
+    with pytest.raises(ValueError):
+        unstack_results(stacked[['a']], operands)
+    with pytest.raises(ValueError):
+        unstack_results(stacked.set_axis(['a', 'a'], axis=1), operands)
+    with pytest.raises(ValueError):
+        unstack_results(stacked.sum().rename({'b': 'c'}), operands)
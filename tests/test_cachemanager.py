@@ -0,0 +1,69 @@
+import gc
+import os
+import pandas as pd
+import pytest
+from zpmeta.sources.cachemanager import cache_manager
+from tests.helpers import DATES, GridSource, grid
+
+ENTITIES, PERIOD = dict(ticker=['T1', 'T2']), (DATES[0], DATES[19])
+
+
+@pytest.fixture
+def budget():
+    # Sources of earlier tests must not count against the budget.
+    gc.collect()
+    yield cache_manager.configure
+    cache_manager.configure(None, None)
+
+
+def fill(**caching) -> GridSource:
+    source = GridSource(caching=caching)
+    before = cache_manager.nbytes
+    source(ENTITIES, PERIOD)
+    # The bytes reported after the fill.
+    source.accounted = cache_manager.nbytes - before
+    return source
+
+
+def test_sources_are_accounted_without_budget():
+    first, second = fill(), fill()
+    assert first.accounted == second.accounted >= 8 * 2 * 20
+    usage = cache_manager.usage()
+    assert list(usage['source'][-2:]) == [str(first), str(second)] and not usage['spilled'].any()
+
+
+def test_least_recently_used_sources_are_dropped_over_budget(budget):
+    first, second = fill(), fill()
+    budget(max_bytes=int(2.5 * first.accounted))
+    first(ENTITIES, PERIOD)
+    third = fill()
+    assert second.value is None and first.value is not None and third.value is not None
+    assert cache_manager.nbytes <= cache_manager.max_bytes
+    # The dropped cache is refetched.
+    result = second(ENTITIES, PERIOD)
+    assert len(second.calls) == 2
+    pd.testing.assert_frame_equal(result, grid(['T1', 'T2'], PERIOD), check_freq=False)
+
+
+def test_evicted_caches_are_spilled_and_restored(budget, tmp_path):
+    pytest.importorskip('pyarrow')
+    budget(max_bytes=None, spill_dir=str(tmp_path))
+    first = fill()
+    budget(max_bytes=int(1.5 * first.accounted), spill_dir=str(tmp_path))
+    fill()
+    assert first.value is None and first._spill is not None and len(os.listdir(tmp_path)) == 1
+    assert cache_manager.usage()['spilled'].sum() == 1
+    result = first(ENTITIES, (DATES[5], DATES[9]))
+    assert len(first.calls) == 1 and os.listdir(tmp_path) == []
+    pd.testing.assert_frame_equal(result, grid(['T1', 'T2'], (DATES[5], DATES[9])), check_freq=False)
+
+
+def test_evicted_caches_with_a_store_are_reloaded_from_it(budget, tmp_path):
+    pytest.importorskip('pyarrow')
+    first = fill(store=dict(path=str(tmp_path), key='first'))
+    budget(max_bytes=int(1.5 * first.accounted))
+    fill()
+    assert first.value is None and first._spill is None
+    result = first(ENTITIES, PERIOD)
+    assert len(first.calls) == 1
+    pd.testing.assert_frame_equal(result, grid(['T1', 'T2'], PERIOD), check_freq=False)
@@ -0,0 +1,184 @@
+import time
+import threading
+import numpy as np
+import pandas as pd
+from zpmeta.sources.panelsource import PanelSource
+from zpmeta.utils.concurrency import ReadWriteLock, KeyedLocks, RateLimiter
+from tests.helpers import GridSource, grid
+
+DATES = pd.date_range('2020-01-01', periods=30)
+
+
+class SlowSource(PanelSource):
+    def __init__(self, params=None, caching=None):
+        super().__init__(params, caching)
+        self.calls = []
+
+    def _execute(self, entities=None, period=None):
+        self.calls.append(period)
+        time.sleep(0.05)
+        index = DATES[(DATES >= period[0]) & (DATES <= period[1])]
+        return pd.DataFrame(dict(a=np.arange(len(index), dtype=float)), index=index)
+
+
+class TrackingSource(GridSource):
+    """Slow GridSource recording the largest number of concurrent executions."""
+    def __init__(self, params=None, caching=None):
+        super().__init__(params, caching)
+        self.running, self.max_running = 0, 0
+        self._counter = threading.Lock()
+
+    def _execute(self, entities=None, period=None):
+        with self._counter:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05)
+        with self._counter:
+            self.running -= 1
+        return super()._execute(entities, period)
+
+
+def run_threads(target, count: int) -> list:
+    results = [None] * count
+
+    def run(i):
+        results[i] = target()
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_readers_share_the_lock():
+    lock, inside = ReadWriteLock(), []
+    barrier = threading.Barrier(3, timeout=5)
+
+    def read():
+        with lock.read():
+            inside.append(1)
+            barrier.wait()
+    run_threads(read, 3)
+    assert len(inside) == 3
+
+
+def test_writer_excludes_readers():
+    lock, events = ReadWriteLock(), []
+    lock.acquire_write()
+    reader = threading.Thread(target=lambda: (lock.acquire_read(), events.append('read'), lock.release_read()))
+    reader.start()
+    time.sleep(0.05)
+    events.append('write')
+    lock.release_write()
+    reader.join(5)
+    assert events == ['write', 'read']
+
+
+def test_waiting_writer_blocks_new_readers():
+    lock, events = ReadWriteLock(), []
+    lock.acquire_read()
+    writer = threading.Thread(target=lambda: (lock.acquire_write(), events.append('write'), lock.release_write()))
+    writer.start()
+    time.sleep(0.05)
+    reader = threading.Thread(target=lambda: (lock.acquire_read(), events.append('read'), lock.release_read()))
+    reader.start()
+    time.sleep(0.05)
+    assert events == []
+    lock.release_read()
+    writer.join(5)
+    reader.join(5)
+    assert events == ['write', 'read']
+
+
+def test_writer_may_reenter_and_read():
+    lock = ReadWriteLock()
+    with lock.write():
+        with lock.write():
+            with lock.read():
+                pass
+    # Released completely: another thread can write.
+    done = []
+    thread = threading.Thread(target=lambda: (lock.acquire_write(), done.append(1), lock.release_write()))
+    thread.start()
+    thread.join(5)
+    assert done == [1]
+
+
+def test_keyed_locks_are_discarded_when_released():
+    locks = KeyedLocks()
+    with locks.lock('a'):
+        with locks.lock('a'):
+            assert len(locks) == 1
+    assert len(locks) == 0
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(20)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.2 - 0.01
+
+
+def test_concurrent_calls_fill_once():
+    source = SlowSource()
+    period = (DATES[0], DATES[-1])
+    results = run_threads(lambda: source(None, period), 4)
+    assert len(source.calls) == 1
+    for result in results:
+        assert len(result) == len(DATES)
+
+
+def test_concurrent_calls_fetch_only_what_is_missing():
+    source = SlowSource()
+    source(None, (DATES[0], DATES[9]))
+    run_threads(lambda: source(None, (DATES[0], DATES[19])), 3)
+    assert source.calls == [(DATES[0], DATES[9]), (DATES[9], DATES[19])]
+
+
+def test_fills_of_disjoint_periods_run_concurrently():
+    source = TrackingSource()
+    source(dict(ticker=['T1']), (DATES[0], DATES[9]))
+    periods = iter([(DATES[12], DATES[15]), (DATES[22], DATES[25])])
+    run_threads(lambda: source(dict(ticker=['T1']), next(periods)), 2)
+    assert source.max_running == 2
+    assert len(source.coverage.missing((DATES[22], DATES[25]))) == 0
+    assert len(source.coverage.missing((DATES[12], DATES[15]))) == 0
+    assert len(source.coverage.missing((DATES[0], DATES[15]))) == 1
+    pd.testing.assert_frame_equal(source(dict(ticker=['T1']), (DATES[12], DATES[25])),
+                                  grid(['T1'], (DATES[12], DATES[25])), check_freq=False)
+
+
+def test_fills_of_overlapping_periods_wait_and_fetch_the_rest():
+    source = TrackingSource()
+    source(dict(ticker=['T1']), (DATES[0], DATES[9]))
+    periods = iter([(DATES[12], DATES[15]), (DATES[14], DATES[20])])
+    run_threads(lambda: source(dict(ticker=['T1']), next(periods)), 2)
+    assert source.max_running == 1 and len(source.calls) == 3
+    # The waiting fill only fetches what the other one left missing.
+    assert source.calls[2][1][0] >= DATES[15]
+    pd.testing.assert_frame_equal(source(dict(ticker=['T1']), (DATES[12], DATES[20])),
+                                  grid(['T1'], (DATES[12], DATES[20])), check_freq=False)
+
+
+def test_fills_of_disjoint_entities_run_concurrently():
+    source = TrackingSource()
+    source(dict(ticker=['T1']), (DATES[0], DATES[9]))
+    tickers = iter(['T2', 'T3'])
+    run_threads(lambda: source(dict(ticker=[next(tickers)]), (DATES[0], DATES[9])), 2)
+    assert source.max_running == 2 and sorted(source.entities['ticker']) == ['T1', 'T2', 'T3']
+    result = source(dict(ticker=['T1', 'T2', 'T3']), (DATES[0], DATES[9]))
+    assert len(source.calls) == 3
+    pd.testing.assert_frame_equal(result, grid(['T1', 'T2', 'T3'], (DATES[0], DATES[9])), check_freq=False,
+                                  check_like=True)
+
+
+def test_fills_of_new_entities_and_new_periods_are_serialized():
+    source = TrackingSource()
+    source(dict(ticker=['T1']), (DATES[0], DATES[9]))
+    calls = iter([(dict(ticker=['T2']), (DATES[0], DATES[9])), (dict(ticker=['T1']), (DATES[20], DATES[25]))])
+    run_threads(lambda: source(*next(calls)), 2)
+    assert source.max_running == 1
+    pd.testing.assert_frame_equal(source(dict(ticker=['T1', 'T2']), (DATES[0], DATES[9])),
+                                  grid(['T1', 'T2'], (DATES[0], DATES[9])), check_freq=False, check_like=True)
@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+from zpmeta.sources.coverage import IntervalSet, period_windows
+
+
+def test_add_merges_overlapping_and_touching_intervals():
+    intervals = IntervalSet([(5, 7), (1, 2)])
+    intervals.add((2, 3))
+    assert list(intervals) == [(1, 3), (5, 7)]
+    intervals.add((3, 5))
+    assert list(intervals) == [(1, 7)]
+    assert intervals.bounds == (1, 7)
+
+
+def test_add_rejects_reversed_intervals():
+    with pytest.raises(ValueError):
+        IntervalSet().add((2, 1))
+
+
+def test_missing_returns_gaps_sharing_end_points():
+    intervals = IntervalSet([(1, 3), (5, 7)])
+    assert intervals.missing((0, 10)) == [(0, 1), (3, 5), (7, 10)]
+    assert intervals.missing((2, 6)) == [(3, 5)]
+    assert intervals.missing((1, 3)) == []
+    assert intervals.covers((5, 7))
+    assert IntervalSet().missing((1, 2)) == [(1, 2)]
+
+
+def test_remove_leaves_the_interval_as_a_gap():
+    intervals = IntervalSet([(1, 10)])
+    intervals.remove((3, 5))
+    assert list(intervals) == [(1, 3), (5, 10)]
+    assert intervals.missing((1, 10)) == [(3, 5)]
+
+
+def test_truncate():
+    intervals = IntervalSet([(1, 3), (5, 9)])
+    intervals.truncate(before=2, after=6)
+    assert list(intervals) == [(2, 3), (5, 6)]
+
+
+def test_period_windows_are_inclusive_and_consecutive():
+    windows = period_windows((pd.Timestamp('2020-01-01'), pd.Timestamp('2020-01-10')), '4D')
+    assert [(str(start.date()), str(end.date())) for start, end in windows] == [
+        ('2020-01-01', '2020-01-04'), ('2020-01-05', '2020-01-08'), ('2020-01-09', '2020-01-10')]
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+from zpmeta.sources.derived import DerivedPanelSource
+from tests.helpers import FrameSource
+
+DATES = pd.date_range('2020-01-01', periods=30, freq='B')
+
+
+def rolling_mean(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame.rolling(3).mean()
+
+
+def test_row_lookback_on_empty_upstream():
+    data = pd.DataFrame(dict(a=np.arange(30.)), index=DATES)
+    derived = DerivedPanelSource(FrameSource(data), rolling_mean, lookback=2)
+    result = derived(None, (DATES[10], DATES[15]))
+    expected = rolling_mean(data).loc[DATES[10]:DATES[15]]
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
+
+
+def test_row_lookback_extends_partially_cached_upstream():
+    data = pd.DataFrame(dict(a=np.arange(30.)), index=DATES)
+    upstream = FrameSource(data)
+    upstream(None, (DATES[9], DATES[20]))
+    derived = DerivedPanelSource(upstream, rolling_mean, lookback=2)
+    result = derived(None, (DATES[10], DATES[15]))
+    assert not result.isna().any().any()
+
+
+def test_offset_lookback():
+    data = pd.DataFrame(dict(a=np.arange(30.)), index=DATES)
+    derived = DerivedPanelSource(FrameSource(data), rolling_mean, lookback='7D')
+    assert not derived(None, (DATES[10], DATES[15])).isna().any().any()
+
+
+def test_upstream_tail_refresh_invalidates_cached_rows():
+    data = pd.DataFrame(dict(a=np.arange(30.)), index=DATES)
+    upstream = FrameSource(data, dict(ts_anchor='cache', ts_refresh=2))
+    derived = DerivedPanelSource(upstream, rolling_mean, lookback=2)
+    derived(None, (DATES[0], DATES[10]))
+    data.iloc[9:12, 0] = 100.
+    # The refreshed upstream rows before the computed period are recomputed by the next call.
+    derived(None, (DATES[0], DATES[12]))
+    result = derived(None, (DATES[0], DATES[12]))
+    expected = rolling_mean(data).loc[DATES[0]:DATES[12]]
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
+
+
+def test_upstream_refill_invalidates_derived_rows():
+    data = pd.DataFrame(dict(a=np.arange(30.)), index=DATES)
+    upstream = FrameSource(data)
+    derived = DerivedPanelSource(upstream, rolling_mean, lookback=2)
+    derived(None, (DATES[0], DATES[20]))
+    data.iloc[5, 0] = -1.
+    upstream.coverage.remove((DATES[4], DATES[6]))
+    upstream(None, (DATES[0], DATES[20]))
+    result = derived(None, (DATES[0], DATES[20]))
+    expected = rolling_mean(data).loc[DATES[0]:DATES[20]]
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
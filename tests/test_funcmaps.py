@@ -0,0 +1,82 @@
+import time
+import asyncio
+import threading
+import pytest
+from zpmeta.funcs.executors import ThreadExecutor
+from zpmeta.funcs.funcmaps import _Map, MapOperands, MapParams
+
+
+async def double(operand=None, params=None):
+    await asyncio.sleep(0)
+    return operand * 2
+
+
+def add(operand=None, params=None):
+    return operand + params['n']
+
+
+def test_acall_runs_asyncio_map_in_a_running_loop():
+    mapper = MapOperands(double, executor='asyncio')
+
+    async def main():
+        return await mapper.acall(dict(a=1, b=2))
+
+    assert asyncio.run(main()) == dict(a=2, b=4)
+
+
+def test_call_of_asyncio_map_in_a_running_loop_raises():
+    async def main():
+        MapOperands(double, executor='asyncio')(dict(a=1))
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(main())
+
+
+@pytest.mark.parametrize('executor', ['serial', 'thread'])
+def test_acall_runs_other_executors_on_a_thread(executor):
+    mapper = MapParams(add, executor=executor)
+
+    async def main():
+        return await mapper.acall(1, dict(x=dict(n=1), y=dict(n=2)))
+
+    assert asyncio.run(main()) == dict(x=2, y=3)
+    assert mapper(1, dict(x=dict(n=1))) == dict(x=2)
+
+
+def test_maps_must_define_their_calls():
+    class NoCalls(_Map):
+        pass
+
+    with pytest.raises(TypeError):
+        NoCalls()
+
+
+def test_maps_shut_down_the_pools_they_own():
+    with MapParams(add, executor='thread', max_workers=2) as mapper:
+        assert mapper(1, dict(x=dict(n=1), y=dict(n=2))) == dict(x=2, y=3)
+        pool = mapper.executor._pool
+        assert mapper(1, dict(x=dict(n=1))) == dict(x=2) and mapper.executor._pool is pool
+    assert mapper.executor._pool is None
+
+    with ThreadExecutor(max_workers=2) as executor:
+        with MapOperands(add, dict(n=1), executor=executor) as mapper:
+            assert mapper(dict(a=1, b=2)) == dict(a=2, b=3)
+        assert executor._pool is not None
+    assert executor._pool is None
+
+
+def test_throttled_pools_start_at_most_max_workers_chunks():
+    running, peak, lock = [], [], threading.Lock()
+
+    def work(operand=None, params=None):
+        with lock:
+            running.append(operand)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(operand)
+        return operand
+
+    with ThreadExecutor(max_workers=2) as executor:
+        results = executor({i: (work, (i,)) for i in range(6)}, throttle=lambda: None)
+    assert results == {i: i for i in range(6)} and max(peak) <= 2
@@ -0,0 +1,76 @@
+import pytest
+from zpmeta.funcs.funcchains import Chain
+from zpmeta.funcs.graph import Graph, Input, Node
+
+
+class Recorder:
+    def __init__(self, func):
+        self.func = func
+        self.calls = []
+
+    def __call__(self, operand=None, params=None):
+        self.calls.append(operand)
+        return self.func(operand, params)
+
+
+def add(operand, params):
+    return operand + (params or {}).get('by', 1)
+
+
+def double(operand, params):
+    return operand * 2
+
+
+def total(operand, params):
+    return sum(operand.values()) if isinstance(operand, dict) else sum(operand)
+
+
+def test_chain_applies_the_innermost_func_first():
+    chain = Chain([double, add])
+    assert chain(3) == 8
+    assert chain(3, [None, dict(by=2)]) == 10
+
+
+def test_chain_to_node_evaluates_like_the_chain():
+    chain = Chain([double, add])
+    node = chain.to_node(Input(), [None, dict(by=2)])
+    assert node.func is double and node.inputs.func is add
+    assert Graph(node)(3) == chain(3, [None, dict(by=2)])
+
+
+def test_graph_evaluates_only_the_requested_outputs():
+    left, right = Recorder(double), Recorder(add)
+    source = Input()
+    graph = Graph(dict(left=Node(left, source), right=Node(right, source)))
+    assert graph(5) == dict(left=10, right=6)
+    assert graph.evaluate(dict(operand=1), outputs=['left']) == dict(left=2)
+    assert left.calls == [5, 1] and right.calls == [5]
+
+
+def test_graph_evaluates_equal_calls_once():
+    upstream = Recorder(add)
+    source = Input()
+    first, second = Node(upstream, source, dict(by=2)), Node(upstream, source, dict(by=2))
+    graph = Graph(Node(total, [first, second, Node(upstream, source, dict(by=3))]))
+    assert graph(1) == 3 + 3 + 4
+    assert upstream.calls == [1, 1]
+
+
+def test_graph_params_override_nodes_by_name():
+    source = Input()
+    graph = Graph(Node(total, dict(a=Node(add, source, dict(by=2), name='a'), b=Node(double, source), c=10)))
+    assert graph(1) == 3 + 2 + 10
+    assert graph(1, params=dict(a=dict(by=5))) == 6 + 2 + 10
+
+
+def test_graph_feeds_named_inputs():
+    graph = Graph(Node(total, [Input('x'), Input('y')]))
+    assert graph(dict(x=1, y=2)) == 3
+    with pytest.raises(KeyError):
+        graph(dict(x=1))
+
+
+def test_graph_runs_waves_on_a_thread_executor():
+    source = Input()
+    nodes = [Node(add, source, dict(by=by)) for by in range(5)]
+    assert Graph(Node(total, nodes), executor='thread', max_workers=2)(1) == sum(1 + by for by in range(5))
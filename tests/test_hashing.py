@@ -0,0 +1,78 @@
+import functools
+import numpy as np
+import pandas as pd
+from zpmeta.funcs.func import Func
+from zpmeta.utils.hashing import stable_hash
+
+
+class Apply(Func):
+    def __init__(self, memo=True):
+        super().__init__(memo=memo)
+
+    def _execute(self, operand=None, params: dict = None):
+        return params['fn'](operand)
+
+
+class Counter:
+    def scaled(self, x):
+        return x
+
+
+def adder(k):
+    return lambda x: x + k
+
+
+def test_containers_are_hashed_by_content():
+    assert stable_hash(dict(a=1, b=[1, 2])) == stable_hash(dict(b=[1, 2], a=1))
+    assert stable_hash((1, 2)) != stable_hash([1, 2])
+    assert stable_hash(1) != stable_hash(1.0) != stable_hash(True)
+    assert stable_hash(np.arange(3)) == stable_hash(np.arange(3))
+    assert stable_hash(pd.Series([1., 2.])) != stable_hash(pd.Series([1., 3.]))
+
+
+def test_importable_functions_are_hashed_by_name():
+    assert stable_hash(np.mean) == stable_hash(np.mean)
+    assert stable_hash(adder) == stable_hash(adder)
+    assert stable_hash(np.mean) != stable_hash(np.median)
+
+
+def test_lambdas_with_the_same_qualname_differ():
+    assert stable_hash(lambda x: x + 1) != stable_hash(lambda x: x * 100)
+
+
+def test_closures_are_hashed_by_their_contents():
+    assert stable_hash(adder(1)) != stable_hash(adder(2))
+    assert stable_hash(adder(1)) == stable_hash(adder(1))
+    assert stable_hash(functools.partial(adder(1), 2)) != stable_hash(functools.partial(adder(2), 2))
+
+
+def test_bound_methods_include_their_instance():
+    first, second = Counter(), Counter()
+    assert stable_hash(first.scaled) == stable_hash(first.scaled)
+    assert stable_hash(first.scaled) != stable_hash(second.scaled)
+
+
+def test_recursive_closures_terminate():
+    def make():
+        def countdown(n):
+            return countdown(n - 1) if n > 0 else 0
+        return countdown
+    assert stable_hash(make()) == stable_hash(make())
+
+
+def test_memo_keys_distinguish_callable_params():
+    func = Apply()
+    assert func(1, dict(fn=lambda x: x + 1)) == 2
+    assert func(1, dict(fn=lambda x: x * 100)) == 100
+    assert func(1, dict(fn=lambda x: x + 1)) == 2
+    assert func.memo.stats()['hits'] == 1
+
+
+def test_memo_keys_include_operand_and_params():
+    func = Apply()
+    func(1, dict(fn=abs))
+    func(-1, dict(fn=abs))
+    func(1, dict(fn=str))
+    assert func.memo.stats()['misses'] == 3
+    func(-1, dict(fn=abs))
+    assert func.memo.stats()['hits'] == 1
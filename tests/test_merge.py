@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+from zpmeta.sources.compact import compact_frame
+from zpmeta.sources.merge import merge_frames, align_dtypes, PanelBuffer
+from zpmeta.sources.panelsource import PanelSource
+from tests.helpers import FrameSource
+
+DATES = pd.date_range('2020-01-01', periods=6)
+
+
+def test_merge_frames_upcasts_integers():
+    old = pd.DataFrame(dict(a=np.array([1, 2], dtype='uint8')), index=DATES[:2])
+    new = pd.DataFrame(dict(a=np.array([100000], dtype='int64')), index=DATES[2:3])
+    merged = merge_frames(old, new)
+    assert merged['a'].tolist() == [1, 2, 100000]
+    assert merged['a'].dtype == np.result_type('uint8', 'int64')
+
+
+def test_merge_frames_does_not_downcast_below_cache():
+    old = pd.DataFrame(dict(a=np.array([1, 70000], dtype='int32')), index=DATES[:2])
+    new = pd.DataFrame(dict(a=np.array([3], dtype='uint8')), index=DATES[1:2])
+    merged = merge_frames(old, new)
+    assert merged['a'].dtype == np.dtype('int32')
+    assert merged['a'].tolist() == [1, 3]
+
+
+def test_merge_frames_overwrites_with_wider_values():
+    old = pd.DataFrame(dict(a=np.array([1, 2], dtype='uint8')), index=DATES[:2])
+    new = pd.DataFrame(dict(a=np.array([70000], dtype='int64')), index=DATES[1:2])
+    assert merge_frames(old, new)['a'].tolist() == [1, 70000]
+
+
+def test_merge_frames_unions_categories():
+    old = pd.DataFrame(dict(b=pd.Categorical(['x', 'x'])), index=DATES[:2])
+    new = pd.DataFrame(dict(b=['y', 'z']), index=DATES[1:3])
+    merged = merge_frames(old, new)
+    assert isinstance(merged['b'].dtype, pd.CategoricalDtype)
+    assert merged['b'].tolist() == ['x', 'y', 'z']
+    assert list(merged['b'].cat.categories) == ['x', 'y', 'z']
+
+
+def test_align_dtypes_keeps_equal_dtypes():
+    old = pd.DataFrame(dict(a=[1., 2.]), index=DATES[:2])
+    new = pd.DataFrame(dict(a=[3.]), index=DATES[2:3])
+    aligned_old, aligned_new = align_dtypes(old, new)
+    assert aligned_old is old and aligned_new is new
+
+
+def test_compact_frame_downcasts_each_chunk():
+    frame = pd.DataFrame(dict(a=[1, 2, 3], b=['x', 'x', 'x'], c=[1., 2., 3.]), index=DATES[:3])
+    compacted = compact_frame(frame, float_dtype='float32', integer=True, categorical=0.5)
+    assert compacted['a'].dtype == np.dtype('uint8')
+    assert isinstance(compacted['b'].dtype, pd.CategoricalDtype)
+    assert compacted['c'].dtype == np.dtype('float32')
+
+
+def test_compact_frame_keeps_nullable_integers_with_na():
+    frame = pd.DataFrame(dict(a=pd.array([-100000, None, 3001], dtype='Int64'),
+                              b=pd.array([1, 2, None], dtype='UInt32'),
+                              c=pd.array([None, None, None], dtype='Int64')), index=DATES[:3])
+    compacted = compact_frame(frame, integer=True)
+    assert compacted.dtypes.astype(str).to_dict() == dict(a='Int32', b='UInt8', c='Int32')
+    assert compacted['a'].tolist() == [-100000, pd.NA, 3001]
+    assert compacted['b'].tolist() == [1, 2, pd.NA]
+    assert compacted['c'].isna().all()
+
+
+def test_compact_cache_grows_dtypes_with_later_fills():
+    data = pd.DataFrame(dict(a=[1, 2, 3, 100000, 5, 6], b=list('xxxyyz')), index=DATES)
+    source = FrameSource(data, dict(compact=True))
+    source(None, (DATES[0], DATES[2]))
+    assert source.value['a'].dtype == np.dtype('uint8')
+    result = source(None, (DATES[0], DATES[5]))
+    assert result['a'].tolist() == data['a'].tolist()
+    assert result['b'].tolist() == data['b'].tolist()
+
+
+def test_compact_cache_refreshes_tail_with_wider_values():
+    data = pd.DataFrame(dict(a=[1, 2, 3, 4, 5, 6]), index=DATES)
+    source = FrameSource(data, dict(compact=True, ts_anchor='cache', ts_refresh=1))
+    source(None, (DATES[0], DATES[2]))
+    data.iloc[2, 0] = 70000
+    result = source(None, (DATES[0], DATES[4]))
+    assert result['a'].tolist() == [1, 2, 70000, 4, 5]
+
+
+def test_panel_buffer_appends_and_overwrites():
+    buffer = PanelBuffer(pd.DataFrame(dict(a=[1., 2.]), index=DATES[:2]))
+    merged = buffer.merge(pd.DataFrame(dict(a=[5., 3.], b=[4., 4.]), index=DATES[1:3]))
+    assert merged['a'].tolist() == [1., 5., 3.]
+    assert merged['b'].isna().tolist() == [True, False, False]
+    assert buffer.holds(merged)
+
+
+def test_panel_buffer_copies_shared_frames_on_write():
+    buffer = PanelBuffer(pd.DataFrame(dict(a=[1., 2.]), index=DATES[:2]))
+    shared = buffer.frame().copy(deep=False)
+    buffer.share(shared)
+    buffer.merge(pd.DataFrame(dict(a=[9.]), index=DATES[1:2]))
+    assert shared['a'].tolist() == [1., 2.]
+    assert buffer.frame()['a'].tolist() == [1., 9.]
+
+
+def test_subset_views_keep_their_values():
+    data = pd.DataFrame(dict(a=np.arange(6.), b=np.arange(6.)), index=DATES)
+    source = FrameSource(data, dict(subset='view'))
+    source(None, (DATES[0], DATES[1]))
+    view = source(None, (DATES[0], DATES[2]))
+    data.iloc[2] = 9.
+    # The fill of the gap refetches the boundary row.
+    source(None, (DATES[0], DATES[5]))
+    assert view.iloc[-1].tolist() == [2., 2.]
+    assert source(None, (DATES[2], DATES[2])).iloc[0].tolist() == [9., 9.]
+
+
+def test_merge_frames_keeps_integer_dtype_of_new_columns():
+    old = pd.DataFrame(dict(a=np.array([1, 2, 3])), index=DATES[:3])
+    new = pd.DataFrame(dict(b=np.array([4, 5, 6])), index=DATES[:3])
+    merged = merge_frames(old, new)
+    assert merged.dtypes.tolist() == [np.dtype('int64'), np.dtype('int64')]
+
+
+def test_merge_frames_makes_integer_columns_with_gaps_nullable():
+    old = pd.DataFrame(dict(a=np.array([1, 2, 3]), c=[True, False, True]), index=DATES[:3])
+    new = pd.DataFrame(dict(b=np.array([5, 6], dtype='int32'), d=[False, True]), index=DATES[1:3])
+    merged = merge_frames(old, new)
+    assert merged['b'].dtype == pd.Int32Dtype() and merged['d'].dtype == pd.BooleanDtype()
+    assert merged['b'].isna().tolist() == [True, False, False]
+    # Later chunks align with the nullable columns.
+    merged = merge_frames(merged, pd.DataFrame(dict(b=[1.5]), index=DATES[:1]))
+    assert merged['b'].dtype == np.dtype('float64') and merged['b'].tolist() == [1.5, 5., 6.]
+
+
+def test_xs_update_keeps_integer_dtypes():
+    class IntSource(PanelSource):
+        _appendable = dict(xs=True, ts=True)
+
+        def _execute(self, entities=None, period=None):
+            index = DATES[(DATES >= period[0]) & (DATES <= period[1])]
+            tickers = entities['ticker']
+            return pd.DataFrame(np.ones((len(index), len(tickers)), dtype='int64'), index=index,
+                                columns=pd.Index(tickers, name='ticker'))
+
+    source = IntSource()
+    source(dict(ticker=['T1']), (DATES[0], DATES[-1]))
+    result = source(dict(ticker=['T1', 'T2']), (DATES[0], DATES[-1]))
+    assert result.dtypes.tolist() == [np.dtype('int64'), np.dtype('int64')]
@@ -0,0 +1,76 @@
+import pytest
+from zpmeta.funcs.func import Func
+from zpmeta.utils.common_utils import nbytes
+from zpmeta.utils.metrics import metrics, MemorySink, PrometheusTextSink, CallbackSink
+from tests.helpers import DATES, GridSource
+
+
+class Square(Func):
+    @classmethod
+    def _execute(cls, operand=None, params=None):
+        return operand ** 2
+
+
+@pytest.fixture
+def sink():
+    sink = metrics.add_sink(MemorySink())
+    yield sink
+    metrics.remove_sink(sink)
+
+
+def test_metrics_are_disabled_without_sinks():
+    assert not metrics.enabled
+    sink = metrics.add_sink(CallbackSink(lambda *args: None))
+    assert metrics.enabled
+    metrics.remove_sink(sink)
+    assert not metrics.enabled
+
+
+def test_panelsource_reports_hits_misses_and_bytes(sink):
+    source = GridSource(caching=dict(name='grid'))
+    results = [source(dict(ticker=['T1']), (DATES[0], DATES[9])), source(dict(ticker=['T1']), (DATES[2], DATES[5])),
+               source(dict(ticker=['T1', 'T2']), (DATES[0], DATES[9]))]
+    assert sink.value('panelsource_calls', source='grid') == 3
+    assert sink.value('panelsource_calls', source='grid', result='hit') == 1
+    assert sink.ratio('panelsource_calls', 'result', 'hit', source='grid') == pytest.approx(1 / 3)
+    # The last call only misses the new entity.
+    assert sink.value('panelsource_period_lookups', result='hit') == 2
+    assert sink.value('panelsource_entity_lookups', result='miss') == 2
+    # Two fetches of 10 rows of one column.
+    assert sink.value('panelsource_bytes_fetched', source='grid') == 2 * nbytes(results[0])
+    assert sink.value('panelsource_bytes_served', source='grid') == sum(nbytes(result) for result in results)
+    phases = set(dict(labels)['phase'] for name, labels in sink.timings if name == 'panelsource_phase')
+    assert phases == {'plan', 'execute', 'merge', 'copy'}
+
+
+def test_func_reports_executions_and_memo_hits(sink):
+    func = Square(memo=True)
+    assert [func(2), func(2), func(3)] == [4, 4, 9]
+    assert sink.value('func_memo', func='Square', result='hit') == 1
+    assert sink.value('func_memo', func='Square', result='miss') == 2
+    assert sink.timings[('func_execute', (('func', 'Square'),))][0] == 2
+
+
+def test_prometheus_sink_writes_counters_and_summaries(tmp_path):
+    sink = PrometheusTextSink(str(tmp_path / 'metrics.prom'))
+    sink.count('calls', (('source', 'a "b"'),), 2)
+    sink.observe('phase', (('phase', 'plan'),), 0.5)
+    sink.flush()
+    lines = (tmp_path / 'metrics.prom').read_text().splitlines()
+    assert lines == ['# TYPE zpmeta_calls_total counter',
+                     'zpmeta_calls_total{source="a \\"b\\""} 2.0',
+                     '# TYPE zpmeta_phase_seconds summary',
+                     'zpmeta_phase_seconds_count{phase="plan"} 1',
+                     'zpmeta_phase_seconds_sum{phase="plan"} 0.5']
+
+
+def test_callback_sink_receives_labels_as_dicts():
+    received = []
+    sink = metrics.add_sink(CallbackSink(lambda *args: received.append(args)))
+    try:
+        Square()(3)
+    finally:
+        metrics.remove_sink(sink)
+    assert len(received) == 1
+    kind, name, labels, seconds = received[0]
+    assert (kind, name, labels) == ('observe', 'func_execute', dict(func='Square')) and seconds >= 0
@@ -0,0 +1,75 @@
+import time
+import pickle
+import numpy as np
+import pandas as pd
+from zpmeta.sources.panelsource import PanelSource, _Fetcher
+from tests.helpers import DATES, GridSource, grid
+
+
+class RangeSource(PanelSource):
+    def _execute(self, entities=None, period=None):
+        index = DATES[(DATES >= period[0]) & (DATES <= period[1])]
+        return pd.DataFrame(dict(a=np.arange(len(index), dtype=float)), index=index)
+
+
+def test_fetcher_pickles_source_without_cache():
+    source = RangeSource(caching=dict(rate_limit=1))
+    source(None, (DATES[0], DATES[-1]))
+    source.value = pd.DataFrame(dict(a=np.zeros(10 ** 5)))
+    fetcher = pickle.loads(pickle.dumps(_Fetcher(source)))
+    assert fetcher.source.value is None and fetcher.source._limiter is None
+    assert len(pickle.dumps(_Fetcher(source))) < 10 ** 4
+
+
+def test_rate_limit_applies_to_process_executor():
+    source = RangeSource(caching=dict(executor='process', max_workers=3, rate_limit=5, chunks=dict(period='10D')))
+    start = time.monotonic()
+    try:
+        result = source(None, (DATES[0], DATES[-1]))
+    finally:
+        source._executor.shutdown()
+    # Six fetches spaced 0.2s apart.
+    assert time.monotonic() - start >= 1.
+    assert len(result) == len(DATES)
+
+
+class ChunkedGridSource(GridSource):
+    def _execute(self, entities=None, period=None):
+        # One chunk per ticker.
+        self.calls.append((entities, period))
+        return (grid([ticker], period) for ticker in entities['ticker'])
+
+
+def test_chunks_split_calls_into_windows_and_entity_batches():
+    tickers = ['T1', 'T2', 'T3']
+    source = GridSource(caching=dict(chunks=dict(period='10D', entities=2)))
+    result = source(dict(ticker=tickers), (DATES[0], DATES[29]))
+    assert len(source.calls) == 3 * 2
+    assert sorted(len(entities['ticker']) for entities, _ in source.calls) == [1, 1, 1, 2, 2, 2]
+    assert max(period[1] - period[0] for _, period in source.calls) < pd.Timedelta('10D')
+    pd.testing.assert_frame_equal(result, grid(tickers, (DATES[0], DATES[29])), check_freq=False)
+
+
+def test_execute_may_return_chunks():
+    source = ChunkedGridSource()
+    result = source(dict(ticker=['T1', 'T2']), (DATES[0], DATES[9]))
+    pd.testing.assert_frame_equal(result, grid(['T1', 'T2'], (DATES[0], DATES[9])), check_freq=False)
+
+
+def test_stream_without_cache_yields_executed_chunks():
+    source = ChunkedGridSource(caching=dict(chunks=dict(period='10D')))
+    chunks = list(source.stream(dict(ticker=['T1', 'T2']), (DATES[0], DATES[19]), cache=False))
+    assert [chunk.shape for chunk in chunks] == [(10, 1)] * 4
+    assert source.value is None
+    result = pd.concat([pd.concat(chunks[i:i + 2], axis=1) for i in (0, 2)])
+    pd.testing.assert_frame_equal(result, grid(['T1', 'T2'], (DATES[0], DATES[19])), check_freq=False)
+
+
+def test_stream_with_cache_fills_and_yields_from_the_cache():
+    source = GridSource(caching=dict(chunks=dict(period='10D')))
+    entities, period = dict(ticker=['T1', 'T2']), (DATES[0], DATES[19])
+    chunks = list(source.stream(entities, period))
+    assert [chunk.shape for chunk in chunks] == [(10, 2)] * 2 and len(source.calls) == 2
+    pd.testing.assert_frame_equal(pd.concat(chunks), grid(['T1', 'T2'], period), check_freq=False)
+    list(source.stream(entities, period))
+    assert len(source.calls) == 2
@@ -0,0 +1,89 @@
+import os
+import datetime
+import pandas as pd
+import pytest
+from tests.helpers import DATES, GridSource, grid
+
+pa = pytest.importorskip('pyarrow')
+
+
+def make(tmp_path, **store):
+    return GridSource(None, dict(store=dict(path=str(tmp_path), key='grid', **store), executor=None))
+
+
+def expected(tickers, start, end):
+    return grid(tickers, (DATES[start], DATES[end]))
+
+
+def fragments(tmp_path):
+    return [name for name in os.listdir(tmp_path / 'grid') if name.endswith('.parquet')]
+
+
+def test_store_round_trip(tmp_path):
+    entities = dict(ticker=['T1', 'T2'])
+    make(tmp_path)(entities, (DATES[0], DATES[9]))
+    source = make(tmp_path)
+    result = source(entities, (DATES[0], DATES[9]))
+    assert source.calls == []
+    pd.testing.assert_frame_equal(result, expected(['T1', 'T2'], 0, 9), check_freq=False)
+
+
+def test_store_compacts_fragments(tmp_path):
+    source = make(tmp_path, compact_after=3)
+    entities = dict(ticker=['T1'])
+    for end in range(5, 40, 5):
+        source(entities, (DATES[0], DATES[end]))
+    assert len(fragments(tmp_path)) <= 4
+    result = make(tmp_path)(entities, (DATES[0], DATES[35]))
+    pd.testing.assert_frame_equal(result, expected(['T1'], 0, 35), check_freq=False)
+
+
+def test_store_merges_the_coverage_of_processes(tmp_path):
+    entities = dict(ticker=['T1'])
+    first, second = make(tmp_path), make(tmp_path)
+    second.load()
+    first(entities, (DATES[0], DATES[9]))
+    second(entities, (DATES[20], DATES[29]))
+    third = make(tmp_path)
+    third(entities, (DATES[0], DATES[9]))
+    third(entities, (DATES[20], DATES[29]))
+    assert third.calls == []
+
+
+def test_store_keeps_other_processes_consistent_after_clear(tmp_path):
+    entities = dict(ticker=['T1'])
+    first = make(tmp_path)
+    first(entities, (DATES[0], DATES[9]))
+    second = make(tmp_path)
+    second(entities, (DATES[0], DATES[9]))
+    first.reset()
+    first(dict(ticker=['T2']), (DATES[0], DATES[4]))
+    # The increment of the second process extends fragments deleted by the first one.
+    second(entities, (DATES[0], DATES[19]))
+    third = make(tmp_path)
+    result = third(entities, (DATES[0], DATES[19]))
+    assert third.calls == []
+    pd.testing.assert_frame_equal(result, expected(['T1'], 0, 19), check_freq=False)
+
+
+def test_params_need_not_be_json_serializable(tmp_path):
+    params = dict(start=datetime.date(2020, 1, 1), fields={'a', 'b'})
+    assert GridSource(params)._store is None
+    first = GridSource(params, dict(store=dict(path=str(tmp_path))))
+    second = GridSource(dict(params), dict(store=dict(path=str(tmp_path))))
+    assert first._store.path == second._store.path
+
+
+def test_arrow_store_is_partitioned_by_month_and_memory_mapped(tmp_path):
+    entities = dict(ticker=['T1'])
+    source = GridSource(None, dict(store=dict(path=str(tmp_path), key='grid', format='arrow')))
+    source(entities, (DATES[0], DATES[39]))
+    names = sorted(name for name in os.listdir(tmp_path / 'grid') if name.endswith('.arrow'))
+    assert [name[:7] for name in names] == ['2020-01', '2020-02']
+    allocated = pa.total_allocated_bytes()
+    table = source._store._read_file(names[0])
+    # The table references the mapped file instead of memory allocated by Arrow.
+    assert table.num_rows == 31 and pa.total_allocated_bytes() == allocated
+    store = dict(path=str(tmp_path), key='grid', format='arrow')
+    result = GridSource(None, dict(store=store))(entities, (DATES[0], DATES[39]))
+    pd.testing.assert_frame_equal(result, expected(['T1'], 0, 39), check_freq=False)
@@ -0,0 +1,91 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from zpmeta.funcs.func import Func
+from zpmeta.utils.common_utils import deep_update
+from zpmeta.utils.params import LayeredParams
+
+
+class Echo(Func):
+    @classmethod
+    def _std_params(cls, name: str = None) -> dict:
+        return dict(window=5, opts=dict(method='lin', levels=[1, 2]))
+
+    def _execute(self, operand=None, params: dict = None):
+        return params
+
+
+class Mutate(Echo):
+    def _execute(self, operand=None, params: dict = None):
+        params['opts']['levels'].append(3)
+        params['frame'].iloc[0, 0] = -1.
+        params['opts']['method'] = 'exp'
+        return params
+
+
+def test_deep_update_merges_mappings():
+    updated = deep_update(LayeredParams({'opts': {'a': 1, 'b': 2}}), {'opts': {'c': 3}})
+    assert dict(updated['opts']) == {'a': 1, 'b': 2, 'c': 3}
+    assert deep_update({'opts': {'a': 1}}, LayeredParams({'opts': {'b': 2}})) == {'opts': {'a': 1, 'b': 2}}
+
+
+def test_layered_params_read_through_layers():
+    base = dict(a=1, opts=dict(x=1, y=2))
+    params = LayeredParams(base, dict(opts=dict(y=3)))
+    assert params.to_dict() == dict(a=1, opts=dict(x=1, y=3))
+    params['opts']['z'] = 4
+    del params['a']
+    assert params.to_dict() == dict(opts=dict(x=1, y=3, z=4))
+    assert base == dict(a=1, opts=dict(x=1, y=2))
+
+
+def test_execute_receives_a_read_only_view():
+    params = Echo()(None, dict(opts=dict(method='exp')))
+    assert isinstance(params, LayeredParams)
+    assert params == dict(window=5, opts=dict(method='exp', levels=[1, 2]))
+    assert json.loads(json.dumps(params.to_dict(detach=True))) == params
+    with pytest.raises(TypeError):
+        params['window'] = 6
+    with pytest.raises(TypeError):
+        del params['opts']['method']
+
+
+def test_execute_cannot_modify_func_params():
+    func = Mutate(dict(frame=pd.DataFrame(dict(a=[1., 2.]))))
+    with pytest.raises(TypeError):
+        func(None)
+    assert func.params['opts'] == dict(method='lin', levels=[1, 2])
+    assert func.params['frame'].iloc[0, 0] == 1.
+
+
+def test_read_only_view_copies_nothing_up_front():
+    mapping = {i: [i] for i in range(1000)}
+    params = LayeredParams(dict(mapping=mapping), read_only=True)
+    assert params['mapping'][1] == [1] and params['mapping'][1] is not mapping[1]
+    assert params['mapping']._layers[0] is mapping
+
+
+def test_detached_arrays_are_read_only():
+    array = np.arange(3.)
+    params = LayeredParams(dict(array=array)).to_dict(detach=True)
+    assert np.shares_memory(params['array'], array)
+    with pytest.raises(ValueError):
+        params['array'][0] = 5.
+
+
+def test_detached_layers_follow_the_lookup_rules():
+    base = dict(a=1, opts=dict(x=1, sub=dict(y=2)), flat=dict(z=1), leaf=3)
+    params = LayeredParams(base, dict(opts=dict(sub=dict(w=4)), flat=5, leaf=dict(v=6)))
+    detached = params.to_dict(detach=True)
+    assert detached == params.to_dict()
+    detached['opts']['sub']['y'] = 0
+    assert base['opts']['sub'] == dict(y=2)
+
+
+def test_detached_frames_are_deep_copies_without_copy_on_write(monkeypatch):
+    from zpmeta.utils import params as params_module
+    frame = pd.DataFrame(dict(a=[1., 2.]))
+    monkeypatch.setattr(params_module, '_copy_on_write', lambda: False)
+    detached = LayeredParams(dict(frame=frame), read_only=True)['frame']
+    assert not np.shares_memory(detached['a'].to_numpy(), frame['a'].to_numpy())
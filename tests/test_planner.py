@@ -0,0 +1,61 @@
+import pandas as pd
+from zpmeta.sources.planner import Fetch, Plan
+from tests.helpers import DATES, GridSource, grid
+
+
+class TotalXsSource(GridSource):
+    _appendable = dict(xs=False, ts=True)
+
+
+def test_plan_is_a_dry_run():
+    source = GridSource()
+    plan = source.plan(dict(ticker=['T1']), (DATES[0], DATES[9]))
+    assert [(fetch.call_type, fetch.kind) for fetch in plan] == [('INITIAL', 'ts')]
+    assert source.calls == [] and source.value is None
+
+
+def test_plan_fetches_new_entities_and_missing_periods():
+    source = GridSource()
+    source(dict(ticker=['T1']), (DATES[0], DATES[9]))
+    plan = source.plan(dict(ticker=['T1', 'T2']), (DATES[0], DATES[19]))
+    assert [(fetch.call_type, fetch.entities, fetch.period) for fetch in plan] == [
+        ('INCREMENTAL XS', dict(ticker=['T2']), (DATES[0], DATES[19])),
+        ('INCREMENTAL TS', dict(ticker=['T1']), (DATES[9], DATES[19]))]
+    assert plan.entities == dict(ticker=['T1', 'T2']) and plan.period == (DATES[0], DATES[19]) and not plan.reset
+    assert source.plan(dict(ticker=['T1']), (DATES[2], DATES[5])) == []
+
+
+def test_plan_refetches_dimensions_that_are_not_appendable():
+    source = TotalXsSource()
+    source(dict(ticker=['T1']), (DATES[0], DATES[9]))
+    plan = source.plan(dict(ticker=['T2']), (DATES[0], DATES[9]))
+    assert [(fetch.call_type, fetch.entities) for fetch in plan] == [('TOTAL', dict(ticker=['T1', 'T2']))]
+    assert plan.reset
+
+
+def test_plan_splits_fetches_into_chunks():
+    source = GridSource(caching=dict(chunks=dict(period='10D', entities=1)))
+    plan = source.plan(dict(ticker=['T1', 'T2']), (DATES[0], DATES[19]))
+    assert [(fetch.entities['ticker'], fetch.period[0]) for fetch in plan] == [
+        (['T1'], DATES[0]), (['T2'], DATES[0]), (['T1'], DATES[10]), (['T2'], DATES[10])]
+    cost = plan.cost()
+    assert cost['calls'] == 4 and cost['entities'] == 4 and 36. < cost['entity_days'] < 40.
+
+
+def test_cost_counts_zipped_levels_as_one_entity():
+    fetch = Fetch('INITIAL', dict(ticker=['T1', 'T2'], exchange=['X', 'Y'], field=['a', 'b', 'c']),
+                  (DATES[0], DATES[2]), 'ts')
+    assert fetch.size() == 12 and fetch.size(zipped=['ticker', 'exchange']) == 6
+    assert fetch.days() == 2.
+    assert Plan([fetch, Fetch('INITIAL', None, None, 'ts')]).cost() == dict(calls=2, entities=12, entity_days=None)
+
+
+def test_fetches_run_concurrently_on_an_executor():
+    source = GridSource(caching=dict(chunks=dict(entities=1), executor='thread', max_workers=3))
+    tickers = ['T1', 'T2', 'T3']
+    try:
+        result = source(dict(ticker=tickers), (DATES[0], DATES[9]))
+    finally:
+        source._executor.shutdown()
+    assert len(source.calls) == 3
+    pd.testing.assert_frame_equal(result, grid(tickers, (DATES[0], DATES[9])), check_freq=False)
@@ -0,0 +1,80 @@
+import threading
+import pandas as pd
+import pytest
+from zpmeta.sources.prefetch import Prefetcher, prefetch_options
+from tests.helpers import DATES, GridSource
+
+ENTITIES = dict(ticker=['T1', 'T2'])
+
+
+def windows(count: int, length: int = 5) -> list:
+    return [(DATES[i * length], DATES[i * length + length - 1]) for i in range(count)]
+
+
+def test_prefetch_options():
+    assert prefetch_options(None) is None and prefetch_options(False) is None
+    assert prefetch_options(True) == dict(lookahead=1, max_bytes=None, min_steps=2)
+    assert prefetch_options(dict(lookahead=3))['lookahead'] == 3
+    with pytest.raises(TypeError):
+        prefetch_options('yes')
+
+
+def test_sliding_windows_predict_the_next_window():
+    prefetcher = Prefetcher(lookahead=2)
+    targets = [prefetcher.observe(ENTITIES, period) for period in windows(4)]
+    assert targets == [None, None, (DATES[14], DATES[24]), (DATES[19], DATES[29])]
+
+
+def test_sequences_break_on_other_entities_or_steps():
+    prefetcher = Prefetcher(min_steps=1)
+    assert prefetcher.observe(ENTITIES, (0, 10)) is None
+    assert prefetcher.observe(ENTITIES, (10, 20)) == (20, 30)
+    assert prefetcher.observe(dict(ticker=['T3']), (20, 30)) is None
+    assert prefetcher.observe(dict(ticker=['T3']), (20, 30)) is None
+    assert prefetcher.observe(dict(ticker=['T3']), (25, 35)) == (35, 40)
+
+
+def test_predictions_stop_at_now():
+    prefetcher = Prefetcher(min_steps=1)
+    now = pd.Timestamp.now()
+    prefetcher.observe(ENTITIES, (now - pd.Timedelta('20D'), now - pd.Timedelta('10D')))
+    start, end = prefetcher.observe(ENTITIES, (now - pd.Timedelta('10D'), now - pd.Timedelta('1D')))
+    assert start == now - pd.Timedelta('1D') and now <= end <= pd.Timestamp.now()
+
+
+def test_one_prefetch_runs_at_a_time():
+    prefetcher, release = Prefetcher(), threading.Event()
+    try:
+        assert prefetcher.submit(release.wait, 5)
+        assert prefetcher.busy and not prefetcher.submit(release.wait, 5)
+        release.set()
+        prefetcher.wait(5)
+        assert not prefetcher.busy and prefetcher.submit(lambda: 1 / 0)
+        prefetcher.wait(5)
+    finally:
+        prefetcher.shutdown()
+
+
+def test_panelsource_prefetches_the_next_window():
+    source = GridSource(caching=dict(prefetch=True))
+    try:
+        for period in windows(3):
+            source(ENTITIES, period)
+        source._prefetcher.wait(5)
+        calls = len(source.calls)
+        assert source.calls[-1] == (ENTITIES, (DATES[14], DATES[19]))
+        source(ENTITIES, windows(4)[-1])
+        assert len(source.calls) == calls
+    finally:
+        source._prefetcher.shutdown()
+
+
+def test_prefetches_stay_within_max_bytes():
+    source = GridSource(caching=dict(prefetch=dict(max_bytes=1)))
+    try:
+        for period in windows(3):
+            source(ENTITIES, period)
+        source._prefetcher.wait(5)
+        assert len(source.calls) == 3
+    finally:
+        source._prefetcher.shutdown()
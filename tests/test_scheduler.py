@@ -0,0 +1,80 @@
+import time
+import pytest
+from zpmeta.sources.scheduler import RefreshScheduler
+from tests.helpers import DATES, GridSource
+
+
+class FailingSource(GridSource):
+    def __init__(self, failures: int):
+        super().__init__(caching=dict(name='failing'))
+        self.failures = failures
+
+    def refresh_tail(self, until=None) -> bool:
+        if self.failures > 0:
+            self.failures -= 1
+            raise IOError("upstream down")
+        return True
+
+
+def tail_source() -> GridSource:
+    source = GridSource(caching=dict(ts_anchor='cache', ts_refresh=1, name='tail'))
+    source(dict(ticker=['T1']), (DATES[0], DATES[9]))
+    return source
+
+
+def test_refresh_refetches_the_tail_and_appends_new_periods():
+    source = tail_source()
+    scheduler = RefreshScheduler()
+    scheduler.register(source, interval=60, until=lambda: DATES[14])
+    assert scheduler.run_pending() == 1 and scheduler.run_pending() == 0
+    # The last cached period is refetched with the new ones.
+    assert source.calls[1] == (dict(ticker=['T1']), (DATES[8], DATES[14]))
+    assert source.value.index[-1] == DATES[14]
+    status = scheduler.status().loc['tail']
+    assert status['refreshes'] == 1 and status['failures'] == 0 and status['staleness'] < 60
+    assert 0 < status['next_run'] <= 60
+
+
+def test_sources_without_cache_are_skipped():
+    source = GridSource(caching=dict(name='empty'))
+    scheduler = RefreshScheduler()
+    scheduler.register(source, interval=60)
+    assert scheduler.refresh('empty')
+    assert source.calls == [] and scheduler.status().loc['empty', 'refreshes'] == 0
+
+
+def test_failures_back_off_exponentially():
+    scheduler = RefreshScheduler(max_backoff=300)
+    scheduler.register(FailingSource(failures=3), interval=60)
+    for failures, backoff in [(1, 120), (2, 240), (3, 300)]:
+        assert not scheduler.refresh('failing')
+        status = scheduler.status().loc['failing']
+        assert status['failures'] == failures and 'upstream down' in status['last_error']
+        assert backoff - 1 < status['next_run'] <= backoff
+    assert scheduler.refresh('failing')
+    status = scheduler.status().loc['failing']
+    assert status['failures'] == 0 and status['last_error'] is None and status['next_run'] <= 60
+
+
+def test_registrations_are_validated():
+    scheduler = RefreshScheduler()
+    scheduler.register(tail_source(), interval=60)
+    with pytest.raises(ValueError):
+        scheduler.register(tail_source(), interval=60)
+    with pytest.raises(ValueError):
+        scheduler.register(tail_source(), interval=0, name='other')
+    scheduler.unregister('tail')
+    assert scheduler.run_pending() == 0
+
+
+def test_background_thread_refreshes_until_stopped():
+    source = tail_source()
+    with RefreshScheduler() as scheduler:
+        scheduler.register(source, interval=0.02, until=lambda: DATES[14])
+        deadline = time.monotonic() + 5
+        while scheduler.status().loc['tail', 'refreshes'] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    refreshes = scheduler.status().loc['tail', 'refreshes']
+    assert refreshes >= 3
+    time.sleep(0.05)
+    assert scheduler.status().loc['tail', 'refreshes'] == refreshes
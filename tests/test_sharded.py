@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+from zpmeta.sources.panelsource import PanelSource
+from zpmeta.sources.sharded import ShardedPanelSource
+
+DATES = pd.date_range('2020-01-01', periods=10)
+
+
+class GridSource(PanelSource):
+    _appendable = dict(xs=True, ts=True)
+
+    def _execute(self, entities=None, period=None):
+        index = DATES[(DATES >= period[0]) & (DATES <= period[1])]
+        columns = pd.MultiIndex.from_product(list(entities.values()), names=list(entities.keys()))
+        return pd.DataFrame(np.ones((len(index), len(columns))), index=index, columns=columns)
+
+
+@pytest.fixture
+def sharded():
+    source = ShardedPanelSource(GridSource, 'ticker', shards=2, partition=lambda ticker: int(ticker[1:]) % 2)
+    yield source
+    source.shutdown()
+
+
+def test_split_partitions_the_level(sharded):
+    split = sharded.split(dict(ticker=['T0', 'T1', 'T2'], field=['a', 'b']))
+    assert split == {0: dict(ticker=['T0', 'T2'], field=['a', 'b']), 1: dict(ticker=['T1'], field=['a', 'b'])}
+
+
+def test_split_requires_the_level(sharded):
+    with pytest.raises(ValueError):
+        sharded.split(None)
+    with pytest.raises(ValueError):
+        sharded.split(dict(field=['a']))
+
+
+def test_split_keeps_zipped_levels_together():
+    source = ShardedPanelSource(GridSource, 'ticker', caching=dict(entity_levels=['ticker', 'exchange']), shards=2,
+                                partition=['T1'])
+    try:
+        split = source.split(dict(ticker=['T0', 'T1'], exchange=['X', 'Y'], field=['a']))
+    finally:
+        source.shutdown()
+    assert split == {0: dict(ticker=['T0'], exchange=['X'], field=['a']),
+                     1: dict(ticker=['T1'], exchange=['Y'], field=['a'])}
+
+
+@pytest.mark.parametrize('gather', ['pickle', 'shared'])
+def test_gathered_frame_has_every_entity_once(gather):
+    entities = dict(ticker=['T0', 'T1', 'T2', 'T3'], field=['a'])
+    with ShardedPanelSource(GridSource, 'ticker', shards=2, gather=gather) as source:
+        result = source(entities, (DATES[0], DATES[-1]))
+    assert result.shape == (len(DATES), 4)
+    assert result.columns.is_unique
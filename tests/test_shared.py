@@ -0,0 +1,43 @@
+import pytest
+from zpmeta.singletons import shared
+from zpmeta.singletons.singletons import MultitonMeta
+
+
+class Counter(metaclass=MultitonMeta):
+    _multiton_policy = dict(process='shared')
+
+    def __init__(self, name=None):
+        self.name = name
+        self.count = 0
+
+    def increment(self, by: int = 1) -> int:
+        self.count += by
+        return self.count
+
+    def __call__(self, value):
+        return self.name, value
+
+
+@pytest.fixture
+def server():
+    server = shared.configure()
+    yield server
+    Counter.clear_instances()
+    server.shutdown()
+
+
+def test_shared_instances_proxy_methods_and_attributes(server):
+    counter = Counter('a')
+    assert type(counter) is shared.InstanceProxy
+    assert isinstance(counter, Counter)
+    assert counter.increment(2) == 2
+    assert counter.count == 2
+    assert counter.name == 'a'
+    counter.count = 10
+    assert counter.increment() == 11
+    assert counter(5) == ('a', 5)
+
+
+def test_missing_attributes_raise(server):
+    with pytest.raises(AttributeError):
+        Counter('b').missing
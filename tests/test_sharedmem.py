@@ -0,0 +1,86 @@
+import gc
+import sys
+import pickle
+import subprocess
+import numpy as np
+import pandas as pd
+import pytest
+from zpmeta.sources.sharedmem import SharedPanel, attach
+from zpmeta.sources.sharedsource import SharedPanelSource
+from tests.helpers import DATES, GridSource, grid
+
+
+@pytest.fixture
+def panel():
+    panel = SharedPanel()
+    yield panel
+    panel.close()
+
+
+def test_attach_before_publish_finds_nothing(panel):
+    assert attach(panel.name) == (0, None, None)
+
+
+def test_attached_frames_are_read_only_views_of_the_snapshot(panel):
+    frame = grid(['T1', 'T2'], (DATES[0], DATES[9]))
+    assert panel.publish(frame, dict(source='grid')) == 1
+    version, attached, meta = attach(panel.name)
+    assert version == 1 and meta == dict(source='grid')
+    pd.testing.assert_frame_equal(attached, frame)
+    values = attached.to_numpy()
+    assert not values.flags.writeable and not values.flags.owndata
+    with pytest.raises(ValueError):
+        values[0, 0] = 0.
+
+
+def test_attached_frames_outlive_newer_versions(panel):
+    frame = grid(['T1'], (DATES[0], DATES[9]))
+    panel.publish(frame)
+    column = attach(panel.name)[1]['T1'].to_numpy()
+    gc.collect()
+    panel.publish(frame + 1.)
+    version, attached, _ = attach(panel.name)
+    assert version == 2 and attached['T1'].tolist() == (frame['T1'] + 1.).tolist()
+    # The first version was unlinked, but stays mapped while referenced.
+    assert column.tolist() == frame['T1'].tolist()
+
+
+def test_only_single_numeric_dtypes_can_be_published(panel):
+    with pytest.raises(TypeError):
+        panel.publish(pd.DataFrame(dict(a=[1., 2.], b=['x', 'y'])))
+    with pytest.raises(TypeError):
+        panel.publish(pd.DataFrame(dict(a=[1., 2.], b=[1, 2])))
+
+
+def test_readers_in_other_processes_do_not_unlink_the_snapshot(panel):
+    frame = grid(['T1', 'T2'], (DATES[0], DATES[9]))
+    panel.publish(frame)
+    code = "from zpmeta.sources.sharedmem import attach; print(attach(%r)[1].to_numpy().sum())" % panel.name
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert float(output.stdout) == frame.to_numpy().sum()
+    assert 'leaked' not in output.stderr
+    pd.testing.assert_frame_equal(attach(panel.name)[1], frame)
+
+
+def test_shared_panel_source_serves_and_follows_the_published_cache():
+    source = GridSource()
+    source(dict(ticker=['T1', 'T2']), (DATES[0], DATES[9]))
+    name = source.publish()
+    try:
+        proxy = SharedPanelSource(name)
+        result = proxy(dict(ticker=['T2']), (DATES[2], DATES[5]))
+        pd.testing.assert_frame_equal(result, grid(['T2'], (DATES[2], DATES[5])), check_freq=False)
+        with pytest.raises(ValueError):
+            proxy(dict(ticker=['T3']), (DATES[0], DATES[9]))
+        with pytest.raises(TypeError):
+            proxy.update(ts=result)
+
+        source(dict(ticker=['T1', 'T2']), (DATES[0], DATES[19]))
+        source.publish()
+        copy = pickle.loads(pickle.dumps(proxy))
+        for reader in (proxy, copy):
+            result = reader(dict(ticker=['T1']), (DATES[10], DATES[19]))
+            assert reader.version == 2 and np.shares_memory(result.to_numpy(), reader.value.to_numpy())
+            pd.testing.assert_frame_equal(result, grid(['T1'], (DATES[10], DATES[19])), check_freq=False)
+    finally:
+        source.unpublish()
@@ -0,0 +1,84 @@
+import gc
+import numpy as np
+import pandas as pd
+from zpmeta.singletons.registry import Registry
+from zpmeta.singletons.singletons import MultitonMeta, fingerprint
+
+
+class Conf(metaclass=MultitonMeta):
+    def __init__(self, value=None, params=None):
+        self.value = value
+        self.params = params
+
+
+def test_fingerprint_is_typed():
+    assert len({fingerprint((1,), {}), fingerprint((True,), {}), fingerprint((1.,), {})}) == 3
+    assert len({fingerprint(([1],), {}), fingerprint(([True],), {}), fingerprint(([1.],), {})}) == 3
+    assert fingerprint((), dict(value=1)) != fingerprint((), dict(value=1.))
+
+
+def test_multitons_of_equal_values_of_different_types():
+    assert Conf(1).value is not Conf(True).value
+    assert type(Conf(1.).value) is float
+    assert Conf(1) is Conf(1)
+
+
+def test_mutated_arguments_give_new_instances():
+    params = dict(fields=['close'])
+    first = Conf(params=params)
+    assert Conf(params=dict(fields=['close'])) is first
+    params['fields'].append('volume')
+    assert Conf(params=params) is not first
+
+
+def test_frames_are_keyed_by_content():
+    frame = pd.DataFrame(dict(a=[1., 2.]))
+    first = Conf(frame)
+    assert Conf(frame.copy()) is first
+    frame.iloc[0, 0] = 5.
+    assert Conf(frame) is not first
+
+
+class WeakConf(metaclass=MultitonMeta):
+    _multiton_policy = dict(weak=True)
+
+    def __init__(self, value=None):
+        self.value = value
+
+
+class LruConf(metaclass=MultitonMeta):
+    _multiton_policy = dict(maxsize=2)
+
+    def __init__(self, value=None):
+        self.value = value
+
+
+def test_weak_multitons_are_dropped_when_unused():
+    first = WeakConf(1)
+    assert WeakConf(1) is first and MultitonMeta._registry.size(WeakConf) == 1
+    del first
+    gc.collect()
+    assert MultitonMeta._registry.size(WeakConf) == 0
+    assert WeakConf(1).value == 1
+
+
+def test_multitons_evict_least_recently_used_beyond_maxsize():
+    LruConf.clear_instances()
+    a, b = LruConf('a'), LruConf('b')
+    assert LruConf('a') is a
+    LruConf('c')
+    assert MultitonMeta._registry.size(LruConf) == 2
+    assert LruConf('a') is a
+    assert LruConf('b') is not b
+    assert LruConf.evict_instance('a') and not LruConf.evict_instance('a')
+    LruConf.clear_instances()
+    assert MultitonMeta._registry.size(LruConf) == 0
+
+
+def test_registry_caps_instances_across_classes_and_accounts_memory():
+    registry = Registry(maxsize=2)
+    for value in range(3):
+        registry[(Conf, value)] = Conf(np.zeros(1000), params=value)
+    assert len(registry) == 2 and (Conf, 0) not in registry and registry.evictions == 1
+    assert registry.nbytes() >= 2 * 8000
+    assert registry.info()['Conf']['instances'] == 2
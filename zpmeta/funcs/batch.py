@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Stacking of many operands into one frame for the batched execution of Funcs."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import numpy as np
+from pandas import DataFrame, Series, Index
+
+
+def stack_operands(operands: dict) -> DataFrame:
+    """Returns the operands as the columns of one DataFrame, keyed by the keys of the dict, or None if they cannot be
+    stacked without changing them: the operands must all be Series with the same index and dtype, or all be 1-D
+    numpy arrays with the same length and dtype."""
+    if len(operands) == 0:
+        return None
+    values = list(operands.values())
+    first = values[0]
+    if isinstance(first, Series):
+        if not all(isinstance(value, Series) and value.dtype == first.dtype
+                   and (value.index is first.index or value.index.equals(first.index)) for value in values):
+            return None
+        index = first.index
+    elif isinstance(first, np.ndarray) and first.ndim == 1:
+        if not all(isinstance(value, np.ndarray) and value.shape == first.shape and value.dtype == first.dtype
+                   for value in values):
+            return None
+        index = None
+    else:
+        return None
+    if not isinstance(first.dtype, np.dtype):
+        # Extension dtypes would be converted to objects by numpy.
+        return None
+    # Column-major storage is what the DataFrame keeps internally, so filling it copies each operand once.
+    stacked = np.empty((len(first), len(values)), dtype=first.dtype, order='F')
+    for position, value in enumerate(values):
+        stacked[:, position] = value if index is None else value.to_numpy()
+    columns = Index(list(operands.keys()), tupleize_cols=False)
+    return DataFrame(stacked, index=index, columns=columns, copy=False)
+
+
+def unstack_results(results, operands: dict) -> dict:
+    """Splits the results of `_execute_batch` into a dict of the results per operand, selected by label.
+
+    A DataFrame with one column per operand key gives one Series per operand (or one array if the operands were
+    arrays), named like the operand and sharing memory with the batched result. A Series indexed by the keys gives one
+    scalar per operand. Raises ValueError if the labels are not unique or a key is missing.
+    """
+    keys = list(operands.keys())
+    if isinstance(results, Series):
+        positions = _positions(results.index, keys, "a Series indexed by the operand keys")
+        values = results.to_numpy()
+        return {key: values[position] for key, position in zip(keys, positions)}
+    if not isinstance(results, DataFrame):
+        raise ValueError("_execute_batch must return a DataFrame or a Series, not %s!" % type(results).__name__)
+    positions = _positions(results.columns, keys, "a DataFrame with one column per operand key")
+
+    arrays = isinstance(operands[keys[0]], np.ndarray)
+    if len(set(results.dtypes)) > 1:
+        columns = [results.iloc[:, position] for position in positions]
+        if arrays:
+            return {key: column.to_numpy() for key, column in zip(keys, columns)}
+        return {key: column.rename(operand.name) for (key, operand), column in zip(operands.items(), columns)}
+    values = results.to_numpy()
+    if arrays:
+        return {key: values[:, position] for key, position in zip(keys, positions)}
+    index = results.index
+    return {key: Series(values[:, position], index=index, name=operand.name, copy=False)
+            for position, (key, operand) in zip(positions, operands.items())}
+
+
+def _positions(labels: Index, keys: list, expected: str) -> np.ndarray:
+    # Positions of the keys in the labels returned by _execute_batch.
+    if not labels.is_unique:
+        raise ValueError("_execute_batch must return %s, the labels are not unique!" % expected)
+    positions = labels.get_indexer(Index(keys, tupleize_cols=False))
+    if (positions < 0).any():
+        missing = [key for key, position in zip(keys, positions) if position < 0]
+        raise ValueError("_execute_batch must return %s, missing %s!" % (expected, missing))
+    return positions
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Executors used to evaluate independent calls, e.g. the branches of MapFuncs, MapParams and MapOperands."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import os
+import abc
+import asyncio
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+
+def _run_chunk(chunk: list, capture: bool) -> list:
+    """Evaluates a list of (key, func, args) serially and returns a list of (key, result)."""
+    results = []
+    for key, func, args in chunk:
+        try:
+            results.append((key, func(*args)))
+        except Exception as err:
+            if not capture:
+                raise
+            logging.warning("Captured error for key %s: %r", key, err)
+            results.append((key, err))
+    return results
+
+
+class Executor(metaclass=abc.ABCMeta):
+    """Evaluates a dict of independent calls and returns a dict of results in the order of the calls.
+
+    Calls are given as key -> (func, args). Calls are grouped into chunks of `chunksize` calls, each evaluated as one
+    task, which amortizes the scheduling overhead of many small calls. With `errors='capture'` an exception raised by
+    a call is returned as the result of its key instead of being raised. A `throttle` callable (e.g. the `acquire` of
+    a RateLimiter) is called in the calling process before each chunk is started.
+
+    Executors backed by a pool start it on first use and reuse it until `shutdown`, which is also called on exit when
+    the executor is used as a context manager.
+    """
+
+    def __init__(self, max_workers: int = None, chunksize: int = 1) -> None:
+        self.max_workers = max_workers
+        self.chunksize = chunksize
+
+    def __call__(self, calls: dict, errors: str = 'raise', throttle=None) -> dict:
+        results = dict.fromkeys(calls)
+        for chunk_results in self._execute(self._chunks(calls, errors), errors == 'capture', throttle):
+            results.update(chunk_results)
+        return results
+
+    def _chunks(self, calls: dict, errors: str) -> list:
+        if errors not in ('raise', 'capture'):
+            raise ValueError("errors must be either 'raise' or 'capture'")
+        items = [(key, func, args) for key, (func, args) in calls.items()]
+        return [items[i:i + self.chunksize] for i in range(0, len(items), self.chunksize)]
+
+    @abc.abstractmethod
+    def _execute(self, chunks: list, capture: bool, throttle=None) -> list:
+        pass
+
+    def shutdown(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+class SerialExecutor(Executor):
+    def _execute(self, chunks: list, capture: bool, throttle=None) -> list:
+        results = []
+        for chunk in chunks:
+            if throttle is not None:
+                throttle()
+            results.append(_run_chunk(chunk, capture))
+        return results
+
+
+class _PoolExecutor(Executor):
+    _pool_class = None
+
+    def __init__(self, max_workers: int = None, chunksize: int = 1) -> None:
+        super(_PoolExecutor, self).__init__(max_workers, chunksize)
+        self._workers = max_workers if max_workers is not None else self._default_workers()
+        self._pool = None
+
+    @staticmethod
+    def _default_workers() -> int:
+        return os.cpu_count() or 1
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        return state
+
+    def _execute(self, chunks: list, capture: bool, throttle=None) -> list:
+        if self._pool is None:
+            self._pool = self._pool_class(max_workers=self._workers)
+        if throttle is None:
+            futures = [self._pool.submit(_run_chunk, chunk, capture) for chunk in chunks]
+            return [future.result() for future in futures]
+
+        # Throttled chunks are only submitted to an idle worker, so that they start when throttle returns.
+        futures, running = [], set()
+        for chunk in chunks:
+            if len(running) >= self._workers:
+                _, running = wait(running, return_when=FIRST_COMPLETED)
+            throttle()
+            futures.append(self._pool.submit(_run_chunk, chunk, capture))
+            running.add(futures[-1])
+        return [future.result() for future in futures]
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+class ThreadExecutor(_PoolExecutor):
+    _pool_class = ThreadPoolExecutor
+
+    @staticmethod
+    def _default_workers() -> int:
+        # The default of ThreadPoolExecutor.
+        return min(32, (os.cpu_count() or 1) + 4)
+
+
+class ProcessExecutor(_PoolExecutor):
+    """Evaluates chunks in worker processes. Funcs and their arguments must be picklable."""
+    _pool_class = ProcessPoolExecutor
+
+
+class AsyncioExecutor(Executor):
+    """Evaluates calls on an event loop, awaiting coroutine funcs concurrently.
+
+    Plain funcs are run on the default executor of the loop. At most `max_workers` calls are in flight at a time.
+    Use `acall` from within a running event loop.
+    """
+
+    def _execute(self, chunks: list, capture: bool, throttle=None) -> list:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._aexecute(chunks, capture, throttle))
+        raise RuntimeError("cannot run the asyncio executor within a running event loop, await acall instead!")
+
+    async def acall(self, calls: dict, errors: str = 'raise', throttle=None) -> dict:
+        results = dict.fromkeys(calls)
+        for chunk_results in await self._aexecute(self._chunks(calls, errors), errors == 'capture', throttle):
+            results.update(chunk_results)
+        return results
+
+    async def _aexecute(self, chunks: list, capture: bool, throttle=None) -> list:
+        semaphore = asyncio.Semaphore(self.max_workers or len(chunks) or 1)
+        loop = asyncio.get_running_loop()
+
+        async def run_call(key, func, args):
+            try:
+                if inspect.iscoroutinefunction(func) or inspect.iscoroutinefunction(getattr(func, '__call__', None)):
+                    return key, await func(*args)
+                result = await loop.run_in_executor(None, func, *args)
+                if inspect.isawaitable(result):
+                    result = await result
+                return key, result
+            except Exception as err:
+                if not capture:
+                    raise
+                logging.warning("Captured error for key %s: %r", key, err)
+                return key, err
+
+        async def run_chunk(chunk):
+            async with semaphore:
+                if throttle is not None:
+                    await loop.run_in_executor(None, throttle)
+                return [await run_call(key, func, args) for key, func, args in chunk]
+
+        return await asyncio.gather(*[run_chunk(chunk) for chunk in chunks])
+
+
+_executors = dict(serial=SerialExecutor, thread=ThreadExecutor, process=ProcessExecutor, asyncio=AsyncioExecutor)
+
+
+def get_executor(executor=None, max_workers: int = None, chunksize: int = 1) -> Executor:
+    """Returns an Executor given an instance, or one of the names 'serial', 'thread', 'process' and 'asyncio'."""
+    if isinstance(executor, Executor):
+        return executor
+    if executor is None:
+        executor = 'serial'
+    if executor not in _executors:
+        raise ValueError("executor must be an Executor or one of %s" % list(_executors))
+    return _executors[executor](max_workers=max_workers, chunksize=chunksize)
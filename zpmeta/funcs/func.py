@@ -24,22 +24,47 @@ __docformat__ = 'google'
 __author__ = 'Zeroth Principles Engineering'
 __email__ = 'engineering@zeroth-principles.com'
 
+import time
 import logging
 import abc
 from zpmeta.utils.common_utils import deep_update
+from zpmeta.utils.hashing import stable_hash
+from zpmeta.utils.params import LayeredParams
+from zpmeta.funcs.memo import make_cache
+from zpmeta.funcs.batch import stack_operands, unstack_results
+from zpmeta.utils.metrics import metrics
 from copy import deepcopy
 
 class Func(metaclass=abc.ABCMeta):
     """Callable class  used to impose a structure on data processing
 
+    Results are memoized if `memo` is given: True for a default ResultCache, a dict of ResultCache options, or a
+    ResultCache instance that may be shared by several Funcs. Calls are keyed by a stable hash of the class, the
+    operand and the merged params.
+
+    `_execute` receives the params as a read-only LayeredParams view of `self.params` overlaid with the call params,
+    which copies nothing up front: lists and sets are copied when read, NumPy arrays are read as read-only views and
+    pandas objects as copy-on-write copies, and writes raise TypeError, so `_execute` cannot modify `self.params`.
+    `params.to_dict(detach=True)` gives a modifiable dict. Funcs whose `_execute` modifies the params in place should
+    set `_copy_params = True` to receive a deep copy instead.
+
+    With sinks registered on `zpmeta.utils.metrics.metrics`, calls report their execution time and memo hits.
+
+    Funcs that can process many operands at once may define a classmethod `_execute_batch(operands, params)`,
+    receiving the operands as the columns of a DataFrame keyed by their labels and returning either a DataFrame with
+    the same columns or a Series of one value per column. `batch` and MapOperands then apply the Func to a dict of
+    Series (or of 1-D arrays) in a single call.
+
     Raises:
         TypeError: _description_
 
     Returns:
         results: Results of the function
     """    
+    _copy_params = False
+    _execute_batch = None
 
-    def __init__(self, params: dict = None, meta=None) -> None:
+    def __init__(self, params: dict = None, meta=None, memo=None) -> None:
         if params is None or isinstance(params, str):
             self.params = self._std_params(params)
         elif isinstance(params, tuple):
@@ -52,6 +77,7 @@ class Func(metaclass=abc.ABCMeta):
             raise TypeError("params must be a str, tuple, or a dict!")
 
         self._results = {}
+        self.memo = make_cache(memo)
 
         logging.info("INIT %s %s", self.__class__.__name__, self.params)
 
@@ -61,13 +87,74 @@ class Func(metaclass=abc.ABCMeta):
     def _std_params(cls, name: str = None) -> dict:
         return {}
 
+    def _call_params(self, params: dict = None) -> dict:
+        if self._copy_params:
+            params2 = deepcopy(self.params)
+            if params is not None:
+                params2 = deep_update(params2, params)
+            return params2
+        return LayeredParams(self.params, params, read_only=True)
+
     def __call__(self, operand=None, params: dict = None) -> object:
-        params2 = deepcopy(self.params)
-        if params is not None:
-            params2 = deep_update(params2, params)
-            
-        results = self._execute(operand, params2)
+        params2 = self._call_params(params)
 
+        if self.memo is None:
+            return self._timed_execute(operand, params2) if metrics.enabled else self._execute(operand, params2)
+
+        key = stable_hash((self.__class__.__module__, self.__class__.__qualname__, operand, params2))
+        found, results = self.memo.get(key)
+        if metrics.enabled:
+            metrics.count('func_memo', (('func', self.__class__.__qualname__), ('result', 'hit' if found else 'miss')))
+        if not found:
+            results = self._timed_execute(operand, params2) if metrics.enabled else self._execute(operand, params2)
+            self.memo.put(key, results)
+
+        return results
+
+    def batch(self, operands: dict, params: dict = None) -> dict:
+        """Applies the Func to every value of the dict operands with one call of `_execute_batch`. Returns the dict
+        of results, or None if the Func has no `_execute_batch` or the operands cannot be stacked (see
+        `stack_operands`). With a memo, cached results are reused and only the other operands are executed."""
+        if self._execute_batch is None:
+            return None
+        stacked = stack_operands(operands)
+        if stacked is None:
+            return None
+        params2 = self._call_params(params)
+
+        results, keys, pending = dict(), dict(), operands
+        if self.memo is not None:
+            pending = dict()
+            for key, operand in operands.items():
+                keys[key] = stable_hash((self.__class__.__module__, self.__class__.__qualname__, operand, params2))
+                found, result = self.memo.get(keys[key])
+                if found:
+                    results[key] = result
+                else:
+                    pending[key] = operand
+            if metrics.enabled:
+                labels = ('func', self.__class__.__qualname__),
+                metrics.count('func_memo', labels + (('result', 'hit'),), len(operands) - len(pending))
+                metrics.count('func_memo', labels + (('result', 'miss'),), len(pending))
+            if len(pending) < len(operands):
+                stacked = stacked.iloc[:, [position for position, key in enumerate(operands) if key in pending]]
+
+        if len(pending) > 0:
+            start = time.perf_counter()
+            executed = unstack_results(self._execute_batch(stacked, params2), pending)
+            if metrics.enabled:
+                metrics.observe('func_execute_batch', (('func', self.__class__.__qualname__),),
+                                time.perf_counter() - start)
+            if self.memo is not None:
+                for key, result in executed.items():
+                    self.memo.put(keys[key], result)
+            results.update(executed)
+        return {key: results[key] for key in operands}
+
+    def _timed_execute(self, operand, params) -> object:
+        start = time.perf_counter()
+        results = self._execute(operand, params)
+        metrics.observe('func_execute', (('func', self.__class__.__qualname__),), time.perf_counter() - start)
         return results
 
     def _wrapped_execute(self, operand=None, params: dict = None) -> object:
@@ -25,15 +25,31 @@ __authors__ = []
 
 """ * """
 
+from zpmeta.funcs.graph import Node
+
+
 class Chain:
+    """Composition of funcs: Chain([f, g, h])(x) is f(g(h(x))). `params` is a list of params, one per func."""
+
     def __init__(self, funcs=None) -> None:
         self.funcs = funcs
 
-    def __call__(self, operand=None, params: dict = None) -> object:
+    def __call__(self, operand=None, params: list = None) -> object:
+        if params is None:
+            params = [None] * len(self.funcs)
         result = operand
         # reverse traverse the funcs
-        for func, param in reversed(zip(self.funcs, params)):
+        for func, param in reversed(list(zip(self.funcs, params))):
             result = func(result, param)
 
         return result
 
+    def to_node(self, inputs=None, params: list = None) -> Node:
+        """Returns the chain as a linear sequence of graph Nodes applied to `inputs`, ending in the outermost func."""
+        if params is None:
+            params = [None] * len(self.funcs)
+        node = inputs
+        for func, param in reversed(list(zip(self.funcs, params))):
+            node = Node(func, node, param)
+
+        return node
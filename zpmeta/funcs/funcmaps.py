@@ -24,62 +24,119 @@ __docformat__ = 'google'
 __author__ = 'Zeroth Principles Engineering'
 __email__ = 'engineering@zeroth-principles.com'
 
+import asyncio
 import logging
-from zpmeta.utils.common_utils import deep_update
+from abc import ABCMeta, abstractmethod
+from zpmeta.utils.params import LayeredParams
+from zpmeta.funcs.executors import get_executor, AsyncioExecutor
 
 
-class MapFuncs:
-    def __init__(self, func_dict, params=None):
-        self.func = func_dict
+class _Map(metaclass=ABCMeta):
+    """Common machinery of the Map classes: parameter merging and evaluation of the branches with an executor.
+
+    The executor is 'serial' (default), 'thread', 'process', 'asyncio' or an Executor instance. Results are returned in
+    the order of the keys. With `errors='capture'`, a branch that raises returns its exception instead. Within a
+    running event loop, await `acall` instead of calling the Map.
+
+    A Map reuses the pool of its executor across calls. `shutdown`, or leaving a `with` block, stops the pool of an
+    executor created from a name; an Executor instance passed in is left to its owner.
+    """
+
+    def __init__(self, params=None, executor=None, max_workers: int = None, chunksize: int = 1,
+                 errors: str = 'raise') -> None:
         self.params = params
+        self.executor = get_executor(executor, max_workers=max_workers, chunksize=chunksize)
+        self._owns_executor = self.executor is not executor
+        self.errors = errors
 
-    def __call__(self, operand=None, params: dict = None) -> dict:
-        if params is not None:
-            params = deep_update(params, self.params)
-        else:
-            params = self.params.copy()
+    def __enter__(self):
+        return self
 
-        results = {}
-        for key, func in self.func.items():
-            results[key] = func(operand, params)
+    def __exit__(self, *exc_info):
+        self.shutdown()
 
-        return results
+    def shutdown(self) -> None:
+        if self._owns_executor:
+            self.executor.shutdown()
+
+    def __call__(self, operand=None, params: dict = None) -> dict:
+        params = self._merged_params(params)
+        results = self._batched(operand, params)
+        return results if results is not None else self._map(self._calls(operand, params))
+
+    async def acall(self, operand=None, params: dict = None) -> dict:
+        """Awaitable call of the Map. The 'asyncio' executor runs the branches on the running event loop, and other
+        executors are run on a thread of the default executor of the loop."""
+        params = self._merged_params(params)
+        results = self._batched(operand, params)
+        if results is not None:
+            return results
+        calls = self._calls(operand, params)
+        if isinstance(self.executor, AsyncioExecutor):
+            return await self.executor.acall(calls, errors=self.errors)
+        return await asyncio.get_running_loop().run_in_executor(None, self._map, calls)
+
+    def _merged_params(self, params: dict = None) -> dict:
+        # The params given at construction take precedence over the call params. Neither dict is modified.
+        return LayeredParams(params, self.params).to_dict()
+
+    def _batched(self, operand, params: dict) -> dict:
+        # Results computed without the executor, or None.
+        return None
+
+    @abstractmethod
+    def _calls(self, operand, params: dict) -> dict:
+        """Returns the branches as a dict of key -> (func, args)."""
+        pass
+
+    def _map(self, calls: dict) -> dict:
+        return self.executor(calls, errors=self.errors)
+
+
+class MapFuncs(_Map):
+    def __init__(self, func_dict, params=None, **kwargs):
+        super(MapFuncs, self).__init__(params, **kwargs)
+        self.func = func_dict
+
+    def _calls(self, operand, params: dict) -> dict:
+        return {key: (func, (operand, params)) for key, func in self.func.items()}
 
 
-class MapParams:
-    def __init__(self, func, params=None):
+class MapParams(_Map):
+    def __init__(self, func, params=None, **kwargs):
+        super(MapParams, self).__init__(params, **kwargs)
         self.func = func
-        self.params = params
 
-    def __call__(self, operand=None, params: dict = None) -> dict:
-        if params is not None:
-            params = deep_update(params, self.params)
-        else:
-            params = self.params.copy()
+    def _calls(self, operand, params: dict) -> dict:
+        return {key: (self.func, (operand, sub_params)) for key, sub_params in params.items()}
 
-        results = {}
-        for key, sub_params in params.items():
-            results[key] = self.func(operand, sub_params)
 
-        return results
+class MapOperands(_Map):
+    """Applies func to every value of a dict operand.
 
+    If func is a Func with an `_execute_batch`, operands that can be stacked into one frame are processed by a
+    single batched call instead of one call per operand (on the calling thread, whatever the executor), unless
+    `batch=False`. Otherwise, and if the batched call raises with `errors='capture'`, func is called per operand.
+    """
 
-class MapOperands:
-    def __init__(self, func, params=None):
+    def __init__(self, func, params=None, batch: bool = True, **kwargs):
+        super(MapOperands, self).__init__(params, **kwargs)
         self.func = func
-        self.params = params
+        self.batch = batch
 
-    def __call__(self, operand=None, params: dict = None) -> dict:
-        if params is not None:
-            params = deep_update(params, self.params)
-        else:
-            params = self.params.copy()
+    def _batched(self, operand, params: dict) -> dict:
+        if self.batch and getattr(self.func, '_execute_batch', None) is not None and hasattr(self.func, 'batch'):
+            # Funcs with a batched implementation process all operands in one call, if they can be stacked.
+            try:
+                return self.func.batch(operand, params)
+            except Exception:
+                if self.errors != 'capture':
+                    raise
+                logging.info("Batched %s failed, calling it per operand", self.func.__class__.__name__)
+        return None
 
-        results = {}
-        for key, sub_operand in operand.items():
-            results[key] = self.func(sub_operand, params)
-
-        return results
+    def _calls(self, operand, params: dict) -> dict:
+        return {key: (self.func, (sub_operand, params)) for key, sub_operand in operand.items()}
 
 
 class Funcify:
@@ -89,15 +146,12 @@ class Funcify:
         self.default_params = default_params
 
     def __call__(self, operand=None, params: dict = None) -> object:
-        if params is not None:
-            params = deep_update(params, self.default_params)
-        else:
-            params = self.default_params.copy()
-        
+        params = LayeredParams(params, self.default_params)
+
         if self.operand_key is not None:
             params[self.operand_key] = operand
         
-        results = self.target_callable(**params)
+        results = self.target_callable(**params.to_dict())
 
         return results
     
\ No newline at end of file
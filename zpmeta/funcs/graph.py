@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Lazily evaluated graphs of Funcs, Chains and Maps."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import logging
+from zpmeta.utils.hashing import stable_hash
+from zpmeta.utils.params import LayeredParams
+from zpmeta.funcs.executors import get_executor
+
+
+class Node:
+    """A deferred call `func(operand, params)` whose operand is built from the results of upstream nodes.
+
+    `inputs` is a Node, a list or tuple of Nodes, or a dict of Nodes, and the operand passed to func has the same
+    shape with every Node replaced by its result. Other values are passed through as constants. Any callable with
+    the `(operand, params)` signature can be a node, e.g. a Func, a Chain or one of the Map classes.
+    """
+
+    def __init__(self, func, inputs=None, params: dict = None, name: str = None) -> None:
+        self.func = func
+        self.inputs = inputs
+        self.params = params
+        self.name = name if name is not None else "%s_%x" % (getattr(func, '__name__', func.__class__.__name__), id(self))
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__, self.name)
+
+    def upstream(self) -> list:
+        if isinstance(self.inputs, Node):
+            return [self.inputs]
+        if isinstance(self.inputs, (list, tuple)):
+            return [node for node in self.inputs if isinstance(node, Node)]
+        if isinstance(self.inputs, dict):
+            return [node for node in self.inputs.values() if isinstance(node, Node)]
+        return []
+
+    def _operand(self, resolve):
+        if isinstance(self.inputs, Node):
+            return resolve(self.inputs)
+        if isinstance(self.inputs, (list, tuple)):
+            return type(self.inputs)(resolve(node) if isinstance(node, Node) else node for node in self.inputs)
+        if isinstance(self.inputs, dict):
+            return {key: resolve(node) if isinstance(node, Node) else node for key, node in self.inputs.items()}
+        return self.inputs
+
+
+class Input(Node):
+    """A placeholder for a value fed to the graph when it is called."""
+
+    def __init__(self, name: str = 'operand') -> None:
+        super(Input, self).__init__(None, name=name)
+
+
+class Graph:
+    """ Lazily evaluated DAG of Nodes.
+
+    Calling a graph only evaluates the nodes needed for the requested outputs. Nodes that represent the same call
+    (same func object, same inputs and equal params) are evaluated once, even if they were built separately.
+    Independent nodes are evaluated together in waves by the executor ('serial', 'thread', 'process' or an Executor
+    instance), and the result of an intermediate node is released as soon as all nodes consuming it are done.
+    ----
+    [30 Jun 2024] Created
+    ----
+    """
+
+    def __init__(self, outputs, executor=None, max_workers: int = None) -> None:
+        self.outputs = outputs
+        self.executor = get_executor(executor, max_workers=max_workers)
+
+    def __call__(self, operand=None, params: dict = None) -> object:
+        """Evaluates the graph. `operand` feeds the single Input of the graph, or is a dict of Input name -> value.
+
+        `params` is a dict of node name -> params that override the params of that node for this call.
+        """
+        inputs = [node for node in self.nodes() if isinstance(node, Input)]
+        if len(inputs) == 1 and not (isinstance(operand, dict) and inputs[0].name in operand):
+            feeds = {inputs[0].name: operand}
+        else:
+            feeds = operand or {}
+        return self.evaluate(feeds, params=params)
+
+    def nodes(self, outputs=None) -> list:
+        """Returns the nodes needed for the given outputs (default: all outputs) in topological order."""
+        outputs = self._targets(self.outputs if outputs is None else outputs)
+        order, seen = [], set()
+        stack = [(node, False) for node in reversed(list(outputs.values()))]
+        while stack:
+            node, expanded = stack.pop()
+            if id(node) in seen:
+                continue
+            if expanded:
+                seen.add(id(node))
+                order.append(node)
+            else:
+                stack.append((node, True))
+                stack.extend((upstream, False) for upstream in reversed(node.upstream()) if id(upstream) not in seen)
+        return order
+
+    def evaluate(self, feeds: dict = None, outputs=None, params: dict = None):
+        """Evaluates the requested outputs (names of `self.outputs` or Nodes) given the values of the Inputs."""
+        feeds, params = feeds or {}, params or {}
+        targets = self._targets(self.outputs if outputs is None else outputs)
+        nodes = self.nodes(targets)
+
+        # Deduplicate nodes that represent the same call.
+        keys = dict()
+        for node in nodes:
+            keys[id(node)] = self._key(node, keys, params)
+        unique = dict()
+        for node in nodes:
+            unique.setdefault(keys[id(node)], node)
+
+        consumers = {key: 0 for key in unique}
+        for key, node in unique.items():
+            for upstream in node.upstream():
+                consumers[keys[id(upstream)]] += 1
+        keep = set(keys[id(node)] for node in targets.values())
+
+        results = dict()
+        for key, node in unique.items():
+            if isinstance(node, Input):
+                if node.name not in feeds:
+                    raise KeyError("No value fed for Input %s" % node.name)
+                results[key] = feeds[node.name]
+
+        pending = {key: node for key, node in unique.items() if key not in results}
+        while pending:
+            ready = {key: node for key, node in pending.items()
+                     if all(keys[id(upstream)] in results for upstream in node.upstream())}
+            logging.info("GRAPH wave: %s", [node.name for node in ready.values()])
+            calls = {key: (node.func, (node._operand(lambda n: results[keys[id(n)]]),
+                                       LayeredParams(node.params, params.get(node.name)).to_dict()))
+                     for key, node in ready.items()}
+            results.update(self.executor(calls))
+
+            for key, node in ready.items():
+                del pending[key]
+                for upstream in node.upstream():
+                    upstream_key = keys[id(upstream)]
+                    consumers[upstream_key] -= 1
+                    if consumers[upstream_key] == 0 and upstream_key not in keep:
+                        del results[upstream_key]
+
+        values = {name: results[keys[id(node)]] for name, node in targets.items()}
+        if isinstance(self.outputs, Node) and outputs is None:
+            return values[self.outputs.name]
+        return values
+
+    def _targets(self, outputs) -> dict:
+        if isinstance(outputs, Node):
+            return {outputs.name: outputs}
+        if isinstance(outputs, dict):
+            return dict(outputs)
+        # a list of output names or Nodes
+        named = self._targets(self.outputs) if outputs is not self.outputs else {}
+        return {item.name if isinstance(item, Node) else item: item if isinstance(item, Node) else named[item]
+                for item in outputs}
+
+    @staticmethod
+    def _key(node: Node, keys: dict, params: dict) -> tuple:
+        if isinstance(node, Input):
+            return ('input', node.name)
+        if isinstance(node.inputs, Node):
+            shape = keys[id(node.inputs)]
+        elif isinstance(node.inputs, (list, tuple)):
+            shape = tuple(keys[id(x)] if isinstance(x, Node) else ('const', id(x)) for x in node.inputs)
+        elif isinstance(node.inputs, dict):
+            shape = tuple((k, keys[id(x)] if isinstance(x, Node) else ('const', id(x))) for k, x in node.inputs.items())
+        else:
+            shape = ('const', id(node.inputs))
+        node_params = LayeredParams(node.params, params.get(node.name))
+        return ('call', id(node.func), shape, stable_hash(node_params))
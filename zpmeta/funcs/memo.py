@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Result caches used to memoize Func calls."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import os
+import time
+import uuid
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+from zpmeta.utils.common_utils import nbytes
+
+
+class ResultCache:
+    """ Thread-safe LRU cache of results keyed by content hashes.
+
+    The cache holds at most `maxsize` entries and `maxbytes` bytes (either may be None for no limit); the least
+    recently used entries are evicted first. Entries older than `ttl` seconds are treated as missing. If `path` is
+    given, results are also written to that directory and looked up there on a memory miss, so they survive
+    evictions and restarts. Cached results are returned as is, so callers should not modify them in place.
+    """
+
+    def __init__(self, maxsize: int = 128, maxbytes: int = None, ttl: float = None, path: str = None) -> None:
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits, self.misses, self.evictions, self.disk_hits = 0, 0, 0, 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__, self.stats())
+
+    def stats(self) -> dict:
+        return dict(hits=self.hits, misses=self.misses, disk_hits=self.disk_hits, evictions=self.evictions,
+                    size=len(self._entries), bytes=self._bytes)
+
+    def get(self, key: str) -> tuple:
+        """Returns (True, result) if key is cached and fresh, and (False, None) otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, size, created = entry
+                if self.ttl is None or time.time() - created <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                self._discard(key)
+
+        if self.path is not None:
+            found, value, created = self._read(key)
+            if found:
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._insert(key, value, created)
+                return True, value
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def put(self, key: str, value) -> None:
+        created = time.time()
+        with self._lock:
+            self._insert(key, value, created)
+        if self.path is not None:
+            self._write(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _insert(self, key: str, value, created: float) -> None:
+        if key in self._entries:
+            self._discard(key)
+        size = nbytes(value)
+        self._entries[key] = (value, size, created)
+        self._bytes += size
+        while len(self._entries) > 1 and ((self.maxsize is not None and len(self._entries) > self.maxsize)
+                                          or (self.maxbytes is not None and self._bytes > self.maxbytes)):
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _discard(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key + '.pkl')
+
+    def _read(self, key: str) -> tuple:
+        try:
+            created = os.path.getmtime(self._file(key))
+            if self.ttl is not None and time.time() - created > self.ttl:
+                return False, None, None
+            with open(self._file(key), 'rb') as handle:
+                return True, pickle.load(handle), created
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return False, None, None
+
+    def _write(self, key: str, value) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        tmp = "%s.%s.tmp" % (self._file(key), uuid.uuid4().hex)
+        try:
+            with open(tmp, 'wb') as handle:
+                pickle.dump(value, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._file(key))
+        except (pickle.PicklingError, AttributeError, TypeError) as err:
+            logging.warning("Result for key %s could not be written to %s: %r", key, self.path, err)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def make_cache(memo) -> ResultCache:
+    """Creates a ResultCache from the `memo` argument of a Func: None, True, a dict of options or a ResultCache."""
+    if memo is None or memo is False:
+        return None
+    if isinstance(memo, ResultCache):
+        return memo
+    if memo is True:
+        return ResultCache()
+    if isinstance(memo, dict):
+        return ResultCache(**memo)
+    raise TypeError("memo must be a bool, a dict or a ResultCache!")
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Instance registry with eviction policies used by MultitonMeta."""
+
+__copyright__ = '2023 Zeroth Principles Research'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import sys
+import logging
+import weakref
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from zpmeta.utils.common_utils import nbytes
+
+
+def instance_nbytes(obj: object) -> int:
+    """Approximate memory held by an instance, including the pandas and NumPy buffers among its attributes."""
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += nbytes(vars(obj))
+    return size
+
+
+class Registry:
+    """LRU registry of instances keyed by (class, fingerprint).
+
+    Entries are held strongly by default. Classes may set the policy attribute `_multiton_policy`, a dict with:
+        weak: hold instances through weak references, so they are dropped once no longer used elsewhere.
+        maxsize: maximum number of instances of the class; the least recently used are evicted first.
+        process: 'local' (default) or 'shared' to create the instances in the server of `zpmeta.singletons.shared`.
+    `maxsize` of the registry itself caps the number of instances across all classes. Evicted instances stay valid
+    for their current holders, but the next call with the same arguments creates a new instance.
+    """
+
+    def __init__(self, maxsize: Optional[int] = None) -> None:
+        self.maxsize = maxsize
+        self._entries: Dict[tuple, Any] = OrderedDict()
+        self._by_class: Dict[type, OrderedDict] = dict()
+        self._limited = set()
+        self._lock = threading.RLock()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: tuple) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key: tuple) -> object:
+        obj = self.get(key)
+        if obj is None:
+            raise KeyError(key)
+        return obj
+
+    def __setitem__(self, key: tuple, obj: object) -> None:
+        self.set(key, obj)
+
+    def __iter__(self):
+        return iter(list(self._entries))
+
+    @staticmethod
+    def policy(cls: type) -> dict:
+        return getattr(cls, '_multiton_policy', None) or {}
+
+    def get(self, key: tuple) -> object:
+        """Returns the instance registered for key, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        obj = entry() if isinstance(entry, weakref.ref) else entry
+        if obj is not None and (self.maxsize is not None or key[0] in self._limited):
+            # Recency only matters under a size cap. No lock needed: an entry removed concurrently stays removed.
+            try:
+                self._entries.move_to_end(key)
+                self._by_class[key[0]].move_to_end(key)
+            except KeyError:
+                pass
+        return obj
+
+    def set(self, key: tuple, obj: object) -> None:
+        cls = key[0]
+        policy = self.policy(cls)
+        entry = obj
+        if policy.get('weak', False):
+            try:
+                entry = weakref.ref(obj, lambda ref, key=key: self._expire(key, ref))
+            except TypeError:
+                logging.warning("Multiton %s does not support weak references, holding it strongly", cls.__name__)
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            members = self._by_class.setdefault(cls, OrderedDict())
+            members[key] = None
+            members.move_to_end(key)
+
+            limit = policy.get('maxsize')
+            if limit is not None:
+                self._limited.add(cls)
+            while limit is not None and len(members) > limit:
+                self._evict(next(iter(members)))
+            while self.maxsize is not None and len(self._entries) > self.maxsize:
+                self._evict(next(iter(self._entries)))
+
+    def evict(self, key: tuple) -> bool:
+        """Removes the instance registered for key. Returns whether there was one."""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._evict(key)
+            return True
+
+    def clear(self, cls: type = None) -> None:
+        """Removes all instances, or all instances of the given class."""
+        with self._lock:
+            keys = list(self._entries) if cls is None else list(self._by_class.get(cls, ()))
+            for key in keys:
+                self._remove(key)
+
+    def size(self, cls: type = None) -> int:
+        if cls is None:
+            return len(self._entries)
+        return len(self._by_class.get(cls, ()))
+
+    def nbytes(self, cls: type = None) -> int:
+        """Approximate memory held by the registered instances, or by those of the given class."""
+        return sum(instance_nbytes(obj) for _, obj in self.items(cls))
+
+    def items(self, cls: type = None) -> list:
+        with self._lock:
+            keys = list(self._entries) if cls is None else list(self._by_class.get(cls, ()))
+        items = []
+        for key in keys:
+            entry = self._entries.get(key)
+            obj = entry() if isinstance(entry, weakref.ref) else entry
+            if obj is not None:
+                items.append((key, obj))
+        return items
+
+    def info(self) -> dict:
+        """Number of instances and approximate bytes per class."""
+        summary = dict()
+        for (cls, _), obj in self.items():
+            count, size = summary.get(cls.__name__, (0, 0))
+            summary[cls.__name__] = (count + 1, size + instance_nbytes(obj))
+        return {name: dict(instances=count, nbytes=size) for name, (count, size) in summary.items()}
+
+    def after_fork(self) -> None:
+        """Drops, in a forked child, the instances of classes with `_reset_on_fork` set and the proxies to shared
+        instances, which are recreated on their next use."""
+        self._lock = threading.RLock()
+        for cls in list(self._by_class):
+            if getattr(cls, '_reset_on_fork', False) or self.policy(cls).get('process') == 'shared':
+                self.clear(cls)
+
+    def _evict(self, key: tuple) -> None:
+        logging.info("Multiton Evicting Instance of %s %s", *key)
+        self._remove(key)
+        self.evictions += 1
+
+    def _remove(self, key: tuple) -> None:
+        self._entries.pop(key, None)
+        members = self._by_class.get(key[0])
+        if members is not None:
+            members.pop(key, None)
+            if len(members) == 0:
+                del self._by_class[key[0]]
+
+    def _expire(self, key: tuple, ref: weakref.ref) -> None:
+        with self._lock:
+            if self._entries.get(key) is ref:
+                self._remove(key)
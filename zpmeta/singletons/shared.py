@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Local server holding Multiton instances shared by several processes."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import os
+import logging
+import threading
+from multiprocessing.managers import BaseManager, BaseProxy
+
+# True inside the server process, where shared Multitons are built as ordinary local instances.
+_in_server = False
+
+
+def _mark_server() -> None:
+    global _in_server
+    _in_server = True
+
+
+def in_server() -> bool:
+    return _in_server
+
+
+class _Handle:
+    """Shared instance in the server process, with the operations an InstanceProxy forwards to it."""
+
+    def __init__(self, obj: object, cls: type) -> None:
+        self.obj = obj
+        self.cls = cls
+
+    def describe(self) -> tuple:
+        # The class called by the clients (the instance is built in an isolated subclass) and its method names.
+        methods = [name for name in dir(self.cls) if (not name.startswith('_') or name == '__call__')
+                   and callable(getattr(self.cls, name, None))]
+        return self.cls, frozenset(methods)
+
+    def call(self, name: str, args: tuple, kwds: dict) -> object:
+        return getattr(self.obj, name)(*args, **kwds)
+
+    def get(self, name: str) -> object:
+        return getattr(self.obj, name)
+
+    def set(self, name: str, value) -> None:
+        setattr(self.obj, name, value)
+
+
+class InstanceProxy(BaseProxy):
+    """Proxy of a shared instance. Methods (and calls of a callable instance) run in the server, public attributes
+    are read and written there, and `isinstance` checks against the class of the instance pass."""
+    _exposed_ = ('call', 'describe', 'get', 'set')
+
+    def _description(self) -> tuple:
+        description = self.__dict__.get('_described')
+        if description is None:
+            description = self._described = self._callmethod('describe')
+        return description
+
+    @property
+    def __class__(self):
+        return self._description()[0]
+
+    def __getattr__(self, name: str):
+        # Only called for names that are not attributes of the proxy itself.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in self._description()[1]:
+            def method(*args, **kwds):
+                return self._callmethod('call', (name, args, kwds))
+            method.__name__ = name
+            return method
+        return self._callmethod('get', (name,))
+
+    def __setattr__(self, name: str, value) -> None:
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            self._callmethod('set', (name, value))
+
+    def __call__(self, *args, **kwds):
+        return self._callmethod('call', ('__call__', args, kwds))
+
+
+def _instance(cls: type, args: tuple, kwds: dict) -> _Handle:
+    # Runs in the server process, so this goes through the local Multiton registry of the server.
+    return _Handle(cls(*args, **kwds), cls)
+
+
+class InstanceManager(BaseManager):
+    pass
+
+
+InstanceManager.register('instance', callable=_instance, proxytype=InstanceProxy)
+
+
+class InstanceServer:
+    """Connection to the server process holding shared Multiton instances.
+
+    If `address` is given, the server listening there is used, and started if there is none yet, so independent
+    processes sharing the address and `authkey` share the instances. Otherwise a private server is started by the
+    first process that needs it, and processes forked from it connect to the same server. Shared instances are
+    returned as InstanceProxy objects, which forward method calls and public attribute access to the instance in the
+    server; the arguments, results and attribute values are pickled.
+    """
+
+    def __init__(self, address=None, authkey: bytes = None) -> None:
+        self.address = address
+        self.authkey = authkey
+        self._manager = None
+        self._owner = None
+        self._lock = threading.Lock()
+
+    def instance(self, cls: type, args: tuple, kwds: dict) -> object:
+        return self.manager().instance(cls, args, kwds)
+
+    def manager(self) -> InstanceManager:
+        with self._lock:
+            if self._manager is None or self._owner != os.getpid():
+                self._manager = self._connect()
+                self._owner = os.getpid()
+            return self._manager
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._manager is not None and self._owner == os.getpid() and hasattr(self._manager, 'shutdown'):
+                self._manager.shutdown()
+            self._manager = None
+
+    def _connect(self) -> InstanceManager:
+        # A forked child connects to the server of its parent.
+        address = self.address if self.address is not None or self._manager is None else self._manager.address
+        if address is not None:
+            manager = InstanceManager(address=address, authkey=self.authkey)
+            try:
+                manager.connect()
+                return manager
+            except (ConnectionRefusedError, FileNotFoundError):
+                if address != self.address:
+                    raise
+
+        manager = InstanceManager(address=address, authkey=self.authkey)
+        manager.start(initializer=_mark_server)
+        logging.info("Multiton Instance Server started at %s", manager.address)
+        return manager
+
+
+_server = InstanceServer()
+
+
+def configure(address=None, authkey: bytes = None) -> InstanceServer:
+    """Sets the server used for shared Multitons. Call before the first shared instance is created."""
+    global _server
+    _server = InstanceServer(address, authkey)
+    return _server
+
+
+def server() -> InstanceServer:
+    return _server
@@ -24,11 +24,15 @@ __author__ = 'Zeroth Principles Engineering'
 __email__ = 'engineering@zeroth-principles.com'
 __authors__ = ['Ramanuj Lal <ramanujlal@zeroth-principles.com>']
 
-import json
 from abc import ABC, ABCMeta, abstractmethod
-from typing import Any, Dict, Tuple, Optional
+from typing import Any, Optional
+import os
 import logging
-from zpmeta.utils.common_utils import custom_serializer
+import weakref
+from zpmeta.utils.hashing import stable_hash
+from zpmeta.utils.concurrency import KeyedLocks
+from zpmeta.singletons.registry import Registry
+from zpmeta.singletons import shared
 
 class IsolatedMeta(ABCMeta):
     """Metaclass for isolated classes.
@@ -65,27 +69,87 @@ class SingletonMeta(IsolatedMeta):
     logging, sentinel objects and application global constants (given as
     immutable objects).
 
+    The instance is created exactly once, even if several threads ask for it at
+    the same time. Classes setting `_reset_on_fork = True` (e.g. those holding
+    connections) create a new instance in forked child processes.
+
     """
     _instance: Optional[object] = None
+    _reset_on_fork: bool = False
+    _creating: KeyedLocks = KeyedLocks()
+    _classes = weakref.WeakSet()
 
     def __call__(cls, *args: Any, **kwds: Any) -> object:
-        if not cls._instance:
-
-            # Create an instance of the class. Note, that if the class does not
-            # implement an __init__ method a TypeError is raised. In this case
-            # the class is called without arguments.
-            try:
-                obj = super(SingletonMeta, cls).__call__(*args, **kwds)
-            except TypeError as err:
-                if 'takes no arguments' in str(err):
-                    obj = super(SingletonMeta, cls).__call__()
-                else:
-                    raise
-            cls._instance = obj
+        if cls._instance is None:
+            with SingletonMeta._creating.lock(cls):
+                if cls._instance is None:
+
+                    # Create an instance of the class. Note, that if the class does not
+                    # implement an __init__ method a TypeError is raised. In this case
+                    # the class is called without arguments.
+                    try:
+                        obj = super(SingletonMeta, cls).__call__(*args, **kwds)
+                    except TypeError as err:
+                        if 'takes no arguments' in str(err):
+                            obj = super(SingletonMeta, cls).__call__()
+                        else:
+                            raise
+                    cls._instance = obj
+                    SingletonMeta._classes.add(cls)
 
         return cls._instance
 
 
+_UNTYPED = frozenset([str, bytes, type(None)])
+_NUMBERS = frozenset([int, float, bool, complex])
+
+
+def _freeze(obj) -> object:
+    """Hashable canonical form of obj. Containers are tagged with their type so that, e.g., a dict and the tuple
+    of its items do not collide, and so are numbers and other hashable leaves, so that equal values of different
+    types (e.g. 1, 1.0 and True) do not collide either. Unhashable leaves (e.g. DataFrames) are replaced by a content
+    hash."""
+    obj_type = type(obj)
+    if obj_type in _UNTYPED:
+        return obj
+    if obj_type in _NUMBERS:
+        return (obj_type, obj)
+    if obj_type is dict:
+        try:
+            keys = sorted(obj)
+        except TypeError:
+            keys = sorted(obj, key=repr)
+        return (dict, tuple([(key, _freeze(obj[key])) for key in keys]))
+    if obj_type is list:
+        return (list, tuple([_freeze(item) for item in obj]))
+    if obj_type is tuple:
+        return tuple([_freeze(item) for item in obj])
+    if isinstance(obj, (set, frozenset)):
+        return (frozenset, frozenset([_freeze(item) for item in obj]))
+    if isinstance(obj, dict):
+        return _freeze(dict(obj))
+    try:
+        hash(obj)
+        return (obj_type, obj)
+    except TypeError:
+        return (obj_type, stable_hash(obj))
+
+
+def fingerprint(args: tuple, kwds: dict) -> tuple:
+    """Registry key of a call with args and kwds.
+
+    Hashable arguments are used as they are, together with their types as in `functools.lru_cache(typed=True)`,
+    which makes lookups as cheap as a dict access. Otherwise the arguments are converted to a canonical hashable
+    form, see `_freeze`, on every call: the form of a mutable argument cannot be reused safely.
+    """
+    items = tuple(sorted(kwds.items())) if kwds else ()
+    try:
+        hash((args, items))
+    except TypeError:
+        return (tuple([_freeze(value) for value in args]), tuple([(name, _freeze(value)) for name, value in items]))
+    return (args, items, tuple(map(type, args)), tuple([type(value) for _, value in items]))
+
+
 class MultitonMeta(IsolatedMeta):
     """Metaclass for Multitons.
 
@@ -97,51 +161,83 @@ class MultitonMeta(IsolatedMeta):
     configurations, caching and collections of constants (given as immutable
     objects).
 
+    Instances are kept in a shared Registry. Classes may bound their instances
+    with the class attribute `_multiton_policy`, e.g. `dict(weak=True)` to drop
+    instances once they are no longer used elsewhere, or `dict(maxsize=100)` to
+    keep the 100 most recently used. `MultitonMeta._registry.maxsize` caps the
+    instances of all classes together.
+
+    Each instance is created exactly once per process, even if several threads
+    ask for it at the same time. Classes setting `_reset_on_fork = True` create
+    new instances in forked child processes. With the policy
+    `dict(process='shared')` instances are created once in a server process
+    (see `zpmeta.singletons.shared`) and every process gets a proxy to them.
+
     """
-    _registry: Dict[Tuple[type, Any], object] = {}
+    _registry: Registry = Registry()
+    _creating: KeyedLocks = KeyedLocks()
+    _reset_on_fork: bool = False
 
     def __call__(cls, *args: Any, **kwds: Any) -> object:
-        # Create 'fingerprint' of instance. Beware: The fingerprint is only 
-        # hashable if all given arguments and keywords are hashable. Therupon
-        # Check registry for the fingerprint. If the fingerprint is not hashable
-        # create and return and an instance of the class. If the the fingerprint
-        # could not not be found in the registry, create a class instance, add
-        # it to the registry and return the instance.
-        # TODO: Add a warning if the fingerprint is not hashable.
-        
-        logging.info("args: %s ; kwds: %s", args, kwds)
-        if len(args) > 0:
-            key = (cls, json.dumps(args, default=custom_serializer, sort_keys=True))
-        else:
-            key = (cls, json.dumps(kwds, default=custom_serializer, sort_keys=True))
-
-        logging.info("Multiton checking registry for key: %s", key)
-    
-        if key in cls._registry:
-            logging.info("Multiton Found Instance of %s %s", *key)
-            obj = cls._registry[key]
-        else:
+        # Create 'fingerprint' of instance from both the arguments and the
+        # keywords, then check the registry for the fingerprint. If it could not
+        # be found in the registry, create a class instance, add it to the
+        # registry and return the instance.
+        key = (cls, fingerprint(args, kwds))
+
+        obj = cls._registry.get(key)
+        if obj is not None:
+            logging.debug("Multiton Found Instance of %s %s", *key)
+            return obj
+
+        with cls._creating.lock(key):
+            # Another thread may have created the instance while this one was waiting.
+            obj = cls._registry.get(key)
+            if obj is not None:
+                return obj
+
             logging.info("Multiton No Instance of %s %s", *key)
-            
-            # Create new subclass of the given class. Set the attribute '__slots__'
-            # to an empty list, to allow the usage of slots.
-            subcls = MultitonMeta(cls.__name__, (cls, ), {'__slots__': []})
-
-            # Create an instance of the class. Note, that if the class does not
-            # implement an __init__ method a TypeError is raised. In this case the
-            # class is called without arguments.
-            try:
-                obj = super(MultitonMeta, cls).__call__(*args, **kwds)
-            except TypeError as err:
-                if 'takes no arguments' in str(err):
-                    obj = super(MultitonMeta, cls).__call__()
-                else:
-                    raise
+
+            if cls._registry.policy(cls).get('process') == 'shared' and not shared.in_server():
+                obj = shared.server().instance(cls, args, kwds)
+            else:
+                # Create an instance of the class in a new isolated subclass. Note, that
+                # if the class does not implement an __init__ method a TypeError is
+                # raised. In this case the class is called without arguments.
+                try:
+                    obj = super(MultitonMeta, cls).__call__(*args, **kwds)
+                except TypeError as err:
+                    if 'takes no arguments' in str(err):
+                        obj = super(MultitonMeta, cls).__call__()
+                    else:
+                        raise
 
             # Add the instance to the registry.
             logging.info("Multiton Registering Instance of %s %s", *key)
             cls._registry[key] = obj
-            
+
         return obj
 
+    def evict_instance(cls, *args: Any, **kwds: Any) -> bool:
+        """Removes the instance for the given arguments from the registry. Returns whether there was one."""
+        return cls._registry.evict((cls, fingerprint(args, kwds)))
+
+    def clear_instances(cls) -> None:
+        """Removes all instances of the class from the registry."""
+        cls._registry.clear(cls)
+
+
+def _after_fork() -> None:
+    # Locks may have been held by threads of the parent, which do not exist in the child.
+    SingletonMeta._creating.reset()
+    MultitonMeta._creating.reset()
+    MultitonMeta._registry.after_fork()
+    for cls in list(SingletonMeta._classes):
+        if cls._reset_on_fork:
+            cls._instance = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
 Mu = MultitonMeta
\ No newline at end of file
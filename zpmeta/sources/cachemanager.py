@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Process-wide memory budget for the caches of PanelSources."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import os
+import time
+import uuid
+import logging
+import weakref
+import tempfile
+import threading
+from collections import OrderedDict
+from pandas import DataFrame
+from zpmeta.utils.metrics import metrics
+from zpmeta.sources.panelstore import FilePanelStore
+
+
+class CacheManager:
+    """ Tracks the memory of all PanelSource caches of the process and keeps it within `max_bytes`.
+
+    Every PanelSource registers with the global `cache_manager` when created. Once a budget is set (e.g.
+    `cache_manager.configure(max_bytes=8 * 2**30)`), sources report their footprint after every fill, and while the
+    total exceeds the budget the least recently used sources are evicted with `PanelSource.evict`:
+
+    - sources with a committed `caching['store']` drop their cache and reload it from the store when next called,
+    - other sources are spilled to `spill_dir` (True for a temporary directory) in the Arrow IPC format, which
+      requires pyarrow, and reloaded from there when next called,
+    - without a spill directory their cache is dropped and refetched when next called.
+
+    Sources being filled are never evicted. Without a budget sources are only accounted for `usage` and `nbytes`.
+    """
+
+    def __init__(self, max_bytes: int = None, spill_dir=None) -> None:
+        self._sources = OrderedDict()
+        self._bytes = dict()
+        self._used = dict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.max_bytes, self.spill_dir, self.enabled = None, None, False
+        self.configure(max_bytes, spill_dir)
+
+    def configure(self, max_bytes: int = None, spill_dir=None) -> None:
+        """Sets the budget in bytes (None for no budget) and the spill directory (None to drop evicted caches)."""
+        if spill_dir is True:
+            spill_dir = tempfile.mkdtemp(prefix='zpmeta-spill-')
+        self.max_bytes, self.spill_dir = max_bytes, spill_dir
+        self.enabled = max_bytes is not None
+
+    def register(self, source) -> None:
+        key = id(source)
+        with self._lock:
+            self._sources[key] = weakref.ref(source, lambda _, key=key: self._forget(key))
+            self._bytes[key], self._used[key] = 0, time.time()
+
+    def _forget(self, key: int) -> None:
+        with self._lock:
+            self._sources.pop(key, None)
+            self._bytes.pop(key, None)
+            self._used.pop(key, None)
+
+    def touch(self, source) -> None:
+        """Marks source as the most recently used."""
+        key = id(source)
+        with self._lock:
+            if key in self._sources:
+                self._sources.move_to_end(key)
+                self._used[key] = time.time()
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of all caches as last reported."""
+        with self._lock:
+            return sum(self._bytes.values())
+
+    def account(self, source) -> None:
+        """Records the footprint of source after a fill and evicts other sources while the budget is exceeded."""
+        key = id(source)
+        size = source.cache_nbytes() if source._managed else 0
+        with self._lock:
+            if key not in self._sources:
+                return
+            self._bytes[key] = size
+            self._sources.move_to_end(key)
+            self._used[key] = time.time()
+            total = sum(self._bytes.values())
+            if self.max_bytes is None or total <= self.max_bytes:
+                return
+            candidates = [ref for other, ref in self._sources.items() if other != key and self._bytes[other] > 0]
+
+        for ref in candidates:
+            if total <= self.max_bytes:
+                break
+            candidate = ref()
+            if candidate is None:
+                continue
+            freed = candidate.evict(self._spill_store() if self.spill_dir is not None else None)
+            if freed > 0:
+                total -= freed
+                self.evictions += 1
+                with self._lock:
+                    if id(candidate) in self._bytes:
+                        self._bytes[id(candidate)] = 0
+                logging.info("EVICT %s: %d bytes", candidate, freed)
+                if metrics.enabled:
+                    metrics.count('panelsource_evictions', candidate._labels)
+        if total > self.max_bytes:
+            logging.warning("PanelSource caches use %d bytes, above the budget of %d bytes", total, self.max_bytes)
+
+    def _spill_store(self) -> FilePanelStore:
+        return FilePanelStore(os.path.join(self.spill_dir, uuid.uuid4().hex), format='arrow')
+
+    def usage(self) -> DataFrame:
+        """Returns the current bytes, the time of the last use and the spill state of every live source, from the
+        least to the most recently used."""
+        with self._lock:
+            refs = [(ref, self._used[key]) for key, ref in self._sources.items()]
+        rows = []
+        for ref, used in refs:
+            source = ref()
+            if source is not None:
+                rows.append(dict(source=str(source), nbytes=source.cache_nbytes(), last_used=used,
+                                 spilled=source._spill is not None))
+        return DataFrame(rows, columns=['source', 'nbytes', 'last_used', 'spilled'])
+
+
+cache_manager = CacheManager()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Compact representation of cached panels."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import numpy as np
+from pandas import DataFrame, MultiIndex, CategoricalDtype, isna
+from pandas.api.extensions import ExtensionDtype
+
+COMPACT_DEFAULTS = dict(float_dtype='float32', integer=True, categorical=0.5, fields=None, field_level=None)
+
+
+def compact_options(compact) -> dict:
+    """Options of the caching option `compact`: None or False (disabled), True (defaults) or a dict of options."""
+    if compact is None or compact is False:
+        return None
+    if compact is True:
+        return dict(COMPACT_DEFAULTS)
+    if isinstance(compact, dict):
+        return dict(COMPACT_DEFAULTS, **compact)
+    raise TypeError("compact must be a bool or a dict!")
+
+
+def compact_frame(frame: DataFrame, float_dtype=None, integer: bool = False, categorical: float = None,
+                  fields: dict = None, field_level=None) -> DataFrame:
+    """Returns frame with smaller dtypes.
+
+    Args:
+        float_dtype: dtype of float columns, e.g. 'float32', or None to keep them.
+        integer: whether to downcast integer columns to the smallest dtype holding their values.
+        categorical: encode object and string columns as categoricals if their share of distinct values is at most
+            this ratio, or None to keep them.
+        fields: dict of field -> dtype that takes precedence for the columns of a field.
+        field_level: the column level holding the fields, by default the last level.
+    """
+    if frame.shape[1] == 0:
+        return frame
+    targets = dict()
+    dtypes = frame.dtypes.to_numpy()
+    for dtype in set(dtypes):
+        positions = np.flatnonzero(dtypes == dtype)
+        kind = getattr(dtype, 'kind', 'O')
+        if kind == 'f' and float_dtype is not None:
+            target = np.dtype(float_dtype)
+        elif kind in 'iu' and integer and len(frame) > 0 and isinstance(dtype, ExtensionDtype):
+            # nullable Int*/UInt*: the bounds skip NA and the target stays nullable, else NA turns into float NaN
+            block = frame.iloc[:, positions]
+            low, high = block.min().min(), block.max().max()
+            if isna(low):
+                continue
+            target = np.result_type(np.min_scalar_type(low), np.min_scalar_type(high)).name
+            target = target.replace('uint', 'UInt').replace('int', 'Int')
+        elif kind in 'iu' and integer and len(frame) > 0:
+            values = frame.iloc[:, positions].to_numpy()
+            target = np.result_type(np.min_scalar_type(values.min()), np.min_scalar_type(values.max()))
+        elif kind in 'OSU' and categorical is not None and len(frame) > 0:
+            for position in positions:
+                column = frame.iloc[:, position]
+                if not isinstance(column.dtype, CategoricalDtype) and column.nunique() <= categorical * len(column):
+                    targets[position] = 'category'
+            continue
+        else:
+            continue
+        if target != dtype:
+            targets.update(dict.fromkeys(positions, target))
+
+    if fields:
+        level = field_level if field_level is not None else frame.columns.nlevels - 1
+        labels = frame.columns.get_level_values(level)
+        for field, dtype in fields.items():
+            targets.update(dict.fromkeys(np.flatnonzero(labels == field), dtype))
+
+    if isinstance(frame.columns, MultiIndex):
+        frame = frame.set_axis(frame.columns.remove_unused_levels(), axis=1)
+    if len(targets) == 0:
+        return frame
+    if len(targets) == frame.shape[1] and len(set(targets.values())) == 1:
+        return frame.astype(next(iter(targets.values())))
+    columns = frame.columns
+    return frame.astype({columns[position]: dtype for position, dtype in targets.items()})
+
+
+def memory_report(frame: DataFrame, level=None) -> DataFrame:
+    """Returns the columns, dtypes and bytes of frame per value of a column level (by default the last level)."""
+    level = level if level is not None else frame.columns.nlevels - 1
+    labels = frame.columns.get_level_values(level)
+    usage = frame.memory_usage(deep=True, index=False).to_numpy()
+    dtypes = frame.dtypes.astype(str).to_numpy()
+    report = DataFrame(dict(columns=1, nbytes=usage, dtypes=dtypes), index=labels)
+    return report.groupby(level=0, sort=False).agg(
+        columns=('columns', 'sum'), dtypes=('dtypes', lambda x: ', '.join(sorted(set(x)))), nbytes=('nbytes', 'sum'))
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Coverage bookkeeping for cached panel data."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+from bisect import bisect_left, bisect_right
+from pandas import Timestamp, Timedelta
+from pandas.tseries.frequencies import to_offset
+
+
+class IntervalSet:
+    """ Sorted set of disjoint closed intervals over any ordered type (dates, timestamps, integers).
+
+    Overlapping and touching intervals are merged on insertion, so [a, b] and [b, c] become [a, c]. Gaps returned by
+    `missing` share their end points with the covered neighbours, following the inclusive (start, end) convention
+    of `PanelSource` periods.
+    """
+    __slots__ = ('_starts', '_ends')
+
+    def __init__(self, intervals=None):
+        self._starts, self._ends = [], []
+        if intervals is not None:
+            for interval in intervals:
+                self.add(interval)
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__, list(self))
+
+    def __iter__(self):
+        return iter(zip(self._starts, self._ends))
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __bool__(self):
+        return len(self._starts) > 0
+
+    def __eq__(self, other):
+        return isinstance(other, IntervalSet) and list(self) == list(other)
+
+    def __getstate__(self):
+        return self._starts, self._ends
+
+    def __setstate__(self, state):
+        self._starts, self._ends = state
+
+    def copy(self) -> 'IntervalSet':
+        other = IntervalSet()
+        other._starts, other._ends = list(self._starts), list(self._ends)
+        return other
+
+    @property
+    def bounds(self) -> tuple:
+        """(min, max) hull of the set, or None if the set is empty."""
+        if not self._starts:
+            return None
+        return self._starts[0], self._ends[-1]
+
+    def add(self, interval: tuple) -> None:
+        start, end = interval
+        if end < start:
+            raise ValueError("interval end %s is before its start %s" % (end, start))
+        # first interval whose end reaches start, and first interval starting after end
+        lo = bisect_left(self._ends, start)
+        hi = bisect_right(self._starts, end)
+        if lo < hi:
+            start = min(start, self._starts[lo])
+            end = max(end, self._ends[hi - 1])
+        self._starts[lo:hi] = [start]
+        self._ends[lo:hi] = [end]
+
+    def remove(self, interval: tuple) -> None:
+        """Drops the coverage inside `interval`. Its end points stay covered by the neighbours, so `missing` returns
+        `interval` itself as the gap."""
+        start, end = interval
+        lo = bisect_left(self._ends, start)
+        hi = bisect_right(self._starts, end)
+        if lo >= hi:
+            return
+        starts, ends = [], []
+        if self._starts[lo] < start:
+            starts.append(self._starts[lo])
+            ends.append(start)
+        if self._ends[hi - 1] > end:
+            starts.append(end)
+            ends.append(self._ends[hi - 1])
+        self._starts[lo:hi] = starts
+        self._ends[lo:hi] = ends
+
+    def truncate(self, before=None, after=None) -> None:
+        """Drops coverage before `before` and after `after`."""
+        if after is not None:
+            hi = bisect_right(self._starts, after)
+            del self._starts[hi:], self._ends[hi:]
+            if hi > 0 and self._ends[-1] > after:
+                self._ends[-1] = after
+        if before is not None:
+            lo = bisect_left(self._ends, before)
+            del self._starts[:lo], self._ends[:lo]
+            if self._starts and self._starts[0] < before:
+                self._starts[0] = before
+
+    def covers(self, interval: tuple) -> bool:
+        return not self.missing(interval)
+
+    def missing(self, interval: tuple) -> list:
+        """Returns the sub-intervals of `interval` that are not covered, in ascending order."""
+        start, end = interval
+        gaps = []
+        lo = bisect_left(self._ends, start)
+        hi = bisect_right(self._starts, end)
+        cursor = start
+        for i in range(lo, hi):
+            if self._starts[i] > cursor:
+                gaps.append((cursor, self._starts[i]))
+            cursor = max(cursor, self._ends[i])
+        if cursor < end or (cursor == start and lo == hi):
+            gaps.append((cursor, end))
+        return gaps
+
+
+def period_windows(period: tuple, freq) -> list:
+    """Splits an inclusive (start, end) period into consecutive, non-overlapping inclusive windows of length `freq`
+    (a pandas frequency string such as '365D' or 'YS', an offset or a Timedelta). Window bounds are Timestamps."""
+    start, end = Timestamp(period[0]), Timestamp(period[1])
+    step = to_offset(freq)
+    # The smallest step in the resolution of the period, so that windows keep that resolution.
+    tick = Timedelta(1, getattr(start, 'unit', 'ns'))
+    windows = []
+    while start <= end:
+        stop = start + step
+        windows.append((start, min(stop - tick, end)))
+        start = stop
+    return windows
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""PanelSources computed from other PanelSources."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import math
+import logging
+import threading
+from pandas import DataFrame
+from pandas.tseries.frequencies import to_offset
+from zpmeta.sources.panelsource import PanelSource
+from zpmeta.sources.coverage import IntervalSet
+
+_IDLE = object()
+
+
+class DerivedPanelSource(PanelSource):
+    """ PanelSource whose data is a transform of the data of upstream PanelSources.
+
+    `upstream` is a PanelSource, whose panel is passed to `transform` as the operand, or a dict of PanelSources, whose
+    panels are passed as a dict with the same keys. The transform (e.g. a Func) returns a panel with the columns of
+    the requested entities, which `_upstream_entities` maps to the entities of each upstream source (by default the
+    same entities).
+
+    Like any PanelSource, the derived source only computes the entities and periods missing from its cache. Window
+    operations need `lookback` earlier rows, given as a number of rows of the upstream data or as a period (e.g.
+    '30D'), which are requested from the upstream sources and dropped from the result. When an upstream source
+    refetches periods (e.g. its tail with `ts_refresh`, or when refreshed by a RefreshScheduler), the derived rows of
+    these periods and of the `lookback` rows after them are invalidated, together with the sources derived from this
+    one, and recomputed by the next call that requests them.
+    """
+
+    def __init__(self, upstream, transform, lookback=0, params: dict = None, caching: dict = None):
+        super(DerivedPanelSource, self).__init__(params, caching)
+        self.upstream = upstream
+        self.transform = transform
+        self.lookback = lookback if isinstance(lookback, int) else to_offset(lookback)
+        self._register()
+
+    def __getstate__(self):
+        state = super(DerivedPanelSource, self).__getstate__()
+        del state['_requesting']
+        state['_filling'], state['_stale'] = 0, []
+        return state
+
+    def __setstate__(self, state):
+        super(DerivedPanelSource, self).__setstate__(state)
+        self._register()
+
+    def _register(self) -> None:
+        self._requesting = threading.local()
+        self._filling, self._stale = 0, []
+        for source in self._sources().values():
+            source._dependents.add(self)
+
+    def _sources(self) -> dict:
+        return self.upstream if isinstance(self.upstream, dict) else {None: self.upstream}
+
+    def _upstream_entities(self, name, entities: dict) -> dict:
+        """Entities requested from the upstream source `name` (None for a single upstream source)."""
+        return entities
+
+    def _execute(self, entities=None, period=None):
+        # Upstream fills caused by these requests notify this source of the period it is computing anyway.
+        self._requesting.period = period
+        try:
+            operands = dict()
+            for name, source in self._sources().items():
+                source_entities = self._upstream_entities(name, entities)
+                operands[name] = source(source_entities, self._extended(source, source_entities, period))
+        finally:
+            del self._requesting.period
+        result = self.transform(operands if isinstance(self.upstream, dict) else operands[None])
+        if period is not None and isinstance(result, DataFrame):
+            result = result.loc[period[0]:period[1]]
+        return result
+
+    def _extended(self, source: PanelSource, entities: dict, period: tuple) -> tuple:
+        # The period extended by the lookback, as an offset or in rows of the upstream cache. Rows are counted after
+        # filling the upstream cache for the period, and earlier windows are filled (each twice the estimated length
+        # of the rows still missing) until the cache holds `lookback` rows before the period or has no earlier data.
+        if period is None or not self.lookback:
+            return period
+        if not isinstance(self.lookback, int):
+            return period[0] - self.lookback, period[1]
+        source._run_fill(entities, period)
+        start, found = period[0], -1
+        while True:
+            with source._lock.read():
+                index = source.value.index if source.value is not None else None
+                if index is None or len(index) == 0:
+                    return period
+                position = index.searchsorted(period[0])
+                if position >= self.lookback or position == found:
+                    return min(index[max(position - self.lookback, 0)], period[0]), period[1]
+                spacing = (index[-1] - index[0]) / (len(index) - 1) if len(index) > 1 else period[1] - period[0]
+            if not spacing:
+                return min(index[0], period[0]), period[1]
+            step = spacing * 2 * (self.lookback - position)
+            start, found = start - (math.ceil(step) if isinstance(step, float) else step), position
+            source._run_fill(entities, (start, period[0]))
+
+    def _extended_after(self, period: tuple) -> tuple:
+        # The period extended by the lookback after its end: the rows whose windows include the period.
+        if not self.lookback:
+            return period
+        if not isinstance(self.lookback, int):
+            return period[0], period[1] + self.lookback
+        index = self.value.index if self.value is not None else None
+        if index is None or len(index) == 0:
+            return period
+        position = index.searchsorted(period[1], side='right') - 1 + self.lookback
+        return period[0], max(index[min(position, len(index) - 1)], period[1])
+
+    def invalidate(self, period: tuple = None) -> None:
+        """Marks the derived data of period (None for all periods) as stale, so that it is recomputed when next
+        requested, and invalidates the sources derived from this one."""
+        with self._lock.write():
+            if self.value is None:
+                return
+            stale = self._uncomputed(self._extended_after(period) if period is not None else None)
+            for piece in stale:
+                self._drop(piece)
+                if self._filling:
+                    # The running fills extend the coverage when done and must not restore this period.
+                    self._stale.append(piece)
+        if len(stale) > 0:
+            logging.info("INVALIDATE %s %s", self, stale)
+            self._notify(stale)
+
+    def _uncomputed(self, stale: tuple) -> list:
+        # The parts of a stale period (None for all periods) outside the period that this thread is computing from
+        # freshly fetched upstream data.
+        computing = getattr(self._requesting, 'period', _IDLE)
+        if computing is _IDLE:
+            return [stale]
+        if computing is None:
+            return []
+        if stale is None:
+            stale = self.coverage.bounds
+            if stale is None:
+                return []
+        pieces = IntervalSet([stale])
+        pieces.remove(computing)
+        return list(pieces)
+
+    def _drop(self, period: tuple) -> None:
+        if period is None:
+            self.coverage = IntervalSet()
+        else:
+            self.coverage.remove(period)
+
+    def _fill(self, entities: dict = None, period: tuple = None, plan=None) -> None:
+        with self._lock.write():
+            self._filling += 1
+        try:
+            super(DerivedPanelSource, self)._fill(entities, period, plan)
+        finally:
+            with self._lock.write():
+                self._filling -= 1
+                for stale in self._stale:
+                    self._drop(stale)
+                if self._filling == 0:
+                    self._stale = []
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Merging of incremental data into cached panels."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import weakref
+import numpy as np
+from pandas import DataFrame, Index, CategoricalDtype, concat
+from pandas.api.types import pandas_dtype
+
+
+def align_dtypes(old: DataFrame, new: DataFrame) -> tuple:
+    """Returns old and new with the columns they share cast to a common dtype, so that the values of either fit in it.
+
+    Numeric columns take `np.result_type` of both dtypes, so a cached column is upcast to hold wider new values and
+    new values are never cast below the cached dtype. Categorical columns take the union of the categories of both.
+    """
+    shared = np.flatnonzero(new.columns.isin(old.columns))
+    if len(shared) == 0:
+        return old, new
+    positions = old.columns.get_indexer(new.columns[shared])
+    old_dtypes, new_dtypes = old.dtypes.to_numpy()[positions], new.dtypes.to_numpy()[shared]
+    old_targets, new_targets = dict(), dict()
+    for old_dtype, new_dtype in set(zip(old_dtypes, new_dtypes)):
+        if isinstance(old_dtype, CategoricalDtype) or isinstance(new_dtype, CategoricalDtype):
+            continue
+        # Nullable integer and boolean columns (see merge_frames) align through their NumPy dtype.
+        old_numpy = old_dtype if isinstance(old_dtype, np.dtype) else _nullable_numpy(old_dtype)
+        if old_dtype == new_dtype or old_numpy is None or not isinstance(new_dtype, np.dtype):
+            continue
+        target = np.result_type(old_numpy, new_dtype)
+        pair = np.flatnonzero((old_dtypes == old_dtype) & (new_dtypes == new_dtype))
+        old_target = target if old_numpy is old_dtype else (_nullable(target) or target)
+        if old_target != old_dtype:
+            old_targets.update(dict.fromkeys(old.columns[positions[pair]], old_target))
+        if target != new_dtype:
+            new_targets.update(dict.fromkeys(new.columns[shared[pair]], target))
+
+    # Categories differ per column, so categorical columns are aligned one at a time.
+    for i in np.flatnonzero([isinstance(dtype, CategoricalDtype) for dtype in old_dtypes]):
+        categories = old_dtypes[i].categories
+        if isinstance(new_dtypes[i], CategoricalDtype):
+            values = new_dtypes[i].categories
+        else:
+            values = new.iloc[:, shared[i]].dropna().unique()
+        added = Index(values).difference(categories)
+        dtype = CategoricalDtype(categories.append(added), old_dtypes[i].ordered) if len(added) > 0 else old_dtypes[i]
+        if dtype != old_dtypes[i]:
+            old_targets[old.columns[positions[i]]] = dtype
+        if dtype != new_dtypes[i]:
+            new_targets[new.columns[shared[i]]] = dtype
+    # New categoricals merged into plain columns take the dtype of their categories.
+    for i in np.flatnonzero([isinstance(dtype, CategoricalDtype) for dtype in new_dtypes]):
+        if not isinstance(old_dtypes[i], CategoricalDtype):
+            new_targets[new.columns[shared[i]]] = new_dtypes[i].categories.dtype
+
+    if len(old_targets) > 0:
+        old = old.astype(old_targets)
+    if len(new_targets) > 0:
+        new = new.astype(new_targets)
+    return old, new
+
+
+def merge_frames(old: DataFrame, new: DataFrame) -> DataFrame:
+    """Returns `old` extended by the rows and columns of `new`, with the values of `new` overwriting those of `old`
+    wherever both have data. New columns are appended after the existing ones and rows are kept sorted. Shared columns
+    are cast to a dtype holding both (see `align_dtypes`), and other columns keep their dtype, except that integer and
+    boolean columns with missing values become nullable (e.g. 'Int64')."""
+    old, new = align_dtypes(old, new)
+    new_columns = ~new.columns.isin(old.columns)
+    index = old.index if new.index.isin(old.index).all() else old.index.union(new.index)
+    result = old.copy() if index is old.index else old.reindex(index=index)
+
+    shared = np.flatnonzero(~new_columns)
+    rows = result.index.get_indexer(new.index)
+    cols = result.columns.get_indexer(new.columns[shared])
+    # Assigning each dtype separately keeps the dtypes of the columns.
+    dtypes = new.dtypes.to_numpy()[shared]
+    for dtype in set(dtypes):
+        positions = np.flatnonzero(dtypes == dtype)
+        result.iloc[rows, cols[positions]] = new.iloc[:, shared[positions]].to_numpy()
+    if new_columns.any():
+        # New columns are appended with their own dtype.
+        result = concat([result, new.iloc[:, np.flatnonzero(new_columns)].reindex(index)], axis=1)
+
+    # Reindexing fills the added rows and columns with NaN, which turns e.g. integer columns into floats. Their dtype
+    # is restored if the new data filled all gaps, and integer and boolean columns with gaps become nullable.
+    if index is not old.index or new_columns.any():
+        sources = np.concatenate([old.dtypes.to_numpy(), new.dtypes.to_numpy()[new_columns]])
+        dtypes = result.dtypes.to_numpy()
+        restore = dict()
+        for dtype in set(sources[sources != dtypes]):
+            positions = np.flatnonzero((sources == dtype) & (sources != dtypes))
+            gaps = result.iloc[:, positions].isna().to_numpy().any(axis=0)
+            nullable = _nullable(dtype)
+            for position, gap in zip(positions, gaps):
+                if not gap:
+                    restore[result.columns[position]] = dtype
+                elif nullable is not None:
+                    restore[result.columns[position]] = nullable
+        if len(restore) > 0:
+            result = result.astype(restore)
+    return result
+
+
+def _nullable(dtype):
+    # Nullable pandas dtype holding the values of a NumPy integer or boolean dtype, or None.
+    if not isinstance(dtype, np.dtype):
+        return None
+    if dtype.kind == 'b':
+        return pandas_dtype('boolean')
+    if dtype.kind in 'iu':
+        return pandas_dtype('%sInt%d' % ('U' if dtype.kind == 'u' else '', 8 * dtype.itemsize))
+    return None
+
+
+def _nullable_numpy(dtype):
+    # NumPy dtype of a nullable integer or boolean dtype, or None.
+    numpy_dtype = getattr(dtype, 'numpy_dtype', None)
+    return numpy_dtype if numpy_dtype is not None and _nullable(numpy_dtype) == dtype else None
+
+
+class PanelBuffer:
+    """ Preallocated storage for a float panel that grows by appending rows and columns.
+
+    Rows must have a sorted, unique and numpy-typed index (e.g. a DatetimeIndex without time zone) and columns must
+    be unique. Both dimensions are allocated with spare capacity, so merging rows after the last cached row, new
+    columns or overlapping tail rows (as refreshed with `ts_refresh`) costs time proportional to the new data. Rows
+    inserted before the last cached row rebuild the buffer. The frames returned share memory with the buffer, and
+    rows overwritten by later merges change in frames returned earlier, except in frames registered with `share`:
+    while any of these is alive, a merge that overwrites cached values first copies the buffer.
+    """
+    growth = 1.25
+
+    def __init__(self, frame: DataFrame) -> None:
+        self._load(frame)
+
+    def _load(self, frame: DataFrame) -> None:
+        rows, cols = frame.shape
+        self._dtype = np.result_type(*frame.dtypes, np.float16) if cols > 0 else np.dtype(float)
+        self._values = np.full((self._capacity(rows), self._capacity(cols)), np.nan, dtype=self._dtype)
+        self._values[:rows, :cols] = frame.to_numpy(dtype=self._dtype)
+        self._index = np.empty(self._values.shape[0], dtype=frame.index.dtype)
+        self._index[:rows] = frame.index.to_numpy()
+        self._index_name = frame.index.name
+        self.columns = frame.columns
+        self.shape = (rows, cols)
+        self._frame = None
+        self._shared = []
+
+    @classmethod
+    def supports(cls, frame: DataFrame) -> bool:
+        """Whether frame can be held in a buffer."""
+        return (frame.columns.is_unique and isinstance(frame.index.dtype, np.dtype)
+                and frame.index.is_monotonic_increasing and frame.index.is_unique
+                and all(isinstance(dtype, np.dtype) and dtype.kind == 'f' for dtype in frame.dtypes))
+
+    @property
+    def nbytes(self) -> int:
+        return self._values.nbytes + self._index.nbytes
+
+    def holds(self, frame: DataFrame) -> bool:
+        return frame is self._frame
+
+    def share(self, frame: DataFrame) -> None:
+        """Registers a frame sharing memory with the buffer (e.g. a view handed out to callers), whose values must not
+        change when later merges overwrite cached values."""
+        self._shared.append(weakref.ref(frame))
+
+    def _is_shared(self) -> bool:
+        self._shared = [ref for ref in self._shared if ref() is not None]
+        return len(self._shared) > 0
+
+    def frame(self) -> DataFrame:
+        if self._frame is None:
+            rows, cols = self.shape
+            index = Index(self._index[:rows], name=self._index_name, copy=False)
+            self._frame = DataFrame(self._values[:rows, :cols], index=index, columns=self.columns, copy=False)
+        return self._frame
+
+    def merge(self, new: DataFrame) -> DataFrame:
+        """Merges new into the buffer, its values overwriting cached values. Returns the merged frame, or None if new
+        is not a numeric frame with unique columns and a unique index of the same kind, leaving the buffer unchanged."""
+        if not new.index.is_monotonic_increasing:
+            new = new.sort_index()
+        values = new.to_numpy()
+        if values.dtype.kind not in 'fiub' or not new.columns.is_unique or not new.index.is_unique \
+                or not isinstance(new.index.dtype, np.dtype) or new.index.dtype.kind != self._index.dtype.kind:
+            return None
+        rows, cols = self.shape
+
+        col_positions = self.columns.get_indexer(new.columns)
+        added_cols = col_positions < 0
+        if added_cols.any():
+            col_positions[added_cols] = cols + np.arange(added_cols.sum())
+
+        new_index = new.index.to_numpy()
+        row_positions = np.searchsorted(self._index[:rows], new_index)
+        exists = row_positions < rows
+        exists[exists] = self._index[row_positions[exists]] == new_index[exists]
+        added_rows = ~exists
+        if added_rows.any() and row_positions[added_rows].min() < rows:
+            # Rows inserted before the end of the cache.
+            self._load(merge_frames(self.frame(), new))
+            return self.frame()
+        row_positions[added_rows] = rows + np.arange(added_rows.sum())
+
+        dtype = np.result_type(self._dtype, values.dtype, np.float16)
+        self._reserve(rows + added_rows.sum(), cols + added_cols.sum(), dtype)
+        if exists.any() and not added_cols.all() and self._is_shared():
+            # Copy on write: the shared frames keep the values they were created with.
+            self._values, self._shared = self._values.copy(), []
+        if added_cols.any():
+            self.columns = self.columns.append(new.columns[added_cols])
+        self._index[row_positions[added_rows]] = new_index[added_rows]
+        rows_at, cols_at = self._indexer(row_positions), self._indexer(col_positions)
+        if not isinstance(rows_at, slice) and not isinstance(cols_at, slice):
+            rows_at, cols_at = np.ix_(rows_at, cols_at)
+        self._values[rows_at, cols_at] = values
+        self.shape = (rows + added_rows.sum(), cols + added_cols.sum())
+        self._frame = None
+        return self.frame()
+
+    def _reserve(self, rows: int, cols: int, dtype: np.dtype) -> None:
+        capacity = self._values.shape
+        if rows <= capacity[0] and cols <= capacity[1] and dtype == self._dtype:
+            return
+        shape = (self._capacity(rows) if rows > capacity[0] else capacity[0],
+                 self._capacity(cols) if cols > capacity[1] else capacity[1])
+        values = np.full(shape, np.nan, dtype=dtype)
+        values[:self.shape[0], :self.shape[1]] = self._values[:self.shape[0], :self.shape[1]]
+        self._values, self._dtype, self._shared = values, dtype, []
+        if shape[0] > capacity[0]:
+            index = np.empty(shape[0], dtype=self._index.dtype)
+            index[:self.shape[0]] = self._index[:self.shape[0]]
+            self._index = index
+
+    @classmethod
+    def _capacity(cls, size: int) -> int:
+        return max(int(size * cls.growth), size + 16)
+
+    @staticmethod
+    def _indexer(positions: np.ndarray):
+        # Contiguous positions become a slice, so that assignments do not go through fancy indexing.
+        if len(positions) > 0 and (np.diff(positions) == 1).all():
+            return slice(positions[0], positions[-1] + 1)
+        return positions
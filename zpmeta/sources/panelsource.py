@@ -17,11 +17,30 @@
 #
 """Superclasses for frequently used design patterns."""
 
+import time
+import shutil
+import asyncio
 import logging
-import itertools
+import functools
+import weakref
+import threading
+import numpy as np
 from abc import abstractmethod, ABCMeta
-from pandas import DataFrame, Series, concat, MultiIndex
-from zpmeta.utils.common_utils import deep_update
+from pandas import DataFrame, Series, Timestamp, concat, MultiIndex
+from zpmeta.utils.common_utils import deep_update, nbytes
+from zpmeta.utils.metrics import metrics
+from zpmeta.utils.concurrency import ReadWriteLock, RateLimiter
+from zpmeta.sources.panelstore import make_store
+from zpmeta.sources.coverage import IntervalSet, period_windows
+from zpmeta.sources.merge import PanelBuffer, merge_frames
+from zpmeta.sources.compact import compact_options, compact_frame, memory_report
+from zpmeta.sources.planner import Fetch, Plan
+from zpmeta.sources.sharedmem import SharedPanel
+from zpmeta.sources.prefetch import Prefetcher, prefetch_options
+from zpmeta.sources.cachemanager import cache_manager
+from zpmeta.funcs.executors import get_executor
+
+_END = object()
 
 
 class PanelSource:
@@ -30,22 +49,74 @@ class PanelSource:
     This callable class generate panel data (cross-sectional and time-series) given a dict of parameters.
     It has memory and once called for a list of ids/variables and date range, it does not re-run for that set again 
     when called a second time for the same set of inputs, but only appends data for new inputs.
+
+    `_execute` may return the panel as one DataFrame or as an iterable of DataFrames (e.g. a generator yielding a
+    period window or a batch of entities at a time), which are merged into the cache one chunk at a time. Requests can
+    also be split by the caching option `chunks`, e.g. `dict(period='365D', entities=500)` executes windows of 365
+    days for batches of 500 entities. `stream` yields results chunk by chunk instead of returning a single frame.
+
+    The caching option `compact` stores the cache with smaller dtypes: True downcasts floats to float32, integers to
+    the smallest dtype holding them and repetitive string columns to categoricals, and a dict of options of
+    `compact_frame` overrides these defaults, e.g. `dict(float_dtype=None, fields=dict(volume='float32'))`.
+    Chunks are compacted on their own, and cached columns are upcast (or their categories extended) when a later chunk
+    needs a wider dtype. `memory_report` shows the memory used per field.
+
+    Each call is executed through a Plan of upstream fetches, which `plan` returns without executing them. The fetches
+    are split into the batches of `chunks`, started at most `rate_limit` times per second, and run concurrently if
+    the caching option `executor` names an executor of `zpmeta.funcs.executors` (e.g. 'thread').
+
+    With sinks registered on `zpmeta.utils.metrics.metrics`, calls report hits and misses (also per entity and period
+    dimension), bytes fetched and served, and the time spent planning, executing, merging and copying, labelled with
+    the caching option `name` (by default the class name).
+
+    `publish` copies the cache into a versioned shared memory snapshot, which other processes attach by name as a
+    read-only `SharedPanelSource` instead of each holding a copy. With the caching option `publish` (True or a name)
+    the cache is republished after every fill.
+
+    The caching option `prefetch` (True or a dict of options of `Prefetcher`, e.g. `dict(lookahead=2,
+    max_bytes=2**30)`) detects calls sliding a period window over the same entities, as in walk-forward backtests,
+    and fetches the next windows on a background thread while the caller processes the current one.
+
+    The caching option `store` (a dict with the `path` of a directory and the options of `FilePanelStore`) persists
+    the cache, which is loaded on the first call. Processes sharing a store merge the coverage they commit.
+
+    All instances register with the process-wide `cache_manager`, which evicts the least recently used caches when
+    given a memory budget (see `CacheManager`).
     ----
     [01 Jul 2023] Created
     ----
     """
     _appendable = dict(xs=False, ts=True)
+    _managed = True
 
     def __init__(self, params: dict = None, caching: dict = None):
         super(PanelSource, self).__init__()
         self.params = params
 
-        self.caching = dict(ts_anchor='call', ts_refresh=0, entity_levels=None)
+        self.caching = dict(ts_anchor='call', ts_refresh=0, entity_levels=None, store=None, subset='copy',
+                            chunks=None, compact=None, executor=None, max_workers=None, rate_limit=None,
+                            name=None, publish=None, prefetch=None)
         if caching is not None:
             self.caching = deep_update(self.caching, caching)
 
         self.value = None
         self.entities, self.period = None, None
+        self.coverage = IntervalSet()
+        self._buffer = None
+        self._store = make_store(self.caching['store'], self.__class__, params)
+        self._store_loaded = False
+        self._executor = get_executor(self.caching['executor'], self.caching['max_workers']) \
+            if self.caching['executor'] is not None else None
+        self._lock = ReadWriteLock()
+        self._fills, self._flights = threading.Condition(), []
+        self._limiter = RateLimiter(self.caching['rate_limit']) if self.caching['rate_limit'] else None
+        self._labels = (('source', self.caching['name'] or self.__class__.__name__),)
+        self._publisher = None
+        prefetch = prefetch_options(self.caching['prefetch'])
+        self._prefetcher = Prefetcher(**prefetch) if prefetch is not None else None
+        self._dependents = weakref.WeakSet()
+        self._spill = None
+        cache_manager.register(self)
         # self.logger = DataLogHandler()
 
     def __repr__(self):
@@ -57,182 +128,685 @@ class PanelSource:
     def __str__(self):
         return "%s %s" %(self.__class__.__name__, self.params)
 
+    async def acall(self, entities=None, period: tuple = None):
+        """Awaitable version of `__call__` that runs the (typically I/O bound) fetch on the default executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.__call__, entities, period))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock'], state['_fills'], state['_flights'], state['_limiter'], state['_dependents']
+        state['_buffer'], state['_publisher'] = None, None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = ReadWriteLock()
+        self._fills, self._flights = threading.Condition(), []
+        self._limiter = RateLimiter(self.caching['rate_limit']) if self.caching['rate_limit'] else None
+        self._dependents = weakref.WeakSet()
+        cache_manager.register(self)
+
     # @DataLogHandler().log_level()
     def _run(self, entities: dict = None, period: tuple = None) -> DataFrame:
-        logging.info("RUN " + str(self))
+        logging.info("RUN %s", self)
+        if cache_manager.enabled:
+            cache_manager.touch(self)
+        with self._lock.read():
+            hit = self._covers(entities, period)
+            if hit:
+                logging.info("HIT %s", self)
+                requested_value = self._serve(entities, period)
+            if metrics.enabled:
+                self._count_call(entities, period, 'hit' if hit else 'miss')
 
-        period_log = (None,None) if period is None else period
-        if self.value is None:
-            logging.info("RUN INITIAL: [%s] %s - %s", entities, *period_log)
-            value = self._wrapped_execute("INITIAL", entities, period)
-            self.update(ts=value)
-            self.entities, self.period = entities, period
+        if not hit:
+            self._run_fill(entities, period)
+            with self._lock.read():
+                requested_value = self._serve(entities, period)
+            logging.info("DONE %s", self)
+        if self._prefetcher is not None:
+            self._prefetch(entities, period)
+        return requested_value
+
+    def _prefetch(self, entities: dict = None, period: tuple = None) -> None:
+        # Starts a background fill of the windows that follow a sequence of sliding period windows, unless they are
+        # cached already or would exceed the bytes allowed ahead of the calls.
+        target = self._prefetcher.observe(entities, period)
+        if target is None or self._prefetcher.busy:
+            return
+        with self._lock.read():
+            if self.value is None or self._covers(entities, target):
+                return
+            index = self.value.index
+            row_bytes = nbytes(self.value) / max(len(index), 1)
+            ahead = (index > period[1]).sum()
+            window = ((index > period[1] - (target[1] - target[0])) & (index <= period[1])).sum()
+        if not self._prefetcher.within_budget(ahead * row_bytes, window * row_bytes):
+            if metrics.enabled:
+                metrics.count('panelsource_prefetches', self._labels + (('result', 'over_budget'),))
+            return
+        if self._prefetcher.submit(self._run_fill, entities, target):
+            logging.info("PREFETCH %s %s", self, target)
+            if metrics.enabled:
+                metrics.count('panelsource_prefetches', self._labels + (('result', 'started'),))
+
+    def _serve(self, entities: dict = None, period: tuple = None) -> DataFrame:
+        if not metrics.enabled:
+            return self.subset(entities=entities, period=period)
+        start = time.perf_counter()
+        value = self.subset(entities=entities, period=period)
+        self._timing('copy', start)
+        metrics.count('panelsource_bytes_served', self._labels, nbytes(value))
+        return value
+
+    def _count_call(self, entities: dict, period: tuple, result: str) -> None:
+        metrics.count('panelsource_calls', self._labels + (('result', result),))
+        if result == 'hit':
+            entities_hit, period_hit = True, True
         else:
-            appendable_xs, appendable_ts = self._appendable['xs'], self._appendable['ts']
-            incremental_period, total_period = self.mismatch_period(period)
-            incremental_items, decremental_items, total_items = self.mismatch_entities(entities)
-            
-            incremental_period_log, total_period_log = list(map(lambda x: x if x is not None 
-                                                else (None,None), (incremental_period, total_period)))
-            logging.info("RUN Nth: %s %s - %s", entities, *period_log)
-            logging.info("INCREMENTAL Items: %s" % incremental_items)
-            logging.info("TOTAL Items: %s" % total_items)
-            logging.info("DECREMENTAL Items: %s" % decremental_items)
-            logging.info("INCREMENTAL Period: %s - %s", *incremental_period_log)
-            logging.info("TOTAL Period: %s - %s", *total_period_log)
-            logging.info("APPENDABLE XS:%s TS:%s" % (appendable_xs, appendable_ts))
-            
-            if appendable_xs and appendable_ts:
-                if incremental_items is not None:
-                    xs_data = self._wrapped_execute("INCREMENTAL XS1", incremental_items, self.period)
-                    self.entities = total_items
-                    self.update(xs=xs_data)
-                if incremental_period is not None:
-                    ts_data = self._wrapped_execute("INCREMENTAL TS1", self.entities, incremental_period)
-                    self.period = total_period
-                    self.update(ts=ts_data)
-            elif appendable_xs and not appendable_ts:
-                if period == total_period and incremental_items is not None:
-                    xs_data = self._wrapped_execute("INCREMENTAL XS2", incremental_items, self.period)
-                    self.entities = total_items
-                    self.update(xs=xs_data)
-            elif appendable_ts and not appendable_xs:
-                # TODO: This logic needs refinement
-                if incremental_items is None and decremental_items is None and incremental_period is not None:
-                    ts_data = self._wrapped_execute("INCREMENTAL TS2", self.entities, incremental_period)
-                    self.period = total_period
-                    self.update(ts=ts_data)
-            else:
-                self.value = self._wrapped_execute("TOTAL", total_items, total_period)
-                self.entities, self.period = total_items, total_period
-
-        if self.caching['ts_anchor'] == 'cache':
-            if len(self.value) > 0:
-                try:
-                    self.period = (self.period[0], self.value.index[-self.caching['ts_refresh'] - 1])
-                except IndexError:
-                    self.period = (self.period[0], self.period[0])
-            else:
-                logging.info("Resetting the PanelSource as the cache is empty and ts_anchor is 'cache'")
-                self.reset()
+            entities_hit = self.value is not None and self.mismatch_entities(entities)[0] is None
+            period_hit = self.value is not None and (period is None or len(self.coverage.missing(period)) == 0)
+        metrics.count('panelsource_entity_lookups', self._labels + (('result', 'hit' if entities_hit else 'miss'),))
+        metrics.count('panelsource_period_lookups', self._labels + (('result', 'hit' if period_hit else 'miss'),))
+
+    def _timing(self, phase: str, start: float) -> None:
+        if metrics.enabled:
+            metrics.observe('panelsource_phase', self._labels + (('phase', phase),), time.perf_counter() - start)
+
+    def stream(self, entities: dict = None, period: tuple = None, cache: bool = True):
+        """Yields the panel for the given entities and period in the chunks configured by `caching['chunks']`.
+
+        With `cache=True` missing data is fetched and merged into the cache chunk by chunk, and the requested panel is
+        then yielded in chunks from the cache. With `cache=False` the chunks returned by `_execute` are yielded as
+        they arrive and the cache is neither used nor modified, so panels larger than memory can be processed.
+        """
+        if not cache:
+            for chunk in self._execute_chunks(entities, period):
+                yield chunk
+            return
+
+        self._run_fill(entities, period)
+        for sub_entities, sub_period in self._split(entities, period):
+            with self._lock.read():
+                chunk = self.subset(entities=sub_entities, period=sub_period)
+            if chunk is not None:
+                yield chunk
+
+    def _run_fill(self, entities: dict = None, period: tuple = None) -> None:
+        # Fills are single-flight per planned range: a fill only waits while a fill it overlaps is running (see
+        # `_overlaps`), then re-plans against the cache that fill left and only executes for what is still missing.
+        # Readers keep being served from the cache meanwhile.
+        with self._fills:
+            while True:
+                self._prepare()
+                with self._lock.read():
+                    if self._covers(entities, period):
+                        flight = None
+                        break
+                    start = time.perf_counter()
+                    flight = (self._plan(entities, period), self.value is None)
+                    self._timing('plan', start)
+                if not any(self._overlaps(flight, other) for other in self._flights):
+                    self._flights.append(flight)
+                    break
+                self._fills.wait()
+        if flight is not None:
+            try:
+                self._fill(entities, period, plan=flight[0])
+            finally:
+                with self._fills:
+                    self._flights.remove(flight)
+                    self._fills.notify_all()
+        cache_manager.account(self)
 
-        # TODO: Implement this
-        # requested_value = self.subset(entities=entities, period=period)
+    def _prepare(self) -> None:
+        # Restores a spilled cache and loads the store before the first fill. Called with `_fills` held: neither can
+        # be pending while fills are running.
+        if self._spill is not None:
+            self._restore()
+        if self._store is not None and not self._store_loaded:
+            self.load()
+
+    def _overlaps(self, flight: tuple, other: tuple) -> bool:
+        # Whether two planned fills, given as (plan, initial), cannot run concurrently. Initial fills and resets
+        # rebuild the whole cache. New entities are fetched over the cached periods, so they overlap any fill of new
+        # periods, and otherwise fills overlap if they fetch common periods or common new entities.
+        (plan, initial), (other_plan, other_initial) = flight, other
+        if initial or other_initial or plan.reset or other_plan.reset:
+            return True
+        periods = [fetch.period for fetch in plan if fetch.kind == 'ts']
+        other_periods = [fetch.period for fetch in other_plan if fetch.kind == 'ts']
+        entities = [fetch.entities for fetch in plan if fetch.kind == 'xs']
+        other_entities = [fetch.entities for fetch in other_plan if fetch.kind == 'xs']
+        if (len(entities) > 0 and len(other_periods) > 0) or (len(periods) > 0 and len(other_entities) > 0):
+            return True
+        if any(period[0] <= other[1] and other[0] <= period[1] for period in periods for other in other_periods):
+            return True
+        if len(entities) > 0 and len(other_entities) > 0:
+            units, other_units = self._units_union(entities), self._units_union(other_entities)
+            # Conservatively, the unions of the values of each unit intersect.
+            return all(len(values & other_units.get(unit, set())) > 0 for unit, values in units.items())
+        return False
+
+    def _units_union(self, entities: list) -> dict:
+        units = dict()
+        for item in entities:
+            for unit, values in self._entity_units(item).items():
+                units.setdefault(unit, set()).update(values)
+        return units
+
+    def refresh_tail(self, until=None) -> bool:
+        """Extends the cache of the cached entities up to until (by default now), which with `ts_anchor='cache'` also
+        refetches the last `ts_refresh` cached periods. Readers are served the previous data until the fetched chunks
+        are merged. Returns False, without fetching, if nothing is cached yet."""
+        if self.value is None or self.period is None:
+            return False
+        until = until if until is not None else Timestamp.now()
+        if isinstance(self.period[0], Timestamp) and not isinstance(until, Timestamp):
+            until = Timestamp(until)
+        self._run_fill(self.entities, (self.period[0], max(until, self.period[1])))
+        return True
+
+    def _covers(self, entities: dict = None, period: tuple = None) -> bool:
         if self.value is None:
-            requested_value = None
-        else:
-            requested_value = self.value.copy()
+            return False
+        if period is not None and len(self.coverage.missing(period)) > 0:
+            return False
+        return self.mismatch_entities(entities)[0] is None
 
-        logging.info("DONE " + str(self))
-        return requested_value
+    def plan(self, entities: dict = None, period: tuple = None) -> Plan:
+        """Dry run of a call: returns the Plan of upstream fetches the call would execute, without executing them.
+
+        The plan is empty if the call is served from the cache. `Plan.cost()` estimates the upstream load.
+        """
+        with self._fills:
+            self._prepare()
+            with self._lock.read():
+                if self._covers(entities, period):
+                    return Plan([], self.entities, self.period, self.coverage.copy())
+                return self._plan(entities, period)
+
+    def _plan(self, entities: dict = None, period: tuple = None) -> Plan:
+        # New entities are fetched over the whole (covered and missing) span of the cache, and the cached entities
+        # over the missing periods, which gives the fewest calls for a rectangular cache. A dimension that is not
+        # appendable is refetched in total.
+        if self.value is None:
+            coverage = IntervalSet() if period is None else IntervalSet([period])
+            fetches = [Fetch("INITIAL", entities, period, 'ts')]
+            return self._batched(Plan(fetches, entities, period, coverage, added=list(coverage)))
+
+        incremental_period, total_period = self.mismatch_period(period)
+        incremental_items, _, total_items = self.mismatch_entities(entities)
+        if (incremental_items is not None and not self._appendable['xs']) or \
+                (incremental_period is not None and not self._appendable['ts']):
+            coverage = IntervalSet() if total_period is None else IntervalSet([total_period])
+            fetches = [Fetch("TOTAL", total_items, total_period, 'ts')]
+            return self._batched(Plan(fetches, total_items, total_period, coverage, reset=True, added=list(coverage)))
+
+        coverage = self.coverage.copy()
+        for gap in incremental_period or []:
+            coverage.add(gap)
+        fetches = []
+        if incremental_items is not None:
+            # An initial call without a period leaves the coverage empty; increments then follow the cached period.
+            for interval in list(coverage) or [self.period]:
+                fetches.append(Fetch("INCREMENTAL XS", incremental_items, interval, 'xs'))
+        if incremental_items is None or incremental_items != total_items:
+            for gap in incremental_period or []:
+                fetches.append(Fetch("INCREMENTAL TS", self.entities, gap, 'ts'))
+        return self._batched(Plan(fetches, total_items, total_period, coverage, added=incremental_period or []))
+
+    def _batched(self, plan: Plan) -> Plan:
+        # Splits the fetches of a plan into the batches of caching['chunks'].
+        fetches = [Fetch(fetch.call_type, entities, period, fetch.kind)
+                   for fetch in plan for entities, period in self._split(fetch.entities, fetch.period)]
+        return Plan(fetches, plan.entities, plan.period, plan.coverage, plan.reset, plan.added)
 
-    def _wrapped_execute(self, call_type=None, entities=None, period=None) -> DataFrame:
+    def _fill(self, entities: dict = None, period: tuple = None, plan: Plan = None) -> None:
+        if plan is None:
+            start = time.perf_counter()
+            with self._lock.read():
+                plan = self._plan(entities, period)
+            self._timing('plan', start)
+        logging.info("PLAN %s: %s", self, plan)
+
+        if plan.reset:
+            if self._store is not None:
+                self._store.clear()
+            # Readers wait for the fill instead of being served a partially rebuilt cache.
+            with self._lock.write():
+                self.value, self.coverage = None, IntervalSet()
+        self._execute_plan(plan)
+
+        with self._lock.write():
+            self._merge_plan(plan)
+            if self.caching['ts_anchor'] == 'cache':
+                if self.value is not None and len(self.value) > 0:
+                    try:
+                        self.period = (self.period[0], self.value.index[-self.caching['ts_refresh'] - 1])
+                    except IndexError:
+                        self.period = (self.period[0], self.period[0])
+                    self.coverage.truncate(after=self.period[1])
+                else:
+                    logging.info("Resetting the PanelSource as the cache is empty and ts_anchor is 'cache'")
+                    self.reset()
+
+            if self._store is not None and self._store.dirty and self.value is not None:
+                self._store.commit(dict(entities=self.entities, period=self.period, coverage=self.coverage),
+                                   merge=self._merge_meta, snapshot=lambda: self.value)
+
+        if self.caching['publish'] and self.value is not None:
+            self.publish()
+        if len(self._dependents) > 0:
+            self._notify(None if plan.reset else [fetch.period for fetch in plan if fetch.kind == 'ts'])
+
+    def _merge_plan(self, plan: Plan) -> None:
+        # Adds what an executed plan fetched to the cached entities, period and coverage. Other fills may have
+        # extended them since the plan was made, so they are merged rather than replaced by those of the plan.
+        self.entities = self.mismatch_entities(plan.entities)[2] if plan.entities is not None else self.entities
+        if plan.period is not None:
+            self.period = plan.period if self.period is None else \
+                (min(self.period[0], plan.period[0]), max(self.period[1], plan.period[1]))
+        for interval in plan.added:
+            self.coverage.add(interval)
+
+    def _notify(self, periods: list = None) -> None:
+        # Sources derived from this one recompute the periods refetched here (all periods if None) when next called.
+        for dependent in list(self._dependents):
+            for period in periods if periods is not None else [None]:
+                dependent.invalidate(period)
+
+    def _execute_plan(self, plan: Plan) -> None:
+        # Serially, chunks are merged as they arrive. Otherwise the fetches run concurrently on the executor of
+        # caching['executor'] and their results are merged in the order of the plan.
+        if self._executor is None or len(plan) < 2:
+            for fetch in plan:
+                for chunk in self._wrapped_execute(fetch.call_type, fetch.entities, fetch.period):
+                    self._merge_chunk(fetch.kind, chunk)
+            return
+
+        # The rate limit is enforced here, as worker processes do not share the limiter.
+        fetcher = _Fetcher(self)
+        calls = {i: (fetcher, (fetch,)) for i, fetch in enumerate(plan)}
+        results = self._executor(calls, throttle=self._limiter.acquire if self._limiter is not None else None)
+        for i, fetch in enumerate(plan):
+            for chunk in results.pop(i):
+                self._merge_chunk(fetch.kind, chunk)
+
+    def _merge_chunk(self, kind: str, chunk: DataFrame) -> None:
+        start = time.perf_counter()
+        if self._store is not None:
+            self._store.append(chunk, kind=kind)
+        with self._lock.write():
+            self.update(**{kind: chunk})
+        self._timing('merge', start)
+
+    def _wrapped_execute(self, call_type=None, entities=None, period=None, limit: bool = True):
         # with DataLogHandler().log_level()
+        if limit and self._limiter is not None:
+            self._limiter.acquire()
         period_log = period if period is not None else (None, None)
-        logging.info("EXEC %s: [%s] %s - %s" %(call_type, str(entities), *period_log))
+        logging.info("EXEC %s: [%s] %s - %s", call_type, entities, *period_log)
+        start = time.perf_counter()
         results = self._execute(entities=entities, period=period)
-        return results
+        return self._chunks(results, time.perf_counter() - start)
+
+    def _execute_chunks(self, entities=None, period=None):
+        # Yields the non-empty chunks of the results of _execute over the chunks of the request.
+        for sub_entities, sub_period in self._split(entities, period):
+            for chunk in self._wrapped_execute("STREAM", sub_entities, sub_period):
+                yield chunk
+
+    def _chunks(self, results, elapsed: float = 0.):
+        # Yields the non-empty chunks of the results of _execute, and reports the time spent producing them.
+        iterator = iter([results] if results is None or isinstance(results, DataFrame) else results)
+        while True:
+            start = time.perf_counter()
+            chunk = next(iterator, _END)
+            elapsed += time.perf_counter() - start
+            if chunk is _END:
+                break
+            if chunk is not None:
+                if metrics.enabled:
+                    metrics.count('panelsource_bytes_fetched', self._labels, nbytes(chunk))
+                yield chunk
+        if metrics.enabled:
+            metrics.observe('panelsource_phase', self._labels + (('phase', 'execute'),), elapsed)
+
+    def _split(self, entities: dict = None, period: tuple = None) -> list:
+        # Splits a request into the period windows and entity batches of caching['chunks'], windows first.
+        chunks = self.caching['chunks'] or {}
+        periods = [period]
+        if chunks.get('period') is not None and period is not None:
+            periods = period_windows(period, chunks['period'])
+        batches = [entities]
+        if chunks.get('entities') is not None and entities is not None and len(entities) > 0:
+            # Batches follow the unit (level or zipped levels) with the most values.
+            units = self._entity_units(entities)
+            unit = max(units, key=lambda name: len(units[name]))
+            size = chunks['entities']
+            batches = [self._entities_from_units({**units, unit: units[unit][i:i + size]}, entities)
+                       for i in range(0, len(units[unit]), size)] or [entities]
+        return [(batch, window) for window in periods for batch in batches]
 
     @abstractmethod
-    def _execute(self, entities=None, period=None) -> DataFrame:
+    def _execute(self, entities=None, period=None):
+        """Returns the panel for entities and period as a DataFrame, or as an iterable of DataFrame chunks."""
         pass
 
     # TODO: Convert this method to a Func
     def mismatch_period(self, period: tuple) -> tuple:
+        """Returns the list of uncovered sub-periods of `period` (or None) and the hull of the cached and requested periods."""
         if period is None:
-            incremental, total = None, self.period
+            return None, self.period
+
+        incremental = self.coverage.missing(period) or None
+        if self.period is None:
+            total = period
         else:
-            if self.period is None:
-                incremental, total = period, period
-            else:
-                total = (min(period[0], self.period[0]), max(period[1], self.period[1]))
-                
-            if total[0] < self.period[0]:
-                if total[1] > self.period[1]:
-                    incremental = (total[0], total[1])
-                else:
-                    incremental = (total[0], self.period[0])
-            else: 
-                if total[1] > self.period[1]:
-                    incremental = (self.period[1], total[1])
-                else:  
-                    incremental = None
+            total = (min(period[0], self.period[0]), max(period[1], self.period[1]))
 
         return incremental, total
 
     # TODO: Convert this method to a Func
     def mismatch_entities(self, entities: dict) -> tuple:
+        """Returns the incremental, decremental and total entities of a request relative to the cache.
+
+        Entities are a dict of level -> values spanning the cross product of all levels. Levels listed in
+        `caching['entity_levels']` are instead zipped: their value lists are parallel and jointly identify one entity
+        (e.g. ticker and exchange), and only the zipped group is crossed with the remaining levels. The product of
+        levels is never expanded, so the cost is linear in the number of level values.
+        """
         if self.entities is None:
-            incremental_entities, total_entities = entities, entities
+            return entities, None, entities
+        if entities is None:
+            return None, None, self.entities
+
+        initial, new = self._entity_units(self.entities), self._entity_units(entities)
+        total, added, removed = dict(), dict(), dict()
+        for unit, values in initial.items():
+            cached = dict.fromkeys(values)
+            requested = dict.fromkeys(new.get(unit, values))
+            total[unit] = list(cached) + [x for x in requested if x not in cached]
+            added[unit] = [x for x in requested if x not in cached]
+            removed[unit] = [x for x in total[unit] if x not in requested]
+
+        # The missing combinations are product(total) - product(initial). Projected onto one unit they are its new
+        # values if it is the only unit that grew, and all of its values otherwise.
+        grown = [unit for unit in total if len(added[unit]) > 0]
+        if len(grown) == 0:
+            incremental_entities = None
+        elif len(grown) == 1:
+            incremental_entities = self._entities_from_units(
+                {unit: added[unit] if unit in grown else total[unit] for unit in total}, self.entities)
         else:
-            if self.caching['entity_levels'] is None:
-                initial = [dict(zip(self.entities, x)) for x in itertools.product(*self.entities.values())]
-                new = [dict(zip(entities, x)) for x in itertools.product(*entities.values())]
-
-                total_entities = dict()
-                for level in self.entities.keys():
-                    s1, s2 = set(self.entities[level]), set(entities[level])
-                    total_entities[level] = list(s1.union(s2))
-                total = [dict(zip(total_entities, x)) for x in itertools.product(*total_entities.values())]
-
-                incremental = list(filter(lambda x: x not in initial, total))
-                if len(incremental) > 0:
-                    incremental_entities = dict()
-                    for level in self.entities.keys():
-                        incremental_entities[level] = list(set(map(lambda x: x[level], incremental)))
-                else:
-                    incremental_entities = None
+            incremental_entities = self._entities_from_units(total, self.entities)
 
-                decremental = list(filter(lambda x: x not in new, total))
-                if len(decremental) > 0:
-                    decremental_entities = dict()
-                else:
-                    decremental_entities = None
-            elif isinstance(self.caching['entity_levels'], list):
-                incremental_entities, decremental_entities, total_entities = None, None, None
-                # for level in self.caching['entity_levels']:
+        shrunk = {unit: values for unit, values in removed.items() if len(values) > 0}
+        decremental_entities = self._entities_from_units(shrunk, self.entities) if len(shrunk) > 0 else None
+
+        return incremental_entities, decremental_entities, self._entities_from_units(total, self.entities)
+
+    def _entity_units(self, entities: dict) -> dict:
+        # Maps independent units (a level, or the tuple of zipped levels) to their values.
+        zipped = self.caching['entity_levels']
+        if not zipped:
+            return {level: list(values) for level, values in entities.items()}
+        units = {tuple(zipped): list(zip(*[entities[level] for level in zipped]))}
+        units.update({level: list(values) for level, values in entities.items() if level not in zipped})
+        return units
 
-        return incremental_entities, decremental_entities, total_entities
+    @staticmethod
+    def _entities_from_units(units: dict, levels) -> dict:
+        entities = dict()
+        for unit, values in units.items():
+            if isinstance(unit, tuple):
+                columns = list(zip(*values)) if len(values) > 0 else [()] * len(unit)
+                entities.update({level: list(column) for level, column in zip(unit, columns)})
+            else:
+                entities[unit] = values
+        return {level: entities[level] for level in levels if level in entities}
 
     def update(self, xs=None, ts=None) -> None:
-        if self.value is None:
-            if ts is not None:
-                self.value = ts
-            elif xs is not None:
-                self.value = xs
-        else:
-            refresh = self.caching['ts_anchor'] == 'cache'
-            if ts is not None:
-                if refresh:
-                    self.value = self.value.combine_first(ts)
-                else:
-                    self.value = self.value.update(ts, overwrite=True)
-            if xs is not None:
-                if refresh:
-                    self.value = self.value.combine_first(xs)
-                else:
-                    self.value = self.value.update(xs, overwrite=True)
-        
+        """Merges new time-series and/or cross-sectional data into the cache.
+
+        New values overwrite cached values at the same rows and columns, so refreshed rows replace the cached ones,
+        and rows and columns that are not cached yet are appended. Float panels are kept in a preallocated
+        PanelBuffer, so increments cost time proportional to the new data rather than to the size of the cache.
+        """
+        compact = compact_options(self.caching['compact'])
+        for data in (ts, xs):
+            if data is None:
+                continue
+            if compact is not None:
+                data = compact_frame(data, **compact)
+            if self.value is None:
+                self.value, self._buffer = data, None
+                continue
+            if self._buffer is None or not self._buffer.holds(self.value):
+                # The cache was replaced, or could not be held in a buffer so far.
+                self._buffer = PanelBuffer(self.value) if PanelBuffer.supports(self.value) else None
+            merged = self._buffer.merge(data) if self._buffer is not None else None
+            if merged is not None:
+                self.value = merged
+            else:
+                self.value, self._buffer = merge_frames(self.value, data), None
+
     # TODO: Convert this to a Func
-    def subset(self, entities: dict = None, period: tuple = None) -> DataFrame:
-        data = None
-        if self.value is not None:
-            if period is not None:
-                data = self.value.truncate(before=period[0], after=period[1])
-            if entities is not None:
-                # TODO: Create a Func to subset a MultiIndex DataFrame that takes a dict of levels and values
-                #   values and returns a subset of the DataFrame
-                if data is None:
-                    data = self.value.copy()
+    def subset(self, entities: dict = None, period: tuple = None, copy: bool = None) -> DataFrame:
+        """Returns the cached data for the given entities and period.
+
+        Rows are sliced by the (inclusive) period and columns are selected by matching every given entity level
+        against the column levels of the cache. With `copy=False` (or `caching['subset'] == 'view'`) the result
+        shares memory with the cache whenever the selection is contiguous and the cache has a single dtype; such
+        views are read-only, and later fills that overwrite cached rows copy the cache first, so a view keeps its
+        values while it is alive. Other selections only copy the requested data.
+        """
+        if self.value is None:
+            return None
+        if copy is None:
+            copy = self.caching['subset'] != 'view'
+
+        rows = self._row_indexer(period)
+        cols = self._column_indexer(entities)
+        if copy:
+            return self.value.iloc[rows, cols].copy()
+
+        dtypes = self.value.dtypes.unique() if self.value.shape[1] > 0 else []
+        if len(dtypes) == 1 and isinstance(dtypes[0], np.dtype):
+            values = self.value.to_numpy(copy=False)[rows, cols].view()
+            values.flags.writeable = False
+            view = DataFrame(values, index=self.value.index[rows], columns=self.value.columns[cols], copy=False)
+            if self._buffer is not None and self._buffer.holds(self.value):
+                self._buffer.share(view)
+            return view
+        return self.value.iloc[rows, cols]
+
+    def _row_indexer(self, period: tuple):
+        index = self.value.index
+        if period is None:
+            return slice(None)
+        if index.is_monotonic_increasing:
+            return index.slice_indexer(period[0], period[1])
+        return np.flatnonzero((index >= period[0]) & (index <= period[1]))
+
+    def _column_indexer(self, entities: dict):
+        columns = self.value.columns
+        if entities is None:
+            return slice(None)
+
+        names = list(columns.names)
+        mask = np.ones(len(columns), dtype=bool)
+        zipped = [level for level in (self.caching['entity_levels'] or []) if level in entities and level in names]
+        if len(zipped) > 0:
+            keys = MultiIndex.from_arrays([columns.get_level_values(level) for level in zipped])
+            mask &= keys.isin(list(zip(*[entities[level] for level in zipped])))
+        for level, values in entities.items():
+            if level in names and level not in zipped:
+                mask &= columns.get_level_values(level).isin(values)
+
+        positions = np.flatnonzero(mask)
+        if len(positions) == len(columns):
+            return slice(None)
+        if len(positions) > 0 and positions[-1] - positions[0] + 1 == len(positions):
+            return slice(positions[0], positions[-1] + 1)
+        return positions
+
+    def memory_report(self, level=None) -> DataFrame:
+        """Returns the number of columns, the dtypes and the bytes of the cache per field, i.e. per value of the
+        column level `level` (by default `caching['compact']['field_level']` or the last column level)."""
+        if self.value is None:
+            return None
+        compact = compact_options(self.caching['compact']) or {}
+        return memory_report(self.value, level if level is not None else compact.get('field_level'))
+
+    def load(self) -> None:
+        """Loads the cache persisted by the store configured in `caching['store']`, replacing the in-memory cache."""
+        self._store_loaded = True
+        self._load_from(self._store)
+
+    def _load_from(self, store) -> None:
+        meta, fragments = store.load()
+        if meta is None:
+            return
+        logging.info("LOAD %s from %s", self, store)
+        with self._lock.write():
+            self.value = None
+            for kind, data in fragments:
+                self.update(**{kind: data})
+            self.entities, self.period = meta['entities'], meta['period']
+            self.coverage = meta['coverage']
+
+    def _merge_meta(self, stored: dict, meta: dict) -> dict:
+        # Metadata of the fragments committed by another process (stored) and by this one (meta). Both caches are
+        # rectangles of entities and coverage, so the fragments hold their union if they span the same entities, or
+        # the same coverage and entities differing in one level. Otherwise the rectangle of this process is kept.
+        if stored['entities'] == meta['entities']:
+            coverage = stored['coverage'].copy()
+            for interval in meta['coverage']:
+                coverage.add(interval)
+            period = meta['period']
+            if stored['period'] is not None and period is not None:
+                period = (min(stored['period'][0], period[0]), max(stored['period'][1], period[1]))
+            return dict(meta, period=period, coverage=coverage)
+        if stored['entities'] is None or meta['entities'] is None or stored['period'] != meta['period'] \
+                or stored['coverage'] != meta['coverage']:
+            return meta
+        stored_units, units = self._entity_units(stored['entities']), self._entity_units(meta['entities'])
+        if stored_units.keys() != units.keys():
+            return meta
+        differing = [unit for unit in units if stored_units[unit] != units[unit]]
+        if len(differing) != 1:
+            return meta
+        unit = differing[0]
+        known = set(units[unit])
+        units[unit] = units[unit] + [x for x in stored_units[unit] if x not in known]
+        return dict(meta, entities=self._entities_from_units(units, meta['entities']))
+
+    def cache_nbytes(self) -> int:
+        """Bytes held by the in-memory cache."""
+        with self._lock.read():
+            if self.value is None:
+                return 0
+            if self._buffer is not None and self._buffer.holds(self.value):
+                return self._buffer.nbytes
+            dtypes = set(self.value.dtypes)
+            if all(isinstance(dtype, np.dtype) and not dtype.hasobject for dtype in dtypes):
+                # Faster than summing the memory usage per column.
+                counts = self.value.dtypes.value_counts()
+                return int(len(self.value) * sum(dtype.itemsize * count for dtype, count in counts.items())
+                           + self.value.index.memory_usage())
+            return nbytes(self.value)
+
+    def evict(self, spill=None) -> int:
+        """Frees the in-memory cache and returns the number of bytes freed, or 0 if the cache is empty or being
+        filled. The next call reloads the cache from the store of `caching['store']` if it is committed, else from
+        the PanelStore spill into which the cache is written first, and otherwise refetches it."""
+        if not self._managed or not self._fills.acquire(blocking=False):
+            return 0
+        try:
+            if len(self._flights) > 0:
+                return 0
+            freed = self.cache_nbytes()
+            if freed == 0:
+                return 0
+            with self._lock.write():
+                if self._store is not None and not self._store.dirty:
+                    self._store_loaded = False
+                elif spill is not None:
+                    spill.append(self.value, kind='ts')
+                    spill.commit(dict(entities=self.entities, period=self.period, coverage=self.coverage))
+                    self._spill = spill
                 else:
-                    data = data.subset(entities)
-            
-        return data
+                    self.entities, self.period = None, None
+                    self.coverage = IntervalSet()
+                self.value, self._buffer = None, None
+            return freed
+        finally:
+            self._fills.release()
+
+    def _restore(self) -> None:
+        # Reloads a cache spilled to disk by `evict`, and removes the spilled files.
+        spill, self._spill = self._spill, None
+        self._load_from(spill)
+        shutil.rmtree(spill.path, ignore_errors=True)
+
+    def publish(self, name: str = None) -> str:
+        """Publishes a snapshot of the cache to shared memory and returns the name under which other processes attach
+        it with `SharedPanelSource(name)`. The name is fixed by the first publish: name, `caching['publish']` if it is
+        a str, or a generated one. Each publish copies the cache into a new version; the cache must have a single
+        numeric dtype."""
+        with self._lock.read():
+            if self.value is None:
+                raise ValueError("nothing to publish, the cache is empty!")
+            if self._publisher is None:
+                if name is None and isinstance(self.caching['publish'], str):
+                    name = self.caching['publish']
+                self._publisher = SharedPanel(name)
+            self._publisher.publish(self.value, dict(entities=self.entities, period=self.period,
+                                                     coverage=self.coverage, source=str(self)))
+        return self._publisher.name
+
+    def unpublish(self) -> None:
+        """Removes the published snapshot. Processes that attached it keep their current version."""
+        if self._publisher is not None:
+            self._publisher.close()
+            self._publisher = None
 
     def reset(self) -> None:
-        self.entities, self.period = None, None
-        self.value = None
+        with self._lock.write():
+            self.entities, self.period = None, None
+            self.coverage = IntervalSet()
+            self.value = None
+            if self._store is not None:
+                self._store.clear()
 
     def entities_from_list(self, entities: list) -> dict:
         return dict(zip(self.entities.keys(), entities))
 
+
+class _Fetcher:
+    """Executes the fetches of a PanelSource on an executor, which has applied the rate limit of the source already.
+    Pickled for a worker process, it carries the source without its cache and caching features."""
+    __slots__ = ('source',)
+
+    def __init__(self, source: PanelSource) -> None:
+        self.source = source
+
+    def __call__(self, fetch: Fetch) -> list:
+        return list(self.source._wrapped_execute(fetch.call_type, fetch.entities, fetch.period, limit=False))
+
+    def __reduce__(self):
+        state = self.source.__getstate__()
+        state.update(value=None, entities=None, period=None, coverage=IntervalSet(), _store=None, _executor=None,
+                     _prefetcher=None, _spill=None)
+        state['caching'] = dict(state['caching'], store=None, executor=None, rate_limit=None, publish=None,
+                                prefetch=None)
+        return _unpickle_fetcher, (self.source.__class__, state)
+
+
+def _unpickle_fetcher(cls, state: dict) -> _Fetcher:
+    source = cls.__new__(cls)
+    source.__setstate__(state)
+    return _Fetcher(source)
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Persistent backing stores for the cache of a PanelSource."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import os
+import uuid
+import pickle
+import logging
+import threading
+from abc import ABCMeta, abstractmethod
+from contextlib import contextmanager
+from typing import Callable
+from pandas import DataFrame, DatetimeIndex, PeriodIndex
+from zpmeta.utils.hashing import stable_hash
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+
+class PanelStore(metaclass=ABCMeta):
+    """ Superclass for persistent storage of a PanelSource cache.
+
+    A store keeps the chunks returned by `PanelSource._execute` as an ordered list of fragments together with
+    the metadata (entities, period) that describes the cached coverage. Replaying the fragments in order through
+    `PanelSource.update` reproduces the in-memory cache.
+    """
+
+    @abstractmethod
+    def load(self) -> tuple:
+        """Returns (meta, fragments) where fragments is an iterator of (kind, DataFrame) in write order."""
+        pass
+
+    @abstractmethod
+    def append(self, data: DataFrame, kind: str = 'ts') -> None:
+        """Persists an incremental chunk. It becomes visible to other processes on the next `commit`."""
+        pass
+
+    @abstractmethod
+    def commit(self, meta: dict, merge: Callable = None, snapshot: Callable = None) -> None:
+        """Makes the appended chunks visible with the metadata meta.
+
+        If other processes committed to the store since it was loaded, `merge(stored_meta, meta)` returns the
+        metadata of all fragments (by default meta). `snapshot()` returns the whole cache of the committing process,
+        which is written instead of the appended chunks if those were based on fragments that are gone, and to
+        compact the store.
+        """
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drops the stored cache on the next `commit`."""
+        pass
+
+
+class FilePanelStore(PanelStore):
+    """ Stores a PanelSource cache as columnar files (Parquet or Arrow IPC) in a local directory.
+
+    Every chunk is written as one file per period partition of a DatetimeIndex, by default one file per month
+    (`partition='M'`; None writes one file per chunk). Files are read with memory mapping: Arrow IPC tables reference
+    the mapped pages, which the OS loads on demand, while Parquet files are decoded from the mapping. The list of live
+    fragments and the cache metadata are kept in a manifest that is replaced atomically, so several processes on one
+    box can share a single store.
+
+    A commit replacing the fragments (after `clear`, or compacting more than `compact_after` fragments into a
+    snapshot of the cache) starts a new generation of the store. The files of the previous generation are deleted
+    while no process is opening them (mapped files stay readable), and processes whose appended chunks were based on
+    them commit a snapshot instead.
+
+    Requires `pyarrow`.
+    """
+    _extensions = dict(parquet='parquet', arrow='arrow')
+    _manifest = 'manifest.pkl'
+
+    def __init__(self, path: str, format: str = 'parquet', partition: str = 'M', compact_after: int = 16):
+        if format not in self._extensions:
+            raise ValueError("format must be one of %s" % list(self._extensions))
+        self.path = path
+        self.format = format
+        self.partition = partition
+        self.compact_after = compact_after
+        self._pending = []
+        self._cleared = False
+        # Concurrent fills of the PanelSource append chunks while another one commits.
+        self._pending_lock = threading.Lock()
+        # Generation of the fragments the in-memory cache was loaded from or committed to (None if empty).
+        self._generation = None
+
+    def __repr__(self):
+        return "%s(%s, %s)" % (self.__class__.__name__, self.path, self.format)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_pending_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._pending_lock = threading.Lock()
+
+    @property
+    def dirty(self) -> bool:
+        return len(self._pending) > 0 or self._cleared
+
+    @contextmanager
+    def _locked(self, shared: bool = False):
+        os.makedirs(self.path, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.path, '.lock'), 'w') as handle:
+            fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.path, self._manifest), 'rb') as handle:
+                return pickle.load(handle)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, manifest: dict) -> None:
+        target = os.path.join(self.path, self._manifest)
+        tmp = "%s.%s.tmp" % (target, uuid.uuid4().hex)
+        with open(tmp, 'wb') as handle:
+            pickle.dump(manifest, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, target)
+
+    def _write_file(self, data: DataFrame, name: str) -> None:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(data, preserve_index=True)
+        target = os.path.join(self.path, name)
+        if self.format == 'parquet':
+            import pyarrow.parquet as pq
+            pq.write_table(table, target)
+        else:
+            with pa.OSFile(target, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+
+    def _read_file(self, name: str):
+        import pyarrow as pa
+
+        source = os.path.join(self.path, name)
+        if self.format == 'parquet':
+            import pyarrow.parquet as pq
+            return pq.read_table(source, memory_map=True)
+        return pa.ipc.open_file(pa.memory_map(source, 'r')).read_all()
+
+    def _remove_files(self, names) -> None:
+        for name in names:
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+
+    def _partitions(self, data: DataFrame):
+        if self.partition is None or len(data) == 0 or not isinstance(data.index, (DatetimeIndex, PeriodIndex)):
+            yield 'all', data
+        else:
+            labels = data.index.to_period(self.partition)
+            for label in labels.unique():
+                yield str(label), data[labels == label]
+
+    def _write(self, data: DataFrame, kind: str) -> list:
+        fragments = []
+        for label, part in self._partitions(data):
+            name = "%s-%s.%s" % (label, uuid.uuid4().hex, self._extensions[self.format])
+            self._write_file(part, name)
+            fragments.append((name, kind))
+        return fragments
+
+    def load(self) -> tuple:
+        # Files are only deleted under the exclusive lock, so all fragments are opened under the shared one.
+        with self._locked(shared=True):
+            manifest = self._read_manifest()
+            if manifest is None:
+                self._generation = None
+                return None, iter(())
+            tables = [(kind, self._read_file(name)) for name, kind in manifest['fragments']]
+        self._generation = manifest.get('generation', '')
+        return manifest['meta'], ((kind, table.to_pandas()) for kind, table in tables)
+
+    def append(self, data: DataFrame, kind: str = 'ts') -> None:
+        if data is None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        fragments = self._write(data, kind)
+        with self._pending_lock:
+            self._pending.extend(fragments)
+
+    def commit(self, meta: dict, merge: Callable = None, snapshot: Callable = None) -> None:
+        # Chunks appended while committing are left pending for the next commit.
+        with self._pending_lock:
+            pending, cleared = self._pending, self._cleared
+            self._pending, self._cleared = [], False
+        try:
+            self._commit(meta, pending, cleared, merge, snapshot)
+        except Exception:
+            with self._pending_lock:
+                self._pending, self._cleared = pending + self._pending, cleared or self._cleared
+            raise
+
+    def _commit(self, meta: dict, pending: list, cleared: bool, merge: Callable = None,
+                snapshot: Callable = None) -> None:
+        with self._locked():
+            manifest = self._read_manifest()
+            stored = [] if manifest is None else manifest['fragments']
+            generation = None if manifest is None else manifest.get('generation', '')
+            if cleared:
+                self._replace(meta, pending, stored)
+            elif self._generation is not None and self._generation != generation:
+                # The pending chunks extend fragments that were replaced by another process.
+                self._remove_files(name for name, _ in pending)
+                if snapshot is not None:
+                    self._replace(meta, self._write(snapshot(), 'ts'), stored)
+                else:
+                    logging.warning("STORE COMMIT %s: dropped %d fragments extending a replaced generation", self,
+                                    len(pending))
+            else:
+                merged = merge(manifest['meta'], meta) if manifest is not None and merge is not None else meta
+                fragments = stored + pending
+                if snapshot is not None and len(fragments) > self.compact_after and merged == meta:
+                    # The cache of this process holds everything the fragments describe.
+                    self._replace(meta, self._write(snapshot(), 'ts'), fragments)
+                else:
+                    generation = generation if manifest is not None else uuid.uuid4().hex
+                    self._write_manifest(dict(meta=merged, fragments=fragments, generation=generation))
+                    self._generation = generation
+                    logging.info("STORE COMMIT %s: %d new fragments", self, len(pending))
+
+    def _replace(self, meta: dict, fragments: list, retired: list) -> None:
+        # Starts a new generation of the store, under the exclusive lock.
+        self._generation = uuid.uuid4().hex
+        self._write_manifest(dict(meta=meta, fragments=fragments, generation=self._generation))
+        self._remove_files(name for name, _ in retired)
+        logging.info("STORE REPLACE %s: %d fragments replaced by %d", self, len(retired), len(fragments))
+
+    def clear(self) -> None:
+        # Other processes keep loading the stored fragments until the next commit replaces them.
+        with self._pending_lock:
+            pending, self._pending, self._cleared = self._pending, [], True
+        self._remove_files(name for name, _ in pending)
+
+
+def store_key(cls, params) -> str:
+    """Stable directory name for the cache of a PanelSource class and its params."""
+    return "%s-%s" % (cls.__name__, stable_hash(params)[:16])
+
+
+def make_store(config: dict, cls, params) -> PanelStore:
+    """Creates a store from the `caching['store']` dict of a PanelSource of class cls with params. The directory is
+    named by `store_key` unless the config gives a `key`."""
+    if config is None:
+        return None
+    config = dict(config)
+    key = config.pop('key', None)
+    path = os.path.join(config.pop('path'), key if key is not None else store_key(cls, params))
+    return FilePanelStore(path, **config)
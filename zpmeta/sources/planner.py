@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Execution plans of PanelSource calls."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+from collections import namedtuple
+from pandas import Timestamp
+
+
+class Fetch(namedtuple('Fetch', ['call_type', 'entities', 'period', 'kind'])):
+    """One upstream call of a plan: `_execute(entities, period)`, merged into the cache as `kind` ('xs' or 'ts')."""
+    __slots__ = ()
+
+    def size(self, zipped: list = None) -> int:
+        """Number of entities requested, where the levels listed in `zipped` together identify one entity."""
+        if self.entities is None:
+            return None
+        zipped = [level for level in zipped or [] if level in self.entities]
+        size = len(self.entities[zipped[0]]) if zipped else 1
+        for level, values in self.entities.items():
+            if level not in zipped:
+                size *= len(values)
+        return size
+
+    def days(self) -> float:
+        """Length of the requested period in days, if its bounds are dates."""
+        if self.period is None:
+            return None
+        try:
+            return (Timestamp(self.period[1]) - Timestamp(self.period[0])).total_seconds() / 86400
+        except (TypeError, ValueError):
+            return None
+
+
+class Plan(list):
+    """ List of the Fetches executing a PanelSource call, in the order their results are merged.
+
+    The plan also records the state of the cache once executed: its `entities`, `period` and `coverage`, and whether
+    the cache is rebuilt from scratch (`reset`). `added` lists the periods the plan adds to the coverage.
+    """
+
+    def __init__(self, fetches=(), entities=None, period=None, coverage=None, reset: bool = False,
+                 added: list = None) -> None:
+        super(Plan, self).__init__(fetches)
+        self.entities, self.period, self.coverage, self.reset = entities, period, coverage, reset
+        self.added = added if added is not None else []
+
+    def __repr__(self):
+        return "%s(%s, reset=%s)" % (self.__class__.__name__, list.__repr__(self), self.reset)
+
+    def cost(self, zipped: list = None) -> dict:
+        """Number of calls and the total number of entities and of entity-days requested."""
+        sizes = [fetch.size(zipped) for fetch in self]
+        days = [fetch.days() for fetch in self]
+        known = [size * day for size, day in zip(sizes, days) if size is not None and day is not None]
+        return dict(calls=len(self), entities=sum(size for size in sizes if size is not None),
+                    entity_days=sum(known) if len(known) == len(self) else None)
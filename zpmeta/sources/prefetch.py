@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Detection of sequential access to PanelSources for prefetching."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pandas import Timestamp
+
+PREFETCH_DEFAULTS = dict(lookahead=1, max_bytes=None, min_steps=2)
+
+
+def prefetch_options(prefetch) -> dict:
+    """Options of the caching option `prefetch`: None or False (disabled), True (defaults) or a dict of options."""
+    if prefetch is None or prefetch is False:
+        return None
+    if prefetch is True:
+        return dict(PREFETCH_DEFAULTS)
+    if isinstance(prefetch, dict):
+        return dict(PREFETCH_DEFAULTS, **prefetch)
+    raise TypeError("prefetch must be a bool or a dict!")
+
+
+class Prefetcher:
+    """ Detects sliding period windows in successive calls and runs prefetches on a background thread.
+
+    Calls for the same entities whose periods end `step` later than the previous call, with the same step at least
+    `min_steps` times in a row, form a sequence. `observe` then returns the period of the next `lookahead` steps, which
+    the owner fetches with `submit` unless `within_budget` rejects it. Periods of Timestamps are not predicted past now.
+    At most one prefetch runs at a time.
+    """
+
+    def __init__(self, lookahead: int = 1, max_bytes: int = None, min_steps: int = 2) -> None:
+        self.lookahead, self.max_bytes, self.min_steps = lookahead, max_bytes, min_steps
+        self._last, self._entities, self._step, self._steps = None, None, None, 0
+        self._lock = threading.Lock()
+        self._pool, self._future = None, None
+
+    def __getstate__(self):
+        return dict(lookahead=self.lookahead, max_bytes=self.max_bytes, min_steps=self.min_steps)
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def busy(self) -> bool:
+        return self._future is not None and not self._future.done()
+
+    def observe(self, entities: dict, period: tuple) -> tuple:
+        """Records a call and returns the period to prefetch, or None if the calls do not form a sequence."""
+        with self._lock:
+            last, self._last = self._last, period
+            same_entities, self._entities = entities == self._entities, entities
+            step = None
+            if period is not None and last is not None and same_entities:
+                try:
+                    step = period[1] - last[1]
+                    if not step > step * 0:
+                        step = None
+                except TypeError:
+                    step = None
+            if step is None:
+                self._step, self._steps = None, 0
+                return None
+            if step != self._step:
+                self._step, self._steps = step, 0
+            self._steps += 1
+            if self._steps < self.min_steps:
+                return None
+
+        end = period[1] + step * self.lookahead
+        if isinstance(end, Timestamp):
+            end = min(end, Timestamp.now(tz=end.tz))
+        return (period[1], end) if end > period[1] else None
+
+    def within_budget(self, bytes_ahead: float, bytes_next: float) -> bool:
+        """Whether a prefetch of bytes_next bytes may be added to the bytes_ahead bytes already cached ahead of the
+        calls."""
+        return self.max_bytes is None or bytes_ahead + bytes_next <= self.max_bytes
+
+    def submit(self, func, *args) -> bool:
+        """Runs func(*args) on the background thread unless a prefetch is running. Returns whether it was started."""
+        with self._lock:
+            if self.busy:
+                return False
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='Prefetcher')
+            self._future = self._pool.submit(self._run, func, *args)
+        return True
+
+    @staticmethod
+    def _run(func, *args) -> None:
+        try:
+            func(*args)
+        except Exception as err:
+            logging.warning("Prefetch failed: %r", err)
+
+    def wait(self, timeout: float = None) -> None:
+        """Waits for the running prefetch, if any."""
+        future = self._future
+        if future is not None:
+            future.exception(timeout)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool, self._future = None, None
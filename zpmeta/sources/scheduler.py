@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Background refresh of the tail data of PanelSources."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import time
+import heapq
+import logging
+import itertools
+import threading
+from pandas import DataFrame
+from zpmeta.utils.metrics import metrics
+
+
+class _Entry:
+    """Registration and refresh state of one source."""
+
+    def __init__(self, name: str, source, interval: float, until=None) -> None:
+        self.name, self.source, self.interval, self.until = name, source, interval, until
+        self.last_attempt, self.last_success, self.last_error = None, None, None
+        self.failures, self.refreshes = 0, 0
+        self.next_run = None
+
+
+class RefreshScheduler:
+    """ Keeps registered PanelSources warm by refreshing their tail data in a background thread.
+
+    Every `interval` seconds a source is extended up to `until()` (by default now) with `PanelSource.refresh_tail`, so
+    with `ts_anchor='cache'` its last `ts_refresh` periods are refetched and new periods appended before callers ask
+    for them. Sources that were never called are skipped until they hold a cache. After a failure the next refresh of
+    the source is delayed by `interval * 2 ** failures`, capped at `max_backoff` seconds. `status` reports the
+    staleness of every source. Refreshes run one at a time on the scheduler thread.
+
+    Example:
+        scheduler = RefreshScheduler()
+        scheduler.register(prices, interval=60)
+        scheduler.start()
+    """
+
+    def __init__(self, max_backoff: float = 3600.) -> None:
+        self.max_backoff = max_backoff
+        self._entries = dict()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def register(self, source, interval: float, name: str = None, until=None, delay: float = 0.) -> str:
+        """Refreshes source every interval seconds, the first time after delay seconds. until is a callable
+        returning the end of the refreshed period. Returns the name of the registration, by default the caching
+        option `name` of the source or its class name."""
+        if interval <= 0:
+            raise ValueError("interval must be positive!")
+        name = name if name is not None else source.caching.get('name') or source.__class__.__name__
+        with self._condition:
+            if name in self._entries:
+                raise ValueError("a source is already registered as %s!" % name)
+            entry = _Entry(name, source, interval, until)
+            self._entries[name] = entry
+            self._schedule(entry, delay)
+        return name
+
+    def unregister(self, name: str) -> None:
+        with self._condition:
+            del self._entries[name]
+
+    def start(self) -> 'RefreshScheduler':
+        with self._condition:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._loop, name='RefreshScheduler', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None) -> None:
+        """Stops the thread after the refresh in progress, if any."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_pending(self) -> int:
+        """Runs the refreshes that are due on the calling thread and returns their number."""
+        count = 0
+        while True:
+            with self._condition:
+                entry = self._pop_due()
+            if entry is None:
+                return count
+            self._refresh(entry)
+            count += 1
+
+    def refresh(self, name: str) -> bool:
+        """Refreshes a source now, on the calling thread. Returns whether the refresh succeeded."""
+        return self._refresh(self._entries[name])
+
+    def status(self) -> DataFrame:
+        """Returns per source the times of the last attempt and success, the staleness (seconds since the last
+        success), the number of consecutive failures, the last error and the seconds until the next refresh."""
+        now, monotonic = time.time(), time.monotonic()
+        with self._condition:
+            rows = {name: dict(last_attempt=entry.last_attempt, last_success=entry.last_success,
+                               staleness=now - entry.last_success if entry.last_success is not None else None,
+                               failures=entry.failures, refreshes=entry.refreshes,
+                               last_error=repr(entry.last_error) if entry.last_error is not None else None,
+                               next_run=max(entry.next_run - monotonic, 0.))
+                    for name, entry in self._entries.items()}
+        return DataFrame.from_dict(rows, orient='index', columns=['last_attempt', 'last_success', 'staleness',
+                                                                   'failures', 'refreshes', 'last_error', 'next_run'])
+
+    def _schedule(self, entry: _Entry, delay: float) -> None:
+        entry.next_run = time.monotonic() + delay
+        heapq.heappush(self._queue, (entry.next_run, next(self._sequence), entry))
+        self._condition.notify_all()
+
+    def _pop_due(self) -> _Entry:
+        # Entries that were unregistered or rescheduled since they were queued are dropped.
+        while len(self._queue) > 0 and self._queue[0][0] <= time.monotonic():
+            next_run, _, entry = heapq.heappop(self._queue)
+            if self._entries.get(entry.name) is entry and entry.next_run == next_run:
+                return entry
+        return None
+
+    def _loop(self) -> None:
+        while True:
+            with self._condition:
+                entry = self._pop_due()
+                while entry is None and not self._stopping:
+                    timeout = self._queue[0][0] - time.monotonic() if len(self._queue) > 0 else None
+                    self._condition.wait(timeout)
+                    entry = self._pop_due()
+                if self._stopping:
+                    return
+            self._refresh(entry)
+
+    def _refresh(self, entry: _Entry) -> bool:
+        labels = (('source', entry.name),)
+        entry.last_attempt = time.time()
+        start = time.perf_counter()
+        try:
+            refreshed = entry.source.refresh_tail(entry.until() if entry.until is not None else None)
+        except Exception as err:
+            entry.failures += 1
+            entry.last_error = err
+            delay = min(entry.interval * 2 ** entry.failures, self.max_backoff)
+            logging.warning("Refresh of %s failed (%d in a row), retrying in %.0fs: %r",
+                            entry.name, entry.failures, delay, err)
+            if metrics.enabled:
+                metrics.count('panelsource_refreshes', labels + (('result', 'error'),))
+            success = False
+        else:
+            if refreshed:
+                entry.last_success = entry.last_attempt
+                entry.refreshes += 1
+            entry.failures, entry.last_error = 0, None
+            delay = entry.interval
+            if metrics.enabled:
+                metrics.count('panelsource_refreshes', labels + (('result', 'ok' if refreshed else 'skipped'),))
+                metrics.observe('panelsource_refresh', labels, time.perf_counter() - start)
+            success = True
+        with self._condition:
+            if self._entries.get(entry.name) is entry:
+                self._schedule(entry, delay)
+        return success
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""PanelSources partitioned by entity across worker processes."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import zlib
+import uuid
+import logging
+import multiprocessing
+import multiprocessing.util
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from pandas import concat
+from zpmeta.sources.sharedsource import SharedPanelSource
+
+# The PanelSource owned by a shard worker process.
+_shard_source = None
+
+
+def _init_shard(source_class, params, caching) -> None:
+    global _shard_source
+    _shard_source = source_class(params=params, caching=caching)
+    # Removes the published cache when the worker exits, also when the pool is shut down at interpreter exit.
+    multiprocessing.util.Finalize(None, _shard_source.unpublish, exitpriority=10)
+
+
+def _shard_call(method: str, args: tuple):
+    return getattr(_shard_source, method)(*args)
+
+
+class ShardedPanelSource:
+    """ PanelSource partitioned by the values of one entity level across worker processes.
+
+    Every shard is a worker process owning an instance of `source_class(params, caching)`, which executes and caches
+    the entities of its shard. Calls are scattered to the shards holding the requested entities, which run in
+    parallel, and their results are gathered into one frame; the columns are ordered by shard. Requests must give the
+    values of the partitioned level, as a request without entities would make every shard fetch all entities.
+
+    By default the shards pickle their results back to the caller. With `gather='shared'` every shard publishes its
+    cache to shared memory after each fill (see `PanelSource.publish`, which requires a single numeric dtype), and the
+    caller reads the requested subsets from there instead; a request served by a single shard is then returned as a
+    read-only view of the shared memory.
+
+    Args:
+        source_class: the PanelSource class, importable by the worker processes.
+        level: the entity level to partition. If the level is zipped with others by `caching['entity_levels']`, the
+            zipped levels are partitioned together.
+        shards: the number of shards, when partitioning by hash.
+        partition: 'hash' for a stable hash of the values, a sorted list of boundaries assigning the values below
+            the first boundary to shard 0, those below the second to shard 1 and so on, or a callable mapping a value
+            to its shard.
+        gather: 'pickle' or 'shared'.
+        mp_context: the multiprocessing context of the workers, e.g. 'spawn'.
+    """
+
+    def __init__(self, source_class, level, params: dict = None, caching: dict = None, shards: int = None,
+                 partition='hash', gather: str = 'pickle', mp_context: str = None) -> None:
+        if isinstance(partition, (list, tuple)):
+            shards = len(partition) + 1
+        elif partition != 'hash' and not callable(partition):
+            raise ValueError("partition must be 'hash', a list of boundaries or a callable!")
+        if gather not in ('pickle', 'shared'):
+            raise ValueError("gather must be either 'pickle' or 'shared'!")
+        self.source_class, self.params, self.caching = source_class, params, caching
+        self.shards = shards if shards is not None else multiprocessing.cpu_count()
+        self.level, self.partition, self.gather = level, partition, gather
+        zipped = list((caching or {}).get('entity_levels') or [])
+        self._levels = zipped if level in zipped else [level]
+
+        self._names = [None] * self.shards
+        if gather == 'shared':
+            prefix = 'zpshard_%s' % uuid.uuid4().hex[:12]
+            self._names = ['%s_%d' % (prefix, shard) for shard in range(self.shards)]
+        self._proxies = dict()
+        context = multiprocessing.get_context(mp_context)
+        self._pools = [ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_shard,
+                                           initargs=(source_class, params, self._shard_caching(name)))
+                       for name in self._names]
+
+    def _shard_caching(self, name: str) -> dict:
+        if name is None:
+            return self.caching
+        return dict(self.caching or {}, publish=name)
+
+    def __repr__(self):
+        return "%s(%s, shards=%d)" % (self.__class__.__name__, self.source_class.__name__, self.shards)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def __getstate__(self):
+        raise TypeError("ShardedPanelSource cannot be pickled!")
+
+    def shard_of(self, value) -> int:
+        if self.partition == 'hash':
+            return zlib.crc32(str(value).encode('utf-8')) % self.shards
+        if callable(self.partition):
+            return self.partition(value)
+        return bisect_right(self.partition, value)
+
+    def split(self, entities: dict) -> dict:
+        """Returns the entities of every shard holding some of them, as a dict of shard -> entities."""
+        if entities is None or self.level not in entities:
+            raise ValueError("requests to %s must give the values of the entity level %r!" % (self, self.level))
+        positions = dict()
+        for position, value in enumerate(entities[self.level]):
+            positions.setdefault(self.shard_of(value), []).append(position)
+        split = dict()
+        for shard, selected in sorted(positions.items()):
+            split[shard] = {key: [values[i] for i in selected] if key in self._levels else values
+                            for key, values in entities.items()}
+        return split
+
+    def scatter(self, entities: dict = None, period: tuple = None) -> dict:
+        """Calls the shards holding the requested entities and returns their results as a dict of shard -> frame."""
+        calls = {shard: (sub, period) for shard, sub in self.split(entities).items()}
+        if self.gather == 'pickle':
+            return self._scatter('__call__', calls)
+        self._scatter('_run_fill', calls)
+        return {shard: self._proxy(shard)(*args) for shard, args in calls.items()}
+
+    def _proxy(self, shard: int) -> SharedPanelSource:
+        # Attached after the first fill of the shard, which publishes its cache.
+        if shard not in self._proxies:
+            self._proxies[shard] = SharedPanelSource(self._names[shard])
+        return self._proxies[shard]
+
+    def __call__(self, entities: dict = None, period: tuple = None):
+        results = [frame for frame in self.scatter(entities, period).values() if frame is not None]
+        if len(results) == 0:
+            return None
+        return results[0] if len(results) == 1 else concat(results, axis=1)
+
+    def broadcast(self, method: str, *args) -> list:
+        """Calls a method of the source of every shard, e.g. `broadcast('cache_nbytes')`, returning the results."""
+        results = self._scatter(method, dict.fromkeys(range(self.shards), args))
+        return [results[shard] for shard in range(self.shards)]
+
+    def reset(self) -> None:
+        self.broadcast('reset')
+
+    def _scatter(self, method: str, calls: dict) -> dict:
+        logging.info("SCATTER %s.%s to %d shards", self, method, len(calls))
+        futures = {shard: self._pools[shard].submit(_shard_call, method, args) for shard, args in calls.items()}
+        return {shard: future.result() for shard, future in futures.items()}
+
+    def shutdown(self) -> None:
+        self._proxies.clear()
+        for pool in self._pools:
+            pool.shutdown(wait=True)
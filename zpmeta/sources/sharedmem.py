@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Versioned snapshots of cached panels in shared memory."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import os
+import sys
+import uuid
+import pickle
+import struct
+import logging
+import threading
+import numpy as np
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from pandas import DataFrame
+
+_HEADER = struct.Struct('<QQ')
+_ALIGN = 64
+# Names of the segments created by this process (or inherited from the parent of a forked process).
+_created = set()
+
+
+class SharedPanel:
+    """ Publishes snapshots of a panel to shared memory, to be attached by other processes with `attach`.
+
+    Every `publish` writes the panel and its metadata into a new segment `<name>_<version>` and then switches the
+    control segment `<name>` to the new version, so readers always map a complete and consistent snapshot. The
+    segment of the previous version is unlinked: its memory is released once no reader maps it anymore. Panels must
+    have a single numpy dtype; the values are stored in the column-major layout pandas uses internally, so attached
+    DataFrames share the memory of the segment.
+    """
+
+    def __init__(self, name: str = None) -> None:
+        self.name = name if name is not None else 'zpmeta_%s' % uuid.uuid4().hex[:16]
+        self.version = 0
+        self._control = SharedMemory(name=self.name, create=True, size=_HEADER.size)
+        _created.add(self.name)
+        self._control.buf[:_HEADER.size] = _HEADER.pack(0, 0)
+        self._segment = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "%s(%r, version=%d)" % (self.__class__.__name__, self.name, self.version)
+
+    def __getstate__(self):
+        raise TypeError("SharedPanel cannot be pickled, pass its name to the readers instead!")
+
+    def publish(self, frame: DataFrame, meta: dict = None) -> int:
+        """Writes a snapshot of frame and the picklable dict meta, returning its version."""
+        dtypes = set(frame.dtypes) if frame.shape[1] > 0 else {np.dtype(float)}
+        dtype = next(iter(dtypes))
+        if len(dtypes) > 1 or not isinstance(dtype, np.dtype) or dtype.hasobject:
+            raise TypeError("only panels with a single numeric numpy dtype can be shared!")
+        header = pickle.dumps(dict(meta or {}, index=frame.index, columns=frame.columns, dtype=dtype.str,
+                                   shape=frame.shape), protocol=pickle.HIGHEST_PROTOCOL)
+        offset = -(-(_HEADER.size + len(header)) // _ALIGN) * _ALIGN
+        size = offset + frame.shape[0] * frame.shape[1] * dtype.itemsize
+
+        with self._lock:
+            version = self.version + 1
+            segment = SharedMemory(name=_segment_name(self.name, version), create=True, size=max(size, 1))
+            _created.add(segment.name)
+            try:
+                segment.buf[:_HEADER.size] = _HEADER.pack(version, len(header))
+                segment.buf[_HEADER.size:_HEADER.size + len(header)] = header
+                values = np.ndarray((frame.shape[1], frame.shape[0]), dtype=dtype, buffer=segment.buf, offset=offset)
+                values[:] = frame.to_numpy(dtype=dtype, copy=False).T
+                del values
+            except BaseException:
+                segment.close()
+                segment.unlink()
+                raise
+            segment.close()
+            self._control.buf[:_HEADER.size] = _HEADER.pack(version, size)
+            previous, self._segment, self.version = self._segment, segment, version
+            if previous is not None:
+                previous.unlink()
+        logging.info("PUBLISH %s version %d, %d bytes", self.name, version, size)
+        return version
+
+    def close(self) -> None:
+        """Unlinks the control segment and the current snapshot. Readers keep the snapshots they have attached."""
+        with self._lock:
+            if self._segment is not None:
+                self._segment.unlink()
+                self._segment = None
+            if self._control is not None:
+                self._control.close()
+                self._control.unlink()
+                self._control = None
+
+
+def _segment_name(name: str, version: int) -> str:
+    return '%s_%d' % (name, version)
+
+
+class _SharedArray(np.ndarray):
+    # Array over a shared memory segment. Views of it reference it, and it references the segment, which is closed
+    # once no array uses its memory anymore.
+    pass
+
+
+def _open(name: str) -> SharedMemory:
+    # Attaches an existing segment without leaving it registered with the resource tracker, which would unlink the
+    # publisher's segments when a reader exits. The segments created by this process stay registered.
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    segment = SharedMemory(name=name)
+    if os.name == 'posix' and segment.name not in _created:
+        resource_tracker.unregister('/' + segment.name, 'shared_memory')
+    return segment
+
+
+def open_control(name: str) -> SharedMemory:
+    """Attaches the control segment of the panel published under name, to be read with `published_version`."""
+    return _open(name)
+
+
+def published_version(control: SharedMemory) -> int:
+    """Returns the version currently published in a control segment, 0 if nothing was published yet."""
+    return _HEADER.unpack_from(control.buf)[0]
+
+
+def attach(name: str, retries: int = 10) -> tuple:
+    """Maps the latest snapshot published under name. Returns its version, the panel as a read-only DataFrame sharing
+    memory with the segment, and the metadata, or (0, None, None) if nothing was published yet. The segment stays
+    mapped as long as the DataFrame or arrays derived from it are referenced."""
+    control = open_control(name)
+    for _ in range(retries):
+        version = published_version(control)
+        if version == 0:
+            return 0, None, None
+        try:
+            segment = _open(_segment_name(name, version))
+        except FileNotFoundError:
+            # A newer version was published and this one unlinked in the meantime.
+            continue
+        _, length = _HEADER.unpack_from(segment.buf)
+        meta = pickle.loads(segment.buf[_HEADER.size:_HEADER.size + length])
+        offset = -(-(_HEADER.size + length) // _ALIGN) * _ALIGN
+        rows, cols = meta.pop('shape')
+        values = _SharedArray((cols, rows), dtype=np.dtype(meta.pop('dtype')), buffer=segment.buf, offset=offset)
+        values.segment = segment
+        values.flags.writeable = False
+        frame = DataFrame(values.T, index=meta.pop('index'), columns=meta.pop('columns'), copy=False)
+        return version, frame, meta
+    raise RuntimeError("could not attach a stable version of %s" % name)
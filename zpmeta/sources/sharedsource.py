@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2023 Zeroth-Principles
+#
+# This file is part of Zeroth-Meta.
+#
+#  Zeroth-Meta is free software: you can redistribute it and/or modify it under the
+#  terms of the GNU General Public License as published by the Free Software
+#  Foundation, either version 3 of the License, or (at your option) any later
+#  version.
+#
+#  Zeroth-Meta is distributed in the hope that it will be useful, but WITHOUT ANY
+#  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+#  A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#  You should have received a copy of the GNU General Public License along with
+#  Zeroth-Meta. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Read-only PanelSources attached to panels published in shared memory."""
+
+__copyright__ = '2023 Zeroth Principles'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import logging
+from zpmeta.utils.common_utils import deep_update
+from zpmeta.sources.panelsource import PanelSource
+from zpmeta.sources.sharedmem import attach, open_control, published_version
+
+
+class SharedPanelSource(PanelSource):
+    """ Read-only PanelSource serving the panel another process published with `PanelSource.publish(name)`.
+
+    Subsets are served as views of the shared memory by default (caching option `subset`), so any number of processes
+    read one copy of the panel. Requests the published snapshot does not cover raise ValueError, as the proxy cannot
+    fetch data. With the caching option `follow` (default True) every call first switches to the latest published
+    version; frames served earlier keep the memory of their version alive. Pickling the proxy only sends its name.
+    """
+
+    _managed = False
+
+    def __init__(self, name: str, caching: dict = None):
+        caching = deep_update(dict(subset='view', follow=True), caching) if caching is not None \
+            else dict(subset='view', follow=True)
+        super(SharedPanelSource, self).__init__(params=dict(shared=name), caching=caching)
+        self.name, self.version = name, 0
+        self._control = open_control(name)
+        self.refresh()
+
+    def __getstate__(self):
+        return dict(name=self.name, caching=self.caching)
+
+    def __setstate__(self, state):
+        self.__init__(state['name'], state['caching'])
+
+    def refresh(self) -> bool:
+        """Switches to the latest published version. Returns whether a newer version was attached."""
+        if published_version(self._control) == self.version:
+            return False
+        version, frame, meta = attach(self.name)
+        with self._lock.write():
+            self.value, self.version, self._buffer = frame, version, None
+            if meta is not None:
+                self.entities, self.period, self.coverage = meta['entities'], meta['period'], meta['coverage']
+        logging.info("ATTACH %s version %d", self, version)
+        return True
+
+    def _run(self, entities: dict = None, period: tuple = None):
+        if self.caching['follow']:
+            self.refresh()
+        return super(SharedPanelSource, self)._run(entities, period)
+
+    def _run_fill(self, entities: dict = None, period: tuple = None) -> None:
+        raise ValueError("%s version %d does not cover the request!" % (self, self.version))
+
+    def _execute(self, entities=None, period=None):
+        raise ValueError("%s is read-only and cannot fetch data!" % self)
+
+    def update(self, xs=None, ts=None) -> None:
+        raise TypeError("%s is read-only!" % self.__class__.__name__)
+
+    def reset(self) -> None:
+        raise TypeError("%s is read-only!" % self.__class__.__name__)
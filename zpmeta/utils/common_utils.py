@@ -8,15 +8,20 @@ __email__ = 'engineering@zeroth-principles.com'
 __authors__ = ['Deepak Singh <deepaksingh@zeroth-principles.com>']
 
 
+import sys
 import pandas as pd
 import numpy as np
 import json
+from collections.abc import Mapping, MutableMapping
 
 def deep_update(d, u):
-    """Deep update of dict d with dict u."""
+    """Deep update of dict d with dict u. Any Mapping (e.g. a LayeredParams view) is merged like a dict."""
     for k, v in u.items():
-        if isinstance(v, dict):
-            d[k] = deep_update(d.get(k, {}), v)
+        if isinstance(v, Mapping):
+            base = d.get(k)
+            if not isinstance(base, MutableMapping):
+                base = dict(base) if isinstance(base, Mapping) else {}
+            d[k] = deep_update(base, v)
         else:
             d[k] = v
     return d
@@ -29,4 +34,18 @@ def custom_serializer(obj):
 
 def json_dump(data, **kwargs):
     """Modified json.dumps function to handle built-in functions."""
-    return json.dumps(data, default=custom_serializer, **kwargs)
\ No newline at end of file
+    return json.dumps(data, default=custom_serializer, **kwargs)
+
+def nbytes(obj) -> int:
+    """Approximate memory footprint of an object, counting pandas and NumPy buffers and the items of containers."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(nbytes(value) for value in obj.values())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(nbytes(value) for value in obj)
+    return sys.getsizeof(obj)
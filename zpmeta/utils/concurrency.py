@@ -0,0 +1,133 @@
+"""concurrency util file contains synchronization primitives to support zpmeta"""
+
+__copyright__ = '2023 Zeroth Principles Research'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import time
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """Writer-preferring readers-writer lock.
+
+    Any number of threads may hold the read lock at the same time, while the write lock is exclusive. The write lock is
+    reentrant, and the thread holding it may also take the read lock. A reader must not try to upgrade to the write
+    lock.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._depth = 0
+        self._waiting = 0
+
+    def acquire_read(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._depth += 1
+                return
+            while self._writer is not None or self._waiting > 0:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        with self._cond:
+            if self._writer == threading.get_ident():
+                self._release_write()
+                return
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._depth += 1
+                return
+            self._waiting += 1
+            while self._writer is not None or self._readers > 0:
+                self._cond.wait()
+            self._waiting -= 1
+            self._writer, self._depth = me, 1
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._release_write()
+
+    def _release_write(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self._writer = None
+            self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class KeyedLocks:
+    """Reentrant locks created on demand for each key and discarded once no thread holds or waits for them."""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks = dict()
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @contextmanager
+    def lock(self, key):
+        with self._guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.RLock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def reset(self) -> None:
+        """Forgets all locks, e.g. in a forked child where they may be held by threads that no longer exist."""
+        self._guard = threading.Lock()
+        self._locks = dict()
+
+
+class RateLimiter:
+    """Spaces calls of `acquire` at least 1 / `rate` seconds apart across threads."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = 0.
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + 1. / self.rate
+        if start > now:
+            time.sleep(start - now)
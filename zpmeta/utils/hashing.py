@@ -0,0 +1,138 @@
+"""hashing util file contains content hashing functions to support zpmeta"""
+
+__copyright__ = '2023 Zeroth Principles Research'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import sys
+import types
+import pickle
+import hashlib
+import functools
+import numpy as np
+import pandas as pd
+
+
+def stable_hash(obj) -> str:
+    """Returns a hex digest of the content of obj that is stable across processes and runs.
+
+    Containers are hashed recursively, dicts and sets independently of their ordering. NumPy arrays are hashed from
+    their raw buffer and pandas objects with the vectorized `pandas.util.hash_pandas_object`, so large operands do not
+    go through pickling. Other objects fall back to pickle.
+
+    Importable callables are identified by their qualified name. Functions that cannot be imported (lambdas, nested
+    functions) are hashed from their code, defaults and closure contents, bound methods add the identity of their
+    instance and other callables are identified by their identity, which is only stable within the process.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    _update(digest, obj)
+    return digest.hexdigest()
+
+
+def _update(digest, obj) -> None:
+    if obj is None or isinstance(obj, (bool, int, float, complex, str)):
+        digest.update(("%s:%r;" % (type(obj).__name__, obj)).encode('utf-8'))
+    elif isinstance(obj, bytes):
+        digest.update(b'bytes:' + obj)
+    elif isinstance(obj, (tuple, list)):
+        digest.update(("%s[%d;" % (type(obj).__name__, len(obj))).encode('utf-8'))
+        for item in obj:
+            _update(digest, item)
+    elif isinstance(obj, dict) or _is_mapping(obj):
+        digest.update(("dict{%d;" % len(obj)).encode('utf-8'))
+        for key_hash, key in sorted((stable_hash(key), key) for key in obj.keys()):
+            digest.update(key_hash.encode('utf-8'))
+            _update(digest, obj[key])
+    elif isinstance(obj, (set, frozenset)):
+        digest.update(("set{%d;" % len(obj)).encode('utf-8'))
+        for item_hash in sorted(stable_hash(item) for item in obj):
+            digest.update(item_hash.encode('utf-8'))
+    elif isinstance(obj, np.ndarray):
+        digest.update(("ndarray:%s:%s;" % (obj.dtype.str, obj.shape)).encode('utf-8'))
+        if obj.dtype.hasobject:
+            _update(digest, obj.tolist())
+        else:
+            digest.update(np.ascontiguousarray(obj).view(np.uint8).data)
+    elif isinstance(obj, pd.DataFrame):
+        digest.update(("DataFrame:%s;" % (obj.shape,)).encode('utf-8'))
+        _update(digest, [str(dtype) for dtype in obj.dtypes])
+        _update(digest, obj.columns)
+        digest.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().data)
+    elif isinstance(obj, pd.Series):
+        digest.update(("Series:%s:%s;" % (obj.dtype, obj.name)).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().data)
+    elif isinstance(obj, pd.MultiIndex):
+        digest.update(("MultiIndex:%s;" % list(obj.names)).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(obj.to_frame(index=False), index=False).to_numpy().data)
+    elif isinstance(obj, pd.Index):
+        digest.update(("Index:%s:%s;" % (obj.dtype, obj.name)).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(obj, index=False).to_numpy().data)
+    elif isinstance(obj, functools.partial):
+        digest.update(b'partial:')
+        _update(digest, (obj.func, obj.args, obj.keywords))
+    elif callable(obj) and hasattr(obj, '__qualname__'):
+        _update_callable(digest, obj)
+    else:
+        digest.update(("object:%s;" % type(obj).__qualname__).encode('utf-8'))
+        digest.update(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _is_mapping(obj) -> bool:
+    return hasattr(obj, 'keys') and hasattr(obj, '__getitem__') and not isinstance(obj, (pd.Series, pd.DataFrame))
+
+
+def _update_callable(digest, obj, stack: tuple = ()) -> None:
+    owner = getattr(obj, '__self__', None)
+    if owner is not None and not isinstance(owner, types.ModuleType):
+        digest.update(("method:%s;" % obj.__name__).encode('utf-8'))
+        if hasattr(obj, '__func__'):
+            _update_callable(digest, obj.__func__, stack)
+        if isinstance(owner, (type, bool, int, float, complex, str, bytes)):
+            _update(digest, owner)
+        else:
+            digest.update(("self:%s:%d;" % (type(owner).__qualname__, id(owner))).encode('utf-8'))
+        return
+
+    module, qualname = getattr(obj, '__module__', None), obj.__qualname__
+    if _imported(module, qualname) is obj:
+        digest.update(("callable:%s.%s;" % (module, qualname)).encode('utf-8'))
+    elif isinstance(obj, types.FunctionType):
+        digest.update(("function:%s.%s;" % (module, qualname)).encode('utf-8'))
+        if obj in stack:
+            return
+        _update_code(digest, obj.__code__)
+        _update(digest, (obj.__defaults__, obj.__kwdefaults__))
+        for cell in obj.__closure__ or ():
+            try:
+                contents = cell.cell_contents
+            except ValueError:
+                # an empty cell, e.g. a variable assigned after the function was defined
+                contents = None
+            if isinstance(contents, types.FunctionType):
+                _update_callable(digest, contents, stack + (obj,))
+            else:
+                _update(digest, contents)
+    else:
+        digest.update(("callable:%s.%s:%d;" % (module, qualname, id(obj))).encode('utf-8'))
+
+
+def _update_code(digest, code: types.CodeType) -> None:
+    digest.update(b'code:' + code.co_code)
+    _update(digest, code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _update_code(digest, const)
+        else:
+            _update(digest, const)
+
+
+def _imported(module: str, qualname: str):
+    # Returns the object importable as module.qualname, or None.
+    obj = sys.modules.get(module) if module is not None else None
+    for name in qualname.split('.'):
+        if obj is None:
+            return None
+        obj = getattr(obj, name, None)
+    return obj
@@ -0,0 +1,165 @@
+"""metrics util file contains the instrumentation hooks and metric sinks to support zpmeta"""
+
+__copyright__ = '2023 Zeroth Principles Research'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import os
+import time
+import uuid
+import logging
+import threading
+
+
+class Sink:
+    """Receives metrics. `count` adds to a counter and `observe` records a duration in seconds."""
+
+    def count(self, name: str, labels: tuple, value: float = 1) -> None:
+        pass
+
+    def observe(self, name: str, labels: tuple, seconds: float) -> None:
+        pass
+
+
+class MemorySink(Sink):
+    """Keeps counters and timing summaries (count, sum, max) in memory, keyed by (name, labels)."""
+
+    def __init__(self) -> None:
+        self.counters = dict()
+        self.timings = dict()
+        self._lock = threading.Lock()
+
+    def count(self, name: str, labels: tuple, value: float = 1) -> None:
+        with self._lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    def observe(self, name: str, labels: tuple, seconds: float) -> None:
+        with self._lock:
+            summary = self.timings.get((name, labels))
+            if summary is None:
+                self.timings[(name, labels)] = [1, seconds, seconds]
+            else:
+                summary[0] += 1
+                summary[1] += seconds
+                summary[2] = max(summary[2], seconds)
+
+    def value(self, name: str, **labels) -> float:
+        """Sum of a counter over all label sets containing the given labels."""
+        wanted = set(labels.items())
+        with self._lock:
+            return sum(value for (key, key_labels), value in self.counters.items()
+                       if key == name and wanted.issubset(key_labels))
+
+    def ratio(self, name: str, label: str, hit: str, **labels) -> float:
+        """Share of a counter with `label` equal to `hit`, e.g. `ratio('panelsource_calls', 'result', 'hit')`."""
+        total = self.value(name, **labels)
+        return self.value(name, **dict(labels, **{label: hit})) / total if total else None
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.timings.clear()
+
+
+class PrometheusTextSink(MemorySink):
+    """Writes the metrics in the Prometheus text exposition format to `path`, e.g. for the textfile collector of
+    the node exporter. The file is rewritten atomically by `flush`, and at most every `interval` seconds as metrics
+    are recorded if an interval is given."""
+
+    def __init__(self, path: str, interval: float = None, prefix: str = 'zpmeta_') -> None:
+        super(PrometheusTextSink, self).__init__()
+        self.path, self.interval, self.prefix = path, interval, prefix
+        self._flushed = time.monotonic()
+
+    def count(self, name: str, labels: tuple, value: float = 1) -> None:
+        super(PrometheusTextSink, self).count(name, labels, value)
+        self._maybe_flush()
+
+    def observe(self, name: str, labels: tuple, seconds: float) -> None:
+        super(PrometheusTextSink, self).observe(name, labels, seconds)
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if self.interval is not None and time.monotonic() - self._flushed >= self.interval:
+            self.flush()
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            counters, timings = sorted(self.counters.items()), sorted(self.timings.items())
+        for name in sorted(set(name for (name, _), _ in counters)):
+            lines.append("# TYPE %s%s_total counter" % (self.prefix, name))
+            lines.extend("%s%s_total%s %r" % (self.prefix, name, self._labels(labels), float(value))
+                         for (key, labels), value in counters if key == name)
+        for name in sorted(set(name for (name, _), _ in timings)):
+            lines.append("# TYPE %s%s_seconds summary" % (self.prefix, name))
+            for (key, labels), (count, total, _) in timings:
+                if key == name:
+                    lines.append("%s%s_seconds_count%s %d" % (self.prefix, name, self._labels(labels), count))
+                    lines.append("%s%s_seconds_sum%s %r" % (self.prefix, name, self._labels(labels), total))
+        return "\n".join(lines) + "\n"
+
+    def flush(self) -> None:
+        self._flushed = time.monotonic()
+        tmp = "%s.%s.tmp" % (self.path, uuid.uuid4().hex)
+        try:
+            with open(tmp, 'w') as handle:
+                handle.write(self.render())
+            os.replace(tmp, self.path)
+        except OSError as err:
+            logging.warning("Metrics could not be written to %s: %r", self.path, err)
+
+    @staticmethod
+    def _labels(labels: tuple) -> str:
+        if not labels:
+            return ""
+        return "{%s}" % ",".join('%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                                 for key, value in labels)
+
+
+class CallbackSink(Sink):
+    """Calls `callback(kind, name, labels, value)` for every metric, with kind 'count' or 'observe' and the labels
+    as a dict."""
+
+    def __init__(self, callback) -> None:
+        self.callback = callback
+
+    def count(self, name: str, labels: tuple, value: float = 1) -> None:
+        self.callback('count', name, dict(labels), value)
+
+    def observe(self, name: str, labels: tuple, seconds: float) -> None:
+        self.callback('observe', name, dict(labels), seconds)
+
+
+class Metrics:
+    """ Dispatches metrics to the registered sinks.
+
+    Instrumented code checks `enabled` before computing metrics, so instrumentation costs nothing without sinks.
+    Labels are tuples of (key, value) pairs.
+    """
+
+    def __init__(self) -> None:
+        self.sinks = []
+        self.enabled = False
+
+    def add_sink(self, sink: Sink) -> Sink:
+        self.sinks = self.sinks + [sink]
+        self.enabled = True
+        return sink
+
+    def remove_sink(self, sink: Sink) -> None:
+        self.sinks = [other for other in self.sinks if other is not sink]
+        self.enabled = len(self.sinks) > 0
+
+    def count(self, name: str, labels: tuple = (), value: float = 1) -> None:
+        for sink in self.sinks:
+            sink.count(name, labels, value)
+
+    def observe(self, name: str, labels: tuple = (), seconds: float = 0.) -> None:
+        for sink in self.sinks:
+            sink.observe(name, labels, seconds)
+
+
+metrics = Metrics()
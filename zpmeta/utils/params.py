@@ -0,0 +1,159 @@
+"""params util file contains the layered parameter mapping used to resolve Func params without copies"""
+
+__copyright__ = '2023 Zeroth Principles Research'
+__license__ = 'GPLv3'
+__docformat__ = 'google'
+__author__ = 'Zeroth Principles Engineering'
+__email__ = 'engineering@zeroth-principles.com'
+
+import numpy as np
+import pandas as pd
+from collections.abc import Mapping, MutableMapping
+
+_DELETED = object()
+_IMMUTABLE = (str, int, float, bool, bytes, type(None))
+
+
+class LayeredParams(MutableMapping):
+    """Copy-on-write view over layers of params dicts.
+
+    `LayeredParams(base, override)` reads like `deep_update(deepcopy(base), override)` without copying anything: keys
+    are looked up from the last layer to the first, and nested dicts that appear in several layers are merged lazily
+    into nested views. Writes and deletions only touch a private top layer, so the underlying dicts are never
+    modified. Values other than dicts (lists, DataFrames, ...) are shared with the layers and must not be modified in
+    place, unless the view is materialized with `to_dict(detach=True)`.
+
+    A `read_only` view raises TypeError on writes and detaches the values it returns instead (see `to_dict`), so it
+    can be handed out without copying the layers: only the values that are read are copied, lazily.
+    """
+    __slots__ = ('_layers', '_local', '_read_only')
+
+    def __init__(self, *layers, read_only: bool = False) -> None:
+        self._layers = tuple(layer for layer in layers if layer)
+        self._local = {}
+        self._read_only = read_only
+
+    def __getitem__(self, key):
+        if key in self._local:
+            value = self._local[key]
+            if value is _DELETED:
+                raise KeyError(key)
+            return value
+
+        nested = []
+        for layer in reversed(self._layers):
+            if key in layer:
+                value = layer[key]
+                if not isinstance(value, Mapping):
+                    if not nested:
+                        if self._read_only and type(value) not in _IMMUTABLE:
+                            value = self._local[key] = _detached(value)
+                        return value
+                    break
+                nested.append(value)
+        if not nested:
+            raise KeyError(key)
+
+        # Nested views are kept in the top layer so that writes into them persist.
+        view = LayeredParams(*reversed(nested), read_only=self._read_only)
+        self._local[key] = view
+        return view
+
+    def __setitem__(self, key, value) -> None:
+        if self._read_only:
+            raise TypeError("params are read-only, copy them with to_dict(detach=True) to modify them!")
+        self._local[key] = value
+
+    def __delitem__(self, key) -> None:
+        if self._read_only:
+            raise TypeError("params are read-only, copy them with to_dict(detach=True) to modify them!")
+        self[key]
+        self._local[key] = _DELETED
+
+    def __iter__(self):
+        seen = set()
+        for layer in self._layers + (self._local,):
+            for key in layer:
+                if key not in seen:
+                    seen.add(key)
+                    if self._local.get(key) is not _DELETED:
+                        yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key) -> bool:
+        if key in self._local:
+            return self._local[key] is not _DELETED
+        return any(key in layer for layer in self._layers)
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+    def __getstate__(self):
+        return self.to_dict(), self._read_only
+
+    def __setstate__(self, state) -> None:
+        (layer, self._read_only), self._local = state, {}
+        self._layers = (layer,)
+
+    def copy(self) -> dict:
+        return self.to_dict()
+
+    def to_dict(self, detach: bool = False) -> dict:
+        """Materializes the view as a plain dict of dicts. Leaf values are shared with the layers, unless `detach` is
+        set: lists, tuples and sets are then copied, NumPy arrays become read-only views and pandas objects become
+        shallow copies under copy-on-write (which copy their data when modified) and deep copies otherwise, so that
+        the result can be modified without modifying the layers."""
+        if detach:
+            if not self._local and self._layers:
+                merged = _detached(self._layers[0])
+                for layer in self._layers[1:]:
+                    _merge_detached(merged, layer)
+                return merged
+            return {key: _detached(value) for key, value in self.items()}
+        return {key: value.to_dict() if isinstance(value, LayeredParams) else value for key, value in self.items()}
+
+
+def _merge_detached(merged: dict, layer: Mapping) -> dict:
+    # Detached merge of a layer into merged, following the lookup rules of LayeredParams: mappings over mappings
+    # are merged, and any other value replaces the one below.
+    for key, value in layer.items():
+        current = merged.get(key)
+        if type(current) is dict and isinstance(value, Mapping):
+            _merge_detached(current, value)
+        else:
+            merged[key] = _detached(value)
+    return merged
+
+
+def _detached(value):
+    if type(value) in _IMMUTABLE:
+        return value
+    if isinstance(value, LayeredParams):
+        return value.to_dict(detach=True)
+    if isinstance(value, Mapping):
+        copied = dict(value)
+        for key, item in copied.items():
+            if type(item) not in _IMMUTABLE:
+                copied[key] = _detached(item)
+        return copied
+    if type(value) in (list, tuple):
+        return type(value)(_detached(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return type(value)(value)
+    if isinstance(value, np.ndarray):
+        view = value.view()
+        view.flags.writeable = False
+        return view
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        # Shallow copies only copy their data when modified under copy-on-write.
+        return value.copy(deep=not _copy_on_write())
+    return value
+
+
+def _copy_on_write() -> bool:
+    # Always on from pandas 3, and optional (mode.copy_on_write) in pandas 2.
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    return pd.get_option('mode.copy_on_write') is True